@@ -0,0 +1,234 @@
+"""
+Admission Control Module
+
+This module bounds how many query evaluations run at once. Callers
+beyond the limit wait in a bounded queue: cheap queries (by the cost
+estimate) in a fast lane that is served first, everything else in the
+normal lane, and within a lane the sessions take turns so one session
+submitting many queries does not hold up the others. A caller is turned
+away with AdmissionRejected when the queue is full, when its predicted
+wait is over the threshold, or when it has actually waited that long.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, Optional
+from config import ADMISSION_CONFIG
+from instrumentation import Histogram
+
+FAST, NORMAL = 'fast', 'normal'
+LANES = (FAST, NORMAL)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a query is not admitted because the executor is busy"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A caller waiting for a slot"""
+
+    __slots__ = ('session', 'lane', 'event', 'granted')
+
+    def __init__(self, session: Hashable, lane: str):
+        self.session = session
+        self.lane = lane
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    Bounded, fair admission of query evaluations (thread-safe)
+    """
+
+    def __init__(self, max_concurrent: int = None, max_queue: int = None,
+                 max_wait_ms: float = None, cheap_work: int = None, fast_burst: int = None):
+        """
+        Initialize controller (ADMISSION_CONFIG values for omitted arguments)
+
+        Args:
+            max_concurrent: Evaluations running at the same time
+            max_queue: Callers waiting at the same time
+            max_wait_ms: Longest a caller waits (or is predicted to wait)
+                before it is turned away
+            cheap_work: Estimated intermediate rows up to which a query
+                goes to the fast lane
+            fast_burst: Fast-lane callers admitted in a row while the
+                normal lane waits, so the normal lane is not starved
+        """
+        self.max_concurrent = max_concurrent or ADMISSION_CONFIG.get('max_concurrent', 4)
+        self.max_queue = ADMISSION_CONFIG.get('max_queue', 64) if max_queue is None else max_queue
+        self.max_wait_ms = max_wait_ms or ADMISSION_CONFIG.get('max_wait_ms', 2000)
+        self.cheap_work = ADMISSION_CONFIG.get('cheap_work', 1000) if cheap_work is None else cheap_work
+        self.fast_burst = fast_burst or ADMISSION_CONFIG.get('fast_burst', 4)
+
+        self._lock = threading.Lock()
+        self._active = 0
+        # Lane -> session -> waiters; sessions are served round robin
+        self._queues: Dict[str, OrderedDict] = {lane: OrderedDict() for lane in LANES}
+        self._queued = 0
+        self._fast_streak = 0
+        # Smoothed evaluation time, for predicting queue waits
+        self._service_ms: Optional[float] = None
+
+        self.stats = {'admitted': 0, 'queued': 0, 'rejected_full': 0,
+                      'rejected_predicted': 0, 'rejected_timeout': 0}
+        self.lane_stats = {lane: 0 for lane in LANES}
+        self.depth_histogram = Histogram([0, 1, 2, 4, 8, 16, 32, 64])
+        self.wait_histogram = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500])
+
+    def lane_for(self, cost: Optional[Dict[str, Any]]) -> str:
+        """
+        Lane for a query
+
+        Args:
+            cost: CostGuard decision (None if the query was not estimated)
+
+        Returns:
+            'fast' for queries estimated to be cheap, otherwise 'normal'
+        """
+        if cost and cost['estimated_work'] <= self.cheap_work:
+            return FAST
+        return NORMAL
+
+    @contextmanager
+    def admit(self, session: Hashable = None, lane: str = NORMAL) -> Iterator[None]:
+        """
+        Hold an evaluation slot for the duration of the block
+
+        Args:
+            session: Identifies the caller for fairness (e.g. a Streamlit
+                session or API client)
+            lane: 'fast' or 'normal'
+
+        Raises:
+            AdmissionRejected: The executor is too busy
+        """
+        self._acquire(session, lane)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release((time.perf_counter() - start) * 1000)
+
+    def _acquire(self, session: Hashable, lane: str):
+        start = time.perf_counter()
+        with self._lock:
+            self.depth_histogram.observe(self._queued)
+            if self._active < self.max_concurrent and not self._queued:
+                self._active += 1
+                self._admitted(lane, 0.0)
+                return
+
+            if self._queued >= self.max_queue:
+                self.stats['rejected_full'] += 1
+                raise AdmissionRejected(f"Server busy: queue full ({self._queued} waiting)",
+                                        self._retry_after())
+            predicted = self._predicted_wait_ms(lane)
+            if predicted > self.max_wait_ms:
+                self.stats['rejected_predicted'] += 1
+                raise AdmissionRejected(f"Server busy: predicted wait {predicted:.0f} ms",
+                                        self._retry_after())
+
+            waiter = _Waiter(session, lane)
+            self._queues[lane].setdefault(session, deque()).append(waiter)
+            self._queued += 1
+            self.stats['queued'] += 1
+
+        waiter.event.wait(self.max_wait_ms / 1000)
+        with self._lock:
+            # A slot may have been handed over between the timeout and here
+            if not waiter.granted:
+                self._remove(waiter)
+                self.stats['rejected_timeout'] += 1
+                raise AdmissionRejected(f"Server busy: waited {self.max_wait_ms:.0f} ms",
+                                        self._retry_after())
+            self._admitted(lane, (time.perf_counter() - start) * 1000)
+
+    def _release(self, elapsed_ms: float):
+        with self._lock:
+            self._service_ms = (elapsed_ms if self._service_ms is None
+                                else 0.8 * self._service_ms + 0.2 * elapsed_ms)
+            waiter = self._next_waiter()
+            if waiter is None:
+                self._active -= 1
+            else:
+                # The slot passes straight to the waiter
+                waiter.granted = True
+                waiter.event.set()
+
+    def _admitted(self, lane: str, waited_ms: float):
+        self.stats['admitted'] += 1
+        self.lane_stats[lane] += 1
+        self.wait_histogram.observe(waited_ms)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """Pop the waiter to admit next (lock held)"""
+        fast, normal = self._queues[FAST], self._queues[NORMAL]
+        if fast and (not normal or self._fast_streak < self.fast_burst):
+            queue = fast
+            self._fast_streak += 1
+        elif normal:
+            queue = normal
+            self._fast_streak = 0
+        else:
+            return None
+
+        session, waiters = next(iter(queue.items()))
+        waiter = waiters.popleft()
+        if waiters:
+            # Next turn goes to the other sessions
+            queue.move_to_end(session)
+        else:
+            del queue[session]
+        self._queued -= 1
+        return waiter
+
+    def _remove(self, waiter: _Waiter):
+        """Take a timed-out waiter off its queue (lock held)"""
+        queue = self._queues[waiter.lane]
+        waiters = queue[waiter.session]
+        waiters.remove(waiter)
+        if not waiters:
+            del queue[waiter.session]
+        self._queued -= 1
+
+    def _predicted_wait_ms(self, lane: str) -> float:
+        """Predicted wait of a new caller in a lane (lock held)"""
+        if self._service_ms is None:
+            return 0.0
+        ahead = sum(len(waiters) for waiters in self._queues[FAST].values())
+        if lane == NORMAL:
+            ahead += sum(len(waiters) for waiters in self._queues[NORMAL].values())
+        return (ahead // self.max_concurrent + 1) * self._service_ms
+
+    def _retry_after(self) -> float:
+        """Seconds after which a rejected caller may retry (lock held)"""
+        service_ms = self._service_ms or self.max_wait_ms
+        return round(max(service_ms * (self._queued + 1) / self.max_concurrent, 100) / 1000, 1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get admission statistics
+
+        Returns:
+            Dictionary with active, queued, limits, counters, admissions
+            per lane and the queue depth and wait time (ms) histograms
+        """
+        with self._lock:
+            return dict(
+                self.stats,
+                active=self._active,
+                waiting=self._queued,
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue,
+                lanes=dict(self.lane_stats),
+                queue_depth=self.depth_histogram.snapshot(),
+                wait_ms=self.wait_histogram.snapshot(),
+            )
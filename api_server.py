@@ -0,0 +1,568 @@
+"""
+API Server Module
+
+This module serves the query pipeline over HTTP for programs, alongside
+the Streamlit UI. It is a small asyncio HTTP/1.1 server built on the
+standard library (keep-alive, chunked streaming); NLP processing and
+graph evaluation run in a bounded thread pool so the event loop never
+blocks on them; identical requests in flight at the same time are
+answered by one evaluation. Queries the pipeline's admission control
+turns away are answered 503 with Retry-After; clients may send an
+X-Session-Id header to be scheduled fairly as one session (the client
+address is used otherwise).
+
+Endpoints:
+    GET  /health      Readiness (warm-up finished), triple count and data version
+    GET  /stats       Cache, coalescing, admission, algebra cache and warm-up statistics
+    GET  /metrics     Prometheus metrics (when DEBUG_CONFIG['instrumentation'] is on)
+    POST /nl2sparql   {"query": "...", "cursor": "...", "execute": true}
+    POST /sparql      {"sparql": "...", "max_rows": 100}
+    POST /batch       {"queries": ["...", {"query": "...", "cursor": "..."}]}
+
+Results stream as one JSON document whose rows array is written in
+chunks, or as NDJSON (a metadata line, then one object per row) with
+``Accept: application/x-ndjson`` or ``?format=ndjson``. /batch always
+answers in NDJSON, one line per query in completion order.
+
+Usage:
+    python api_server.py [--host HOST] [--port PORT] [--workers N] [--data FILE]
+                         [--no-warmup]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+from admission import AdmissionRejected
+from config import ADMISSION_CONFIG, API_CONFIG, CACHE_CONFIG
+from instrumentation import INSTRUMENTATION
+from pipeline import QueryPipeline, create_pipeline
+from result_shaping import row_values
+from single_flight import AsyncSingleFlight
+from template_registry import frame_summary
+
+NDJSON = 'application/x-ndjson'
+JSON = 'application/json'
+PROMETHEUS = 'text/plain; version=0.0.4'
+
+# rdflib would fetch SERVICE endpoints over the network
+SERVICE_PATTERN = re.compile(r'\bSERVICE\b', re.IGNORECASE)
+
+
+class HTTPError(Exception):
+    """Error answered with an HTTP status and a JSON message"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    """Parsed HTTP request"""
+
+    def __init__(self, method: str, target: str, version: str,
+                 headers: Dict[str, str], body: bytes = b''):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.version = version
+        self.headers = headers
+        self.body = body
+        self.client: Optional[str] = None
+
+    @property
+    def session(self) -> Optional[str]:
+        """Caller identity for fair admission"""
+        return self.headers.get('x-session-id') or self.client
+
+    @property
+    def keep_alive(self) -> bool:
+        """Whether the connection stays open after the response"""
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    @property
+    def wants_ndjson(self) -> bool:
+        """Whether the client asked for NDJSON instead of one JSON document"""
+        return self.params.get('format') == 'ndjson' or NDJSON in self.headers.get('accept', '')
+
+    def json(self) -> Dict[str, Any]:
+        """Request body as a JSON object"""
+        try:
+            body = json.loads(self.body or b'{}')
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return body
+
+
+class Response:
+    """HTTP response; chunks are streamed with chunked transfer encoding"""
+
+    def __init__(self, status: int, content_type: str = JSON, body: bytes = None,
+                 chunks: Union[Iterable[bytes], AsyncIterator[bytes]] = None,
+                 headers: Dict[str, str] = None):
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+        self.chunks = chunks
+        self.headers = headers or {}
+
+
+def json_response(status: int, payload: Dict[str, Any], headers: Dict[str, str] = None) -> Response:
+    """Response with a JSON document body"""
+    return Response(status, JSON, (json.dumps(payload, default=str) + '\n').encode('utf-8'),
+                    headers=headers)
+
+
+def busy_response(payload: Dict[str, Any], retry_after: float) -> Response:
+    """503 response asking the client to retry later"""
+    return json_response(503, payload, {'Retry-After': str(max(1, math.ceil(retry_after)))})
+
+
+def stream_results(meta: Dict[str, Any], df: Optional[pd.DataFrame], ndjson: bool,
+                   chunk_rows: int) -> Iterator[bytes]:
+    """
+    Serialize a result set chunk by chunk
+
+    Args:
+        meta: Fields sent before the rows (columns and row_count are added)
+        df: Result rows
+        ndjson: One object per line instead of one JSON document
+        chunk_rows: Rows serialized per chunk
+
+    Yields:
+        Encoded chunks of the response body
+    """
+    if df is None:
+        df = pd.DataFrame()
+    columns = [str(column) for column in df.columns]
+    meta = dict(meta, columns=columns, row_count=len(df))
+
+    if ndjson:
+        yield (json.dumps(meta, default=str) + '\n').encode('utf-8')
+    else:
+        yield (json.dumps(meta, default=str)[:-1] + ', "rows": [').encode('utf-8')
+
+    for start in range(0, len(df), chunk_rows):
+        rows = row_values(df.iloc[start:start + chunk_rows])
+        if ndjson:
+            text = ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+        else:
+            text = ', '.join(json.dumps(row, default=str) for row in rows)
+            if start:
+                text = ', ' + text
+        yield text.encode('utf-8')
+
+    if not ndjson:
+        yield b']}\n'
+
+
+class APIServer:
+    """
+    HTTP front end for a QueryPipeline
+    """
+
+    def __init__(self, pipeline: QueryPipeline, max_workers: int = None):
+        """
+        Initialize server
+
+        Args:
+            pipeline: Pipeline answering the requests
+            max_workers: Threads for NLP and graph evaluation
+                (API_CONFIG['max_workers'] if omitted)
+        """
+        self.pipeline = pipeline
+        self.max_workers = max_workers or API_CONFIG.get('max_workers', 4)
+        self.executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='api')
+        # Jobs wait here rather than in the executor's unbounded queue, so
+        # a request whose client went away is dropped before it runs
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self.chunk_rows = API_CONFIG.get('stream_chunk_rows', 500)
+        # Coalesces before a worker thread is taken, so waiting duplicates
+        # do not occupy the pool
+        self.flights = AsyncSingleFlight() if CACHE_CONFIG.get('coalesce_requests', True) else None
+        self.routes: Dict[tuple, Callable] = {
+            ('GET', '/health'): self.health,
+            ('GET', '/stats'): self.stats,
+            ('GET', '/metrics'): self.metrics,
+            ('POST', '/nl2sparql'): self.nl2sparql,
+            ('POST', '/sparql'): self.sparql,
+            ('POST', '/batch'): self.batch,
+        }
+
+    async def start(self, host: str = None, port: int = None) -> asyncio.AbstractServer:
+        """
+        Start listening
+
+        Args:
+            host: Interface to bind (API_CONFIG['host'] if omitted)
+            port: Port to bind (API_CONFIG['port'] if omitted, 0 picks a free one)
+
+        Returns:
+            asyncio Server; its sockets give the bound address
+        """
+        return await asyncio.start_server(
+            self.handle,
+            host or API_CONFIG.get('host', '127.0.0.1'),
+            API_CONFIG.get('port', 8765) if port is None else port)
+
+    def close(self):
+        """Stop the worker threads once running jobs finish"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run_blocking(self, func: Callable, *args) -> Any:
+        """Run a blocking call in the worker pool"""
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, partial(func, *args))
+
+    async def run_coalesced(self, key: tuple, func: Callable, *args) -> Any:
+        """Run a blocking call in the worker pool, sharing identical calls in flight"""
+        if self.flights is None:
+            return await self.run_blocking(func, *args)
+        key = key + (self.pipeline.rdf_executor.data_version,)
+        result, _ = await self.flights.do(key, lambda: self.run_blocking(func, *args))
+        return result
+
+    async def answer(self, query: str, cursor: Optional[str], execute: bool,
+                     session: Optional[str] = None) -> Dict[str, Any]:
+        """Pipeline outcome for a natural language query"""
+        key = ('nl', ' '.join(query.split()), cursor, execute)
+        if not execute:
+            return await self.run_coalesced(key, self.pipeline.translate, query, cursor)
+        return await self.run_coalesced(key, self.pipeline.run, query, cursor, session)
+
+    # Endpoints
+
+    async def health(self, request: Request) -> Response:
+        executor = self.pipeline.rdf_executor
+        warmer = self.pipeline.warmer
+        return json_response(200, {
+            'status': 'ok',
+            # Requests are served while warming, just not yet from warm caches
+            'ready': warmer is None or warmer.ready,
+            'triples': len(executor.graph),
+            'data_version': executor.data_version,
+            'workers': self.max_workers,
+        })
+
+    async def stats(self, request: Request) -> Response:
+        stats = {
+            'cache': self.pipeline.cache.get_stats(),
+            'coalescing': self.pipeline.get_coalescing_stats(),
+        }
+        if self.flights is not None:
+            stats['coalescing']['api'] = self.flights.get_stats()
+        if self.pipeline.admission is not None:
+            stats['admission'] = self.pipeline.admission.get_stats()
+        algebra = self.pipeline.sparql_generator.algebra
+        if algebra is not None:
+            stats['algebra'] = algebra.get_stats()
+        if self.pipeline.warmer is not None:
+            stats['warmup'] = self.pipeline.warmer.status()
+        return json_response(200, stats)
+
+    async def metrics(self, request: Request) -> Response:
+        if not INSTRUMENTATION.enabled:
+            raise HTTPError(404, "Instrumentation is off (DEBUG_CONFIG['instrumentation'])")
+        return Response(200, PROMETHEUS, INSTRUMENTATION.prometheus().encode('utf-8'))
+
+    async def nl2sparql(self, request: Request) -> Response:
+        body = request.json()
+        query = self._query_text(body.get('query'))
+        cursor = body.get('cursor')
+        execute = bool(body.get('execute', True))
+        outcome = await self.answer(query, cursor, execute, request.session)
+        if not execute:
+            return json_response(200, self._translation(query, outcome))
+
+        meta = self._translation(query, outcome)
+        meta.update(next_cursor=outcome['next_cursor'], cached=outcome['cached'],
+                    error=outcome['error'])
+        if outcome['busy']:
+            return busy_response(meta, ADMISSION_CONFIG.get('max_wait_ms', 2000) / 1000)
+        if outcome['error']:
+            return json_response(422, meta)
+        return self._results(request, meta, outcome['results'])
+
+    async def sparql(self, request: Request) -> Response:
+        body = request.json()
+        text = body.get('sparql')
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPError(400, "'sparql' must be a non-empty string")
+        if SERVICE_PATTERN.search(text):
+            raise HTTPError(400, "SERVICE clauses are not allowed")
+        max_rows = body.get('max_rows', API_CONFIG.get('max_rows'))
+        if max_rows is not None and (not isinstance(max_rows, int) or max_rows < 1):
+            raise HTTPError(400, "'max_rows' must be a positive integer")
+
+        try:
+            results_df, error = await self.run_coalesced(
+                ('sparql', text, max_rows), self.pipeline.execute, text, max_rows, request.session)
+        except AdmissionRejected as rejection:
+            return busy_response({'sparql': text, 'error': str(rejection)}, rejection.retry_after)
+        if error:
+            return json_response(400, {'sparql': text, 'error': error})
+        return self._results(request, {'sparql': text}, results_df)
+
+    async def batch(self, request: Request) -> Response:
+        body = request.json()
+        items = body.get('queries')
+        max_batch = API_CONFIG.get('max_batch', 100)
+        if not isinstance(items, list) or not items:
+            raise HTTPError(400, "'queries' must be a non-empty list")
+        if len(items) > max_batch:
+            raise HTTPError(413, f"At most {max_batch} queries per batch")
+        jobs = []
+        for item in items:
+            if isinstance(item, dict):
+                jobs.append((self._query_text(item.get('query')), item.get('cursor')))
+            else:
+                jobs.append((self._query_text(item), None))
+        execute = bool(body.get('execute', True))
+
+        async def answer(index: int, query: str, cursor: Optional[str]) -> Dict[str, Any]:
+            try:
+                outcome = await self.answer(query, cursor, execute, request.session)
+                if not execute:
+                    return dict(self._translation(query, outcome), index=index)
+            except ValueError as error:
+                return {'index': index, 'query': query, 'error': str(error)}
+            record = self._translation(query, outcome)
+            results_df = outcome['results']
+            if results_df is None:
+                results_df = pd.DataFrame()
+            record.update(index=index, next_cursor=outcome['next_cursor'],
+                          cached=outcome['cached'], busy=outcome['busy'], error=outcome['error'],
+                          columns=[str(column) for column in results_df.columns],
+                          rows=row_values(results_df))
+            return record
+
+        tasks = [asyncio.ensure_future(answer(index, *job)) for index, job in enumerate(jobs)]
+
+        async def lines() -> AsyncIterator[bytes]:
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    record = await finished
+                    yield (json.dumps(record, default=str) + '\n').encode('utf-8')
+            finally:
+                # Client went away: drop the queries that have not run yet
+                for task in tasks:
+                    task.cancel()
+
+        return Response(200, NDJSON, chunks=lines())
+
+    # Helpers
+
+    @staticmethod
+    def _query_text(query: Any) -> str:
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "'query' must be a non-empty string")
+        return query
+
+    @staticmethod
+    def _translation(query: str, outcome: Dict[str, Any]) -> Dict[str, Any]:
+        sparql_query = outcome['sparql_query']
+        return {
+            'query': query,
+            'frame': frame_summary(outcome['nlp_result']),
+            'sparql': None if sparql_query is None else str(sparql_query),
+            'cost': outcome['cost'],
+            'query_id': outcome['query_id'],
+        }
+
+    def _results(self, request: Request, meta: Dict[str, Any],
+                 results_df: Optional[pd.DataFrame]) -> Response:
+        ndjson = request.wants_ndjson
+        return Response(200, NDJSON if ndjson else JSON,
+                        chunks=stream_results(meta, results_df, ndjson, self.chunk_rows))
+
+    # HTTP
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve the requests of one connection"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as error:
+                    await self._send(writer, json_response(error.status, {'error': error.message}),
+                                     keep_alive=False)
+                    break
+                if request is None:
+                    break
+                peer = writer.get_extra_info('peername')
+                request.client = peer[0] if peer else None
+                response = await self._dispatch(request)
+                chunked = request.version == 'HTTP/1.1'
+                keep_alive = request.keep_alive and (chunked or response.chunks is None)
+                if not await self._send(writer, response, keep_alive, chunked):
+                    break
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """Read one request, or None once the client closed the connection"""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large")
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(411, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > API_CONFIG.get('max_body_bytes', 1048576):
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return Request(method, target, version, headers, body)
+
+    async def _dispatch(self, request: Request) -> Response:
+        """Run the endpoint for a request, turning failures into responses"""
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self.routes):
+                return json_response(405, {'error': f"{request.method} not allowed"})
+            return json_response(404, {'error': f"No endpoint {request.path}"})
+        try:
+            return await handler(request)
+        except HTTPError as error:
+            return json_response(error.status, {'error': error.message})
+        except ValueError as error:
+            # e.g. an invalid page cursor
+            return json_response(400, {'error': str(error)})
+        except Exception as error:
+            print(f"Error handling {request.method} {request.path}: {error}")
+            return json_response(500, {'error': str(error)})
+
+    async def _send(self, writer: asyncio.StreamWriter, response: Response,
+                    keep_alive: bool, chunked: bool = True) -> bool:
+        """
+        Write a response
+
+        Args:
+            writer: Connection stream
+            response: Response to write
+            keep_alive: Announce that the connection stays open
+            chunked: Use chunked transfer encoding for streamed bodies
+                (HTTP/1.0 clients instead read until the connection closes)
+
+        Returns:
+            False if the connection can not be reused
+        """
+        status = HTTPStatus(response.status)
+        headers = [f"HTTP/1.1 {status.value} {status.phrase}",
+                   f"Content-Type: {response.content_type}; charset=utf-8",
+                   f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        headers.extend(f"{name}: {value}" for name, value in response.headers.items())
+        if response.chunks is None:
+            headers.append(f"Content-Length: {len(response.body)}")
+            writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + response.body)
+            await writer.drain()
+            return True
+
+        if chunked:
+            headers.append("Transfer-Encoding: chunked")
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1'))
+        chunks = response.chunks
+        try:
+            if hasattr(chunks, '__aiter__'):
+                async for chunk in chunks:
+                    await self._write_chunk(writer, chunk, chunked)
+            else:
+                for chunk in chunks:
+                    await self._write_chunk(writer, chunk, chunked)
+        except ConnectionError:
+            raise
+        except Exception as error:
+            # Headers are out; closing without the last chunk marks the body incomplete
+            print(f"Error streaming response: {error}")
+            return False
+        finally:
+            if hasattr(chunks, 'aclose'):
+                await chunks.aclose()
+        if not chunked:
+            return False
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        return True
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, chunk: bytes, chunked: bool):
+        if chunk:
+            writer.write(f"{len(chunk):x}\r\n".encode('latin-1') + chunk + b'\r\n'
+                         if chunked else chunk)
+            # Wait for slow readers instead of buffering the whole result
+            await writer.drain()
+
+
+async def serve(pipeline: QueryPipeline, host: str = None, port: int = None,
+                max_workers: int = None):
+    """Run an APIServer until cancelled"""
+    api = APIServer(pipeline, max_workers)
+    server = await api.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving NL to SPARQL API on http://{address[0]}:{address[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NL to SPARQL HTTP API")
+    parser.add_argument('--host', default=API_CONFIG.get('host', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=API_CONFIG.get('port', 8765))
+    parser.add_argument('--workers', type=int, default=API_CONFIG.get('max_workers', 4),
+                        help="threads for NLP processing and query evaluation")
+    parser.add_argument('--data', default=None, help="RDF/OWL file (RDF_DATASET by default)")
+    parser.add_argument('--no-warmup', action='store_true', help="skip the startup cache warm-up")
+    args = parser.parse_args()
+
+    # Responses carry the semantic frame only, never tokens or POS tags
+    pipeline = create_pipeline(args.data, warm=False if args.no_warmup else None, keep_doc=False)
+    try:
+        asyncio.run(serve(pipeline, args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        print("Stopped")
+
+
+if __name__ == '__main__':
+    main()
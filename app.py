@@ -8,10 +8,10 @@ and executes them on the CCCM RDF dataset using classical NLP techniques.
 
 import streamlit as st
 import pandas as pd
-from nlp_processor import NLPProcessor
-from sparql_generator import SPARQLGenerator
-from rdf_query_executor import RDFQueryExecutor
+from config import QUICK_EXAMPLES, SIDEBAR_EXAMPLES
+from pipeline import create_pipeline
 import os
+import uuid
 
 
 hide_streamlit_style = """
@@ -33,18 +33,21 @@ st.set_page_config(
 # Initialize components
 @st.cache_resource
 def initialize_components():
-    """Initialize NLP processor, SPARQL generator, and RDF executor"""
-    nlp_processor = NLPProcessor()
-    sparql_generator = SPARQLGenerator()
-    
+    """Initialize NLP processor, SPARQL generator, RDF executor and pipeline"""
     # Get the path to the OWL file
     owl_file = "CCCM PERFECTED.owl"
     if not os.path.exists(owl_file):
         st.error(f"RDF dataset file '{owl_file}' not found!")
-        return None, None, None
+        return None
     
-    rdf_executor = RDFQueryExecutor(owl_file)
-    return nlp_processor, sparql_generator, rdf_executor
+    return create_pipeline(owl_file)
+
+
+def request_next_page(query: str, cursor: str):
+    """Button callback: re-run query from a page cursor on the next rerun"""
+    st.session_state['page_query'] = query
+    st.session_state['page_cursor'] = cursor
+
 
 # Application header
 st.title("🔍 Natural Language to SPARQL Query Converter")
@@ -54,57 +57,37 @@ This application uses **classical NLP techniques** (no LLMs) including tokenizat
 """)
 
 # Initialize components
-nlp_processor, sparql_generator, rdf_executor = initialize_components()
+pipeline = initialize_components()
 
-if nlp_processor is None:
+if pipeline is None:
     st.stop()
 
 # Sidebar with example queries
 with st.sidebar:
     st.header("📚 Example Queries")
-    st.markdown("""
-    Try these example queries:
-    
-    **Customer Queries:**
-    - List all customers
-    - Show customers in India
-    - List customers living in India
-    - Show customers based in UK
-    
-    **Institution Queries:**
-    - List all banks
-    - Show institutions in India
-    - List all fintechs
-    
-    **Transaction Queries:**
-    - List all transactions
-    - Show all remittances
-    - List customers who initiated transactions
-    - Show customers who initiated remittances
-    
-    **Account Queries:**
-    - List customers with their accounts
-    - Show customers with total number of accounts
-    - Count accounts per customer
-    
-    **Complex Queries:**
-    - List transactions and their processing institutions
-    - Show completed transactions
-    - List failed transactions
-    - Show customers with multiple accounts
-    - List remittances processed by fintech
-    - Show cross-border transactions
-    - Compare banks versus fintechs
-    - Show transactions processed by ICICI
-    - Show customers who use both banks and fintechs
-    - Show full money trail
-    - Show remittances over 200000
-    - Show top customer by transaction amount
-    """)
+    st.markdown("Try these example queries:")
+    for category, examples in SIDEBAR_EXAMPLES.items():
+        st.markdown(f"**{category}:**\n" + "\n".join(f"- {example}" for example in examples))
     
     st.markdown("---")
     st.markdown("**Dataset:** CCCM PERFECTED.owl")
     st.markdown("**Prefix:** `cccm: <http://www.semanticweb.org/cccm#>`")
+    
+    cache_stats = pipeline.cache.get_stats()
+    st.markdown(f"**Result cache:** {cache_stats['size']} entries, "
+                f"{cache_stats['hit_rate']:.0%} hit rate")
+    saved = sum(stats['saved'] for stats in pipeline.get_coalescing_stats().values())
+    st.markdown(f"**Coalesced requests:** {saved} evaluations saved")
+    if pipeline.warmer is not None:
+        warmup = pipeline.warmer.status()
+        if warmup['ready']:
+            st.markdown(f"**Warm-up:** {warmup['total']} queries cached in {warmup['seconds']:.1f} s")
+        else:
+            st.markdown(f"**Warm-up:** {warmup['done']}/{warmup['total']} queries...")
+    if pipeline.admission is not None:
+        admission_stats = pipeline.admission.get_stats()
+        st.markdown(f"**Query slots:** {admission_stats['active']}/{admission_stats['max_concurrent']} "
+                    f"busy, {admission_stats['waiting']} waiting")
 
 # Main query interface
 st.header("🎯 Enter Your Query")
@@ -125,27 +108,18 @@ with col2:
 
 # Quick example buttons
 st.markdown("**Quick Examples:**")
-example_col1, example_col2, example_col3, example_col4 = st.columns(4)
-
-with example_col1:
-    if st.button("List all customers"):
-        user_query = "List all customers"
-        submit_button = True
+for column, (label, example) in zip(st.columns(len(QUICK_EXAMPLES)), QUICK_EXAMPLES):
+    with column:
+        if st.button(label):
+            user_query = example
+            submit_button = True
 
-with example_col2:
-    if st.button("Customers in India"):
-        user_query = "List all customers living in India"
-        submit_button = True
-
-with example_col3:
-    if st.button("All institutions"):
-        user_query = "List institutions based in India"
-        submit_button = True
-
-with example_col4:
-    if st.button("All transactions"):
-        user_query = "List all transactions"
-        submit_button = True
+# "Next page" re-runs the previous query from its page cursor
+page_cursor = None
+if not submit_button and st.session_state.get('page_cursor'):
+    user_query = st.session_state.pop('page_query')
+    page_cursor = st.session_state.pop('page_cursor')
+    submit_button = True
 
 # Process query
 if submit_button and user_query:
@@ -156,19 +130,24 @@ if submit_button and user_query:
     
     with st.spinner("Processing your query..."):
         try:
-            # Step 1: NLP Processing
-            nlp_result = nlp_processor.process(user_query)
-            
-            # Step 2: Generate SPARQL
-            sparql_query = sparql_generator.generate(nlp_result)
-            
-            # Step 3: Execute SPARQL
-            results_df, error = rdf_executor.execute(sparql_query)
+            # NLP processing, SPARQL generation and execution
+            # (generation and execution are skipped on a cache hit)
+            # Sessions take turns when queries have to wait for a slot
+            session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+            outcome = pipeline.run(user_query, page_cursor, session_id)
+            nlp_result = outcome['nlp_result']
+            sparql_query = outcome['sparql_query']
+            results_df, error = outcome['results'], outcome['error']
+            cost = outcome['cost']
             
             # Display results
             with tab1:
                 st.subheader("Query Results")
-                if error:
+                if cost and cost['action'] in ('rewrite', 'cap'):
+                    st.warning(cost['message'])
+                if outcome['busy']:
+                    st.warning(f"{error}. Please try again in a moment.")
+                elif error:
                     st.error(f"Error executing query: {error}")
                 elif results_df is not None and not results_df.empty:
                     st.success(f"Found {len(results_df)} result(s)")
@@ -188,17 +167,28 @@ if submit_button and user_query:
                         file_name="query_results.csv",
                         mime="text/csv"
                     )
+                    
+                    # Pagination
+                    if outcome['next_cursor']:
+                        st.button(
+                            "➡️ Next page",
+                            on_click=request_next_page,
+                            args=(user_query, outcome['next_cursor'])
+                        )
                 else:
                     st.warning("No results found for your query.")
             
             with tab2:
                 st.subheader("Generated SPARQL Query")
-                st.code(sparql_query, language="sparql")
-                
-                # Copy button
-                if st.button("📋 Copy SPARQL Query"):
-                    st.code(sparql_query)
-                    st.success("You can copy the query from the code block above!")
+                if sparql_query is None:
+                    st.info("No query was run (rejected by the cost guard).")
+                else:
+                    st.code(sparql_query, language="sparql")
+                    
+                    # Copy button
+                    if st.button("📋 Copy SPARQL Query"):
+                        st.code(sparql_query)
+                        st.success("You can copy the query from the code block above!")
             
             with tab3:
                 st.subheader("NLP Processing Analysis")
@@ -256,6 +246,22 @@ if submit_button and user_query:
             with tab4:
                 st.subheader("Query Information")
                 
+                st.markdown("**Served from cache:**")
+                st.markdown(f"- `{outcome['cached']}`")
+                st.markdown("**Shared with a concurrent identical query:**")
+                st.markdown(f"- `{outcome['coalesced']}`")
+                if outcome['query_id']:
+                    st.markdown("**Query ID (trace and slow query logs):**")
+                    st.markdown(f"- `{outcome['query_id']}`")
+                
+                if cost:
+                    st.markdown("**Predicted Cost:**")
+                    st.markdown(f"- Template: `{cost['template']}`")
+                    st.markdown(f"- Estimated rows: `{cost['estimated_rows']:,}`")
+                    st.markdown(f"- Estimated intermediate rows: `{cost['estimated_work']:,}`")
+                    st.markdown(f"- Cartesian product: `{cost['cartesian']}`")
+                    st.markdown(f"- Action: `{cost['action']}`")
+                
                 st.markdown("**Query Type:**")
                 query_type = nlp_result.get('query_type', 'SELECT')
                 st.badge(query_type)
@@ -0,0 +1,359 @@
+"""
+Batch Query CLI
+
+Runs a JSONL file of queries through the pipeline on a process pool and
+writes one result record per query as it finishes. Each input line is a
+JSON object with either a natural language "query" or a "sparql" query,
+and optionally a unique "id" (the line number if omitted), "cursor" and
+"max_rows"; query log files (query_log.py) can be replayed as they are.
+
+The graph and the spaCy model are loaded once before the workers start;
+with the fork start method (Linux) the workers share them instead of
+loading their own copies. Output is NDJSON, or Parquet written as a
+directory of part files. Records carry per-query timings and an error
+field, and --resume skips the ids an interrupted run already wrote.
+
+Usage:
+    python batch_cli.py INPUT.jsonl OUTPUT.ndjson [--workers N] [--resume]
+    python batch_cli.py INPUT.jsonl OUTPUT.parquet --format parquet
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, Optional, Set
+from admission import AdmissionRejected
+from instrumentation import INSTRUMENTATION
+from pipeline import QueryPipeline, create_pipeline
+from result_shaping import row_values
+from template_registry import frame_summary
+
+BATCH_SESSION = 'batch'
+
+# Pipeline of this process (set before the pool forks, or by the worker initializer)
+_pipeline: Optional[QueryPipeline] = None
+
+
+def load_pipeline(rdf_file_path: str = None) -> QueryPipeline:
+    """Build this process's pipeline (no warm-up; batch runs are not logged)"""
+    global _pipeline
+    if _pipeline is None:
+        # Records carry the semantic frame only, never tokens or POS tags
+        _pipeline = create_pipeline(rdf_file_path, warm=False, keep_doc=False)
+    return _pipeline
+
+
+def read_jobs(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the queries of a JSONL file
+
+    Args:
+        path: Input file
+
+    Returns:
+        Iterator of job dictionaries with id, line, kind ('nl' or
+        'sparql'), query and the optional cursor and max_rows; lines that
+        are not valid jobs come back with an error instead
+    """
+    with open(path, encoding='utf-8') as input_file:
+        for number, line in enumerate(input_file, 1):
+            if not line.strip():
+                continue
+            job = {'id': str(number), 'line': number}
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield dict(job, kind=None, query=None, error="Invalid JSON")
+                continue
+            if not isinstance(item, dict):
+                yield dict(job, kind=None, query=None, error="Line is not a JSON object")
+                continue
+            if item.get('id') is not None:
+                job['id'] = str(item['id'])
+            if isinstance(item.get('sparql'), str) and item['sparql'].strip():
+                job.update(kind='sparql', query=item['sparql'])
+            elif isinstance(item.get('query'), str) and item['query'].strip():
+                job.update(kind='nl', query=item['query'])
+            else:
+                yield dict(job, kind=None, query=None, error="No 'query' or 'sparql' string")
+                continue
+            job['cursor'] = item.get('cursor')
+            job['max_rows'] = item.get('max_rows')
+            yield job
+
+
+def run_job(job: Dict[str, Any], include_rows: bool = True) -> Dict[str, Any]:
+    """
+    Answer one job in a worker process
+
+    Args:
+        job: Job from read_jobs
+        include_rows: Put the result rows in the record (only the count otherwise)
+
+    Returns:
+        Result record with id, line, kind, query, frame, template, sparql,
+        columns, rows, row_count, error, busy, timings in ms
+        (translate_ms, execute_ms, total_ms) and query_id (trace ID, None
+        when tracing is off)
+    """
+    pipeline = load_pipeline()
+    record = {
+        'id': job['id'], 'line': job['line'], 'kind': job['kind'], 'query': job['query'],
+        'frame': None, 'template': None, 'sparql': None, 'columns': None, 'rows': None,
+        'row_count': None, 'error': job.get('error'), 'busy': False,
+        'translate_ms': None, 'execute_ms': None, 'total_ms': None, 'query_id': None,
+    }
+    if record['error']:
+        return record
+
+    # One trace per job (instrumentation.py), covering translation and execution
+    with INSTRUMENTATION.trace(job['query']):
+        record['query_id'] = INSTRUMENTATION.current_query_id()
+        start = time.perf_counter()
+        try:
+            cost = None
+            if job['kind'] == 'nl':
+                translation = pipeline.translate(job['query'], job.get('cursor'))
+                record['translate_ms'] = round((time.perf_counter() - start) * 1000, 3)
+                record['frame'] = frame_summary(translation['nlp_result'])
+                sparql_query, cost = translation['sparql_query'], translation['cost']
+                if cost:
+                    record['template'] = cost['template']
+                if sparql_query is None:
+                    # Rejected by the cost guard
+                    record['error'] = cost['message']
+                    INSTRUMENTATION.annotate(status='rejected')
+                    return record
+                record['sparql'] = str(sparql_query)
+            else:
+                sparql_query = record['sparql'] = job['query']
+
+            max_rows = job.get('max_rows') or (cost['row_cap'] if cost else None)
+            execute_start = time.perf_counter()
+            results_df, error = pipeline.execute(sparql_query, max_rows, BATCH_SESSION, cost)
+            record['execute_ms'] = round((time.perf_counter() - execute_start) * 1000, 3)
+            record['error'] = error
+            if results_df is not None:
+                record['row_count'] = len(results_df)
+                record['columns'] = [str(column) for column in results_df.columns]
+                if include_rows:
+                    record['rows'] = row_values(results_df)
+        except AdmissionRejected as rejection:
+            record['error'], record['busy'] = str(rejection), True
+        except Exception as error:
+            # e.g. an invalid page cursor
+            record['error'] = str(error)
+            INSTRUMENTATION.annotate(status='error', error=str(error))
+        finally:
+            record['total_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return record
+
+
+class NDJSONWriter:
+    """Appends result records to an NDJSON file"""
+
+    def __init__(self, path: str, resume: bool):
+        if resume and os.path.exists(path):
+            self._drop_partial_line(path)
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    @staticmethod
+    def completed_ids(path: str) -> Set[str]:
+        """Ids of the records already in the file"""
+        done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as output_file:
+                for line in output_file:
+                    try:
+                        done.add(json.loads(line)['id'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        return done
+
+    @staticmethod
+    def _drop_partial_line(path: str):
+        """Cut a last line the interrupted run did not finish"""
+        with open(path, 'rb+') as output_file:
+            data = output_file.read()
+            if data and not data.endswith(b'\n'):
+                output_file.truncate(data.rfind(b'\n') + 1)
+
+    def write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, default=str) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Writes result records to a directory of Parquet part files
+
+    A part is written every part_size records (and on close), so an
+    interrupted run leaves only complete files behind. Nested fields
+    (frame, columns, rows) are stored as JSON strings.
+    """
+
+    NESTED = ('frame', 'columns', 'rows')
+
+    def __init__(self, path: str, resume: bool, part_size: int = 1000):
+        import pandas as pd
+        try:
+            import pyarrow  # noqa: F401  (pandas needs it to write Parquet)
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+        self._pd = pd
+        self.path = path
+        self.part_size = part_size
+        os.makedirs(path, exist_ok=True)
+        parts = self._parts(path)
+        if not resume:
+            for part in parts:
+                os.remove(part)
+            parts = []
+        self._next_part = len(parts)
+        self._pending = []
+
+    @staticmethod
+    def _parts(path: str):
+        if not os.path.isdir(path):
+            return []
+        return sorted(os.path.join(path, name) for name in os.listdir(path)
+                      if name.startswith('part-') and name.endswith('.parquet'))
+
+    @classmethod
+    def completed_ids(cls, path: str) -> Set[str]:
+        """Ids of the records already in the part files"""
+        import pandas as pd
+        done = set()
+        for part in cls._parts(path):
+            done.update(pd.read_parquet(part, columns=['id'])['id'])
+        return done
+
+    def write(self, record: Dict[str, Any]):
+        self._pending.append({key: json.dumps(value, default=str) if key in self.NESTED else value
+                              for key, value in record.items()})
+        if len(self._pending) >= self.part_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        part = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        # Written under a temporary name so a crash never leaves a broken part
+        self._pd.DataFrame(self._pending).to_parquet(part + '.tmp', index=False)
+        os.replace(part + '.tmp', part)
+        self._next_part += 1
+        self._pending = []
+
+    def close(self):
+        self._flush()
+
+
+def run_batch(input_path: str, output_path: str, output_format: str = 'ndjson',
+              workers: int = None, resume: bool = False, include_rows: bool = True,
+              rdf_file_path: str = None) -> Dict[str, Any]:
+    """
+    Answer every query of a JSONL file
+
+    Args:
+        input_path: Input JSONL file
+        output_path: NDJSON file, or Parquet directory
+        output_format: 'ndjson' or 'parquet'
+        workers: Worker processes (CPU count if omitted)
+        resume: Skip ids already in the output and append to it
+        include_rows: Write result rows, not just their count
+        rdf_file_path: RDF/OWL file (RDF_DATASET['file_path'] if omitted)
+
+    Returns:
+        Summary with processed, skipped, errors, seconds, throughput and
+        median / max total_ms
+    """
+    writer_class = ParquetWriter if output_format == 'parquet' else NDJSONWriter
+    writer = writer_class(output_path, resume)
+    done = writer_class.completed_ids(output_path) if resume else set()
+
+    # Load before the pool starts, so forked workers inherit the graph and model
+    load_pipeline(rdf_file_path)
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    workers = workers or os.cpu_count() or 1
+
+    counts = {'processed': 0, 'skipped': 0, 'errors': 0}
+    totals = []
+
+    def collect(record: Dict[str, Any]):
+        writer.write(record)
+        counts['processed'] += 1
+        if record['error']:
+            counts['errors'] += 1
+        if record['total_ms'] is not None:
+            totals.append(record['total_ms'])
+
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(workers, mp_context=context,
+                               initializer=load_pipeline, initargs=(rdf_file_path,))
+    try:
+        pending = set()
+        for job in read_jobs(input_path):
+            if job['id'] in done:
+                counts['skipped'] += 1
+                continue
+            # Keep a bounded number of jobs in flight instead of reading the whole file
+            if len(pending) >= workers * 4:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collect(future.result())
+            pending.add(pool.submit(run_job, job, include_rows))
+        for future in pending:
+            collect(future.result())
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+        print(f"\nInterrupted after {counts['processed']} queries; "
+              "run again with --resume to continue")
+        raise
+    pool.shutdown()
+    writer.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        **counts,
+        'seconds': round(seconds, 3),
+        'throughput': round(counts['processed'] / seconds, 1) if seconds else 0.0,
+        'median_ms': round(statistics.median(totals), 2) if totals else None,
+        'max_ms': round(max(totals), 2) if totals else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through the pipeline")
+    parser.add_argument('input', help="JSONL file with 'query' or 'sparql' per line")
+    parser.add_argument('output', help="NDJSON file, or directory for Parquet parts")
+    parser.add_argument('--format', choices=('ndjson', 'parquet'), default=None,
+                        help="output format (from the output extension by default)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip queries already in the output and append")
+    parser.add_argument('--no-rows', action='store_true', help="write row counts only")
+    parser.add_argument('--data', default=None, help="RDF/OWL file (RDF_DATASET by default)")
+    args = parser.parse_args()
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'ndjson')
+    try:
+        summary = run_batch(args.input, args.output, output_format, args.workers,
+                            args.resume, not args.no_rows, args.data)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    for key, value in summary.items():
+        print(f"{key:<12} {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmarks
+
+Run a benchmark from the project root, e.g. ``python -m benchmarks.algebra``.
+TEMPLATE_FRAMES holds one NLP frame per SPARQLGenerator template so every
+template can be exercised without loading the spaCy model.
+"""
+
+import math
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+# Benchmarks import the flat top-level modules of the project
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Sample NLP frame for each template in template_registry.TEMPLATES
+TEMPLATE_FRAMES: Dict[str, dict] = {
+    'multiple_accounts': {'classes': ['Customer', 'Account'], 'special_pattern': 'HAVING_MULTIPLE'},
+    'cross_border': {'classes': ['Transaction'], 'special_pattern': 'CROSS_BORDER'},
+    'institution_comparison': {'classes': ['Bank', 'FinTech'], 'special_pattern': 'COMPARISON'},
+    'full_chain': {'special_pattern': 'FULL_CHAIN'},
+    'both_institution_types': {'classes': ['Customer', 'Bank', 'FinTech'], 'special_pattern': 'BOTH_TYPES'},
+    'both_institution_types_exists': {'classes': ['Customer', 'Bank', 'FinTech'], 'special_pattern': 'BOTH_TYPES'},
+    'foreign_accounts': {'classes': ['Customer', 'Account'], 'special_pattern': 'FOREIGN'},
+    'loss_filter': {'classes': ['Transaction'], 'special_pattern': 'LOSS_FILTER',
+                    'comparison': {'type': 'LOSS_PERCENTAGE', 'percentage': 5}},
+    'top_customer_by_amount': {'classes': ['Customer', 'Transaction'], 'special_pattern': 'TOP'},
+    'top_fintech_by_remittances': {'classes': ['FinTech', 'Remittance'], 'special_pattern': 'TOP'},
+    'top_exchange_rates': {'classes': ['Rate'], 'special_pattern': 'TOP'},
+    'top_aggregate': {'classes': ['Account'], 'special_pattern': 'TOP'},
+    'specific_institution': {'classes': ['Transaction'], 'specific_institution': 'ICICI_Bank'},
+    'remittances_by_amount': {'classes': ['Remittance'], 'comparison': {'operator': '>', 'value': 200000}},
+    'transactions_by_amount': {'classes': ['Transaction'], 'comparison': {'operator': '>', 'value': 1000}},
+    'customers_per_bank': {'classes': ['Bank', 'Customer'], 'properties': ['serve'],
+                           'aggregation': {'type': 'COUNT', 'variable': '?cust'}},
+    'accounts_per_customer': {'classes': ['Customer', 'Account'],
+                              'aggregation': {'type': 'COUNT', 'variable': '?acc'},
+                              'order_by': {'variable': '?NumAcc', 'direction': 'DESC'}},
+    'transactions_per_currency': {'classes': ['Currency', 'Transaction'],
+                                  'aggregation': {'type': 'COUNT', 'variable': '?txn'}},
+    'customer_count': {'classes': ['Customer'], 'filters': {'basedIn': 'India'},
+                       'aggregation': {'type': 'COUNT', 'variable': '?cust'}},
+    'transaction_count': {'classes': ['Transaction'], 'aggregation': {'type': 'COUNT', 'variable': '?txn'}},
+    'item_count': {'aggregation': {'type': 'COUNT', 'variable': '?item'}},
+    'remittances_by_fintech': {'classes': ['Remittance', 'FinTech'], 'properties': ['processedBy']},
+    'remittance_initiators': {'classes': ['Customer', 'Remittance'], 'properties': ['initiatedBy']},
+    'transaction_initiators': {'classes': ['Customer', 'Transaction'], 'properties': ['initiatedBy']},
+    'processing_institutions': {'classes': ['Transaction', 'Institution'], 'properties': ['processedBy']},
+    'transactions_by_status': {'classes': ['Transaction'], 'filters': {'status': 'Completed'}},
+    'transactions_by_currency': {'classes': ['Transaction'],
+                                 'filters': {'fromCurrency': 'USD', 'toCurrency': 'INR'}},
+    'list_remittances': {'classes': ['Remittance']},
+    'list_transactions': {'classes': ['Transaction']},
+    'customer_currency_pairs': {'classes': ['Customer', 'Currency', 'Transaction'],
+                                'filters': {'basedIn': 'India'}},
+    'list_customers': {'classes': ['Customer'], 'filters': {'basedIn': 'India'}},
+    'list_institutions': {'classes': ['Bank'], 'filters': {'basedIn': 'India'}},
+    'list_accounts': {'classes': ['Account']},
+    'default_customers': {},
+    'default_labels': {'classes': ['Currency']},
+    'default_instances': {'classes': ['Rate']},
+}
+
+
+def dataset_path() -> str:
+    """Path of the configured RDF dataset"""
+    from config import RDF_DATASET
+    return os.path.join(PROJECT_ROOT, RDF_DATASET['file_path'])
+
+
+def time_call(func: Callable[[], object], repeat: int) -> List[float]:
+    """
+    Time repeated calls
+
+    Args:
+        func: Function to call
+        repeat: Number of calls
+
+    Returns:
+        Duration of each call in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def median(values: List[float]) -> float:
+    """Median of a non-empty list"""
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (0-100) of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
@@ -0,0 +1,74 @@
+"""
+Text vs algebra microbenchmark
+
+For every SPARQLGenerator template, compares evaluating the generated
+query text (parsed by rdflib on every call) against algebra mode (the
+generator hands rdflib a cached, prepared query). Results of both modes
+are checked to be identical.
+
+Usage:
+    python -m benchmarks.algebra [--repeat N] [--template NAME ...]
+"""
+
+import argparse
+from rdflib import Graph
+from rdflib.plugins.sparql import prepareQuery
+from benchmarks import TEMPLATE_FRAMES, dataset_path, median, time_call
+from sparql_generator import SPARQLGenerator
+
+
+def run(repeat: int = 20, templates: list = None):
+    """
+    Benchmark templates and print a table of median timings
+
+    Args:
+        repeat: Timed runs per template and mode
+        templates: Template names to run (all registered ones if omitted)
+    """
+    graph = Graph()
+    graph.parse(dataset_path(), format='xml')
+    text_generator = SPARQLGenerator(algebra=False)
+    algebra_generator = SPARQLGenerator(algebra=True)
+    names = templates or text_generator.registry.names()
+
+    print(f"{len(graph)} triples, {repeat} runs per mode (median ms)\n")
+    print(f"{'template':<28} {'parse':>8} {'text':>8} {'algebra':>8} {'speedup':>8}")
+    totals = [0.0, 0.0]
+    for name in names:
+        frame = TEMPLATE_FRAMES.get(name)
+        if frame is None:
+            print(f"{name:<28} no sample frame in benchmarks.TEMPLATE_FRAMES")
+            continue
+
+        text_query = text_generator.generate_with(name, frame)
+        algebra_query = algebra_generator.generate_with(name, frame)
+        if list(graph.query(text_query)) != list(graph.query(algebra_query.prepared)):
+            raise AssertionError(f"Results differ between modes for {name}")
+
+        parse_ms = median(time_call(lambda: prepareQuery(text_query), repeat))
+        text_ms = median(time_call(
+            lambda: list(graph.query(text_generator.generate_with(name, frame))), repeat))
+        algebra_ms = median(time_call(
+            lambda: list(graph.query(algebra_generator.generate_with(name, frame).prepared)),
+            repeat))
+        totals[0] += text_ms
+        totals[1] += algebra_ms
+        print(f"{name:<28} {parse_ms:>8.2f} {text_ms:>8.2f} {algebra_ms:>8.2f} "
+              f"{text_ms / algebra_ms:>7.1f}x")
+
+    if totals[1]:
+        print(f"\n{'total':<28} {'':>8} {totals[0]:>8.2f} {totals[1]:>8.2f} "
+              f"{totals[0] / totals[1]:>7.1f}x")
+    print(f"algebra cache: {algebra_generator.algebra.get_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help="timed runs per template and mode")
+    parser.add_argument('--template', action='append', help="only run this template (repeatable)")
+    args = parser.parse_args()
+    run(args.repeat, args.template)
+
+
+if __name__ == '__main__':
+    main()
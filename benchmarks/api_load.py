@@ -0,0 +1,167 @@
+"""
+HTTP API load test client
+
+Sends requests to a running api_server.py from concurrent keep-alive
+connections (closed loop: each connection sends its next request when
+the previous response is complete) and reports throughput, latency
+percentiles and response status codes.
+
+Usage:
+    python api_server.py &
+    python -m benchmarks.api_load [--url URL] [--concurrency N] [--requests N]
+                                  [--endpoint nl2sparql|sparql|batch] [--ndjson]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+from benchmarks import TEMPLATE_FRAMES, median, percentile
+from config import API_CONFIG, EXAMPLE_QUERIES
+
+
+def request_bodies(endpoint: str) -> List[dict]:
+    """Request bodies cycled through by the load test"""
+    if endpoint == 'sparql':
+        from sparql_generator import SPARQLGenerator
+        generator = SPARQLGenerator(algebra=False)
+        return [{'sparql': str(generator.generate_with(name, frame))}
+                for name, frame in TEMPLATE_FRAMES.items()]
+    if endpoint == 'batch':
+        return [{'queries': list(EXAMPLE_QUERIES)}]
+    return [{'query': query} for query in EXAMPLE_QUERIES]
+
+
+async def send(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str,
+               path: str, body: dict, accept: str,
+               headers: Dict[str, str] = None) -> Tuple[int, int, bool]:
+    """
+    Send one POST request and read the whole response
+
+    Args:
+        headers: Extra request headers (e.g. X-Session-Id)
+
+    Returns:
+        Tuple of (status code, body bytes, whether the server keeps the connection)
+    """
+    payload = json.dumps(body).encode('utf-8')
+    extra = ''.join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\nAccept: {accept}\r\n{extra}"
+                  f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+                  ).encode('latin-1') + payload)
+    await writer.drain()
+
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    status = int(head[0].split(' ')[1])
+    headers = {}
+    for line in head[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+    size = 0
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            length = int((await reader.readuntil(b'\r\n')).strip(), 16)
+            await reader.readexactly(length + 2)
+            size += length
+            if not length:
+                break
+    else:
+        size = int(headers.get('content-length', 0))
+        await reader.readexactly(size)
+    return status, size, headers.get('connection') != 'close'
+
+
+async def run(url: str, concurrency: int, total: int, endpoint: str,
+              ndjson: bool = False) -> Dict[str, object]:
+    """
+    Run the load test
+
+    Args:
+        url: Base URL of the API server
+        concurrency: Concurrent connections
+        total: Requests to send in total
+        endpoint: nl2sparql, sparql or batch
+        ndjson: Ask for NDJSON instead of JSON responses
+
+    Returns:
+        Report with request count, duration, throughput, latency
+        percentiles (ms), status counts and received bytes
+    """
+    address = urlsplit(url)
+    host, port = address.hostname, address.port or 80
+    path = f"/{endpoint}"
+    accept = 'application/x-ndjson' if ndjson else 'application/json'
+    bodies = itertools.cycle(request_bodies(endpoint))
+    remaining = iter(range(total))
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    received = [0]
+
+    async def worker():
+        reader = writer = None
+        for _ in remaining:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            try:
+                status, size, keep_alive = await send(reader, writer, f"{host}:{port}",
+                                                      path, next(bodies), accept)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                statuses['connection error'] += 1
+                writer.close()
+                writer = None
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] += 1
+            received[0] += size
+            if not keep_alive:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+
+    report = {
+        'requests': total,
+        'concurrency': concurrency,
+        'seconds': round(duration, 3),
+        'throughput': round(len(latencies) / duration, 1) if duration else 0.0,
+        'statuses': dict(statuses),
+        'bytes': received[0],
+    }
+    if latencies:
+        report.update({
+            'p50_ms': round(median(latencies), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(max(latencies), 2),
+        })
+    return report
+
+
+def main():
+    default_url = f"http://{API_CONFIG.get('host', '127.0.0.1')}:{API_CONFIG.get('port', 8765)}"
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=default_url, help="API server base URL")
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent connections")
+    parser.add_argument('--requests', type=int, default=200, help="requests in total")
+    parser.add_argument('--endpoint', default='nl2sparql', choices=('nl2sparql', 'sparql', 'batch'))
+    parser.add_argument('--ndjson', action='store_true', help="request NDJSON responses")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.concurrency, args.requests, args.endpoint, args.ndjson))
+    for key, value in report.items():
+        print(f"{key:<12} {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,460 @@
+"""
+Golden-output regression suite with per-template budgets
+
+Answers a corpus of questions (benchmarks/golden_queries.txt plus the
+example queries of config.py and test_queries.py) the way the app does,
+through NLP, SPARQL generation with the cost guard and execution, and
+compares every answer with the stored golden output:
+
+    frame        the fields of the NLP result that shape the query
+    sparql       the generated query text
+    result       column names, row count and a fingerprint of the rows
+
+Every query class (the template a question is answered with) also has a
+latency budget (best of --repeat runs of translating and executing a
+question) and an allocation budget (tracemalloc peak of one run). check
+fails on any semantic difference, on a question over its class budget
+and on questions without golden output.
+
+Frames depend on the spaCy model (lemmas and POS tags, on the fast path
+too), so the golden file pins the model it was recorded with, name and
+version. check refuses to run against another model, and update only
+records with the model of config.NLP_CONFIG (a new version re-pins).
+
+update records the current answers as golden after a change was reviewed
+as intended. Budgets are the worst measured value of a class times
+BUDGET_FACTOR (at least the MIN_* floors); they are set for new classes
+only, or for every class with --budgets.
+
+Usage:
+    python -m benchmarks.golden check [--repeat N] [--no-budgets] [--golden FILE]
+    python -m benchmarks.golden update [--repeat N] [--budgets] [--golden FILE]
+"""
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+import rdflib
+import spacy
+from benchmarks import PROJECT_ROOT, dataset_path
+from config import EXAMPLE_QUERIES, NLP_CONFIG, QUICK_EXAMPLES, SIDEBAR_EXAMPLES
+from pipeline import QueryPipeline, create_pipeline
+from result_shaping import row_values
+from template_registry import frame_summary
+from test_queries import TEST_QUERIES
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(BENCHMARKS_DIR, 'golden_queries.txt')
+GOLDEN_PATH = os.path.join(BENCHMARKS_DIR, 'golden.json')
+
+# Budget = worst measured value of the class * BUDGET_FACTOR, at least the floor
+BUDGET_FACTOR = 3.0
+MIN_LATENCY_BUDGET_MS = 5.0
+MIN_ALLOCATION_BUDGET_KB = 256
+
+# Query class of questions the cost guard rejects (or nothing matched)
+REJECTED = 'rejected'
+
+# Lines of a SPARQL diff printed per question
+MAX_DIFF_LINES = 30
+
+# Exit status when the loaded spaCy model is not the one the golden output needs
+MODEL_MISMATCH = 2
+
+
+def corpus(path: str = CORPUS_PATH) -> List[str]:
+    """
+    Questions of the suite, without duplicates
+
+    Args:
+        path: Question file (one per line, # starts a comment)
+
+    Returns:
+        The example queries of the app and test_queries.py, then the
+        questions of the file
+    """
+    questions = list(EXAMPLE_QUERIES)
+    for examples in SIDEBAR_EXAMPLES.values():
+        questions.extend(examples)
+    questions.extend(query for _, query in QUICK_EXAMPLES)
+    questions.extend(TEST_QUERIES)
+    with open(path, encoding='utf-8') as corpus_file:
+        for line in corpus_file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                questions.append(line)
+
+    seen = set()
+    unique = []
+    for question in questions:
+        question = ' '.join(question.split())
+        if question not in seen:
+            seen.add(question)
+            unique.append(question)
+    return unique
+
+
+def model_identity(nlp) -> Dict[str, str]:
+    """Package name and version of a loaded spaCy pipeline"""
+    return {'name': f"{nlp.lang}_{nlp.meta.get('name')}", 'version': nlp.meta.get('version')}
+
+
+def model_mismatch(golden: Dict[str, Any], model: Dict[str, str]) -> Optional[str]:
+    """
+    Why a golden output cannot be checked with a spaCy model
+
+    Args:
+        golden: Stored golden output
+        model: model_identity of the loaded pipeline
+
+    Returns:
+        Message, or None if the golden output is pinned to this model
+    """
+    pin = golden['meta'].get('spacy_model')
+    if pin == model:
+        return None
+    return (f"golden output was recorded with {describe_model(pin)}, this run loads "
+            f"{describe_model(model)}")
+
+
+def describe_model(model: Optional[Dict[str, str]]) -> str:
+    if not isinstance(model, dict):
+        return f"an unpinned model ({model})"
+    return f"{model['name']} {model['version']}"
+
+
+def fingerprint(df) -> Dict[str, Any]:
+    """Columns, row count and a hash of the rows (in order) of a result"""
+    if df is None:
+        return None
+    rows = json.dumps(row_values(df), default=str, ensure_ascii=False)
+    return {
+        'columns': [str(column) for column in df.columns],
+        'rows': len(df),
+        'sha256': hashlib.sha256(rows.encode('utf-8')).hexdigest(),
+    }
+
+
+class GoldenRunner:
+    """Answers and measures questions of the suite"""
+
+    def __init__(self, pipeline: QueryPipeline):
+        self.pipeline = pipeline
+
+    def answer(self, question: str) -> Dict[str, Any]:
+        """
+        Answer a question
+
+        Args:
+            question: Natural language question
+
+        Returns:
+            Golden entry with class (template or 'rejected'), action (cost
+            guard decision), frame, sparql, result (fingerprint) and error
+        """
+        translation = self.pipeline.translate(question)
+        cost = translation['cost']
+        sparql = translation['sparql_query']
+        df, error = self._execute(sparql, cost)
+        if sparql is None:
+            error = cost['message'] if cost else "No query generated"
+        # Round trip through JSON so entries compare equal to loaded ones
+        frame = json.loads(json.dumps(frame_summary(translation['nlp_result']), default=str))
+        return {
+            'class': cost['template'] if cost and sparql is not None else REJECTED,
+            'action': cost['action'] if cost else None,
+            'frame': frame,
+            'sparql': str(sparql) if sparql is not None else None,
+            'result': fingerprint(df),
+            'error': error,
+        }
+
+    def measure(self, question: str, repeat: int) -> Tuple[float, float]:
+        """
+        Latency and allocation of answering a question (after a warm run)
+
+        Args:
+            question: Natural language question
+            repeat: Timed runs (the best one counts)
+
+        Returns:
+            Tuple of (best latency in ms, peak allocation in KB)
+        """
+        self._run(question)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self._run(question)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+
+        tracemalloc.start()
+        try:
+            self._run(question)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return round(best, 3), round(peak / 1024, 1)
+
+    def _run(self, question: str):
+        translation = self.pipeline.translate(question)
+        self._execute(translation['sparql_query'], translation['cost'])
+
+    def _execute(self, sparql, cost: Optional[Dict[str, Any]]):
+        """Run a translated query as the pipeline does, without the result cache"""
+        if sparql is None:
+            return None, None
+        return self.pipeline.rdf_executor.execute(sparql, cost['row_cap'] if cost else None)
+
+
+def load_pipeline(data_path: str = None) -> QueryPipeline:
+    """Pipeline the suite runs on (no warm-up, no spaCy Docs kept)"""
+    return create_pipeline(data_path or dataset_path(), warm=False, keep_doc=False)
+
+
+def run(pipeline: QueryPipeline, questions: List[str], repeat: int = 5,
+        measure: bool = True) -> Dict[str, Any]:
+    """
+    Answer (and measure) every question
+
+    Args:
+        pipeline: Pipeline from load_pipeline
+        questions: Questions of the suite
+        repeat: Timed runs per question
+        measure: Also measure latency and allocation
+
+    Returns:
+        Dictionary with meta, queries (golden entry per question) and
+        measurements (latency_ms and allocation_kb per question)
+    """
+    runner = GoldenRunner(pipeline)
+    queries = {}
+    measurements = {}
+    for question in questions:
+        queries[question] = runner.answer(question)
+        if measure:
+            latency, allocation = runner.measure(question, repeat)
+            measurements[question] = {'latency_ms': latency, 'allocation_kb': allocation}
+
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'spacy_model': model_identity(pipeline.nlp_processor.nlp),
+            'spacy': spacy.__version__,
+            'rdflib': rdflib.__version__,
+            'dataset': os.path.relpath(pipeline.rdf_executor.rdf_file_path, PROJECT_ROOT),
+            'triples': len(pipeline.rdf_executor.graph),
+            'repeat': repeat,
+        },
+        'queries': queries,
+        'measurements': measurements,
+    }
+
+
+def derive_budgets(report: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Budgets per query class from the measurements of a run"""
+    worst: Dict[str, Dict[str, float]] = {}
+    for question, measured in report['measurements'].items():
+        query_class = report['queries'][question]['class']
+        current = worst.setdefault(query_class, {'latency_ms': 0.0, 'allocation_kb': 0.0})
+        for key in current:
+            current[key] = max(current[key], measured[key])
+
+    return {
+        query_class: {
+            'latency_ms': round(max(values['latency_ms'] * BUDGET_FACTOR, MIN_LATENCY_BUDGET_MS), 1),
+            'allocation_kb': round(max(values['allocation_kb'] * BUDGET_FACTOR,
+                                       MIN_ALLOCATION_BUDGET_KB)),
+            'measured_latency_ms': values['latency_ms'],
+            'measured_allocation_kb': values['allocation_kb'],
+        }
+        for query_class, values in sorted(worst.items())
+    }
+
+
+def semantic_diff(expected: Dict[str, Any], actual: Dict[str, Any]) -> List[str]:
+    """
+    Differences between a golden entry and a new answer
+
+    Returns:
+        One line per difference (empty if the answers match)
+    """
+    lines = []
+    for field in ('class', 'action', 'error'):
+        if expected.get(field) != actual[field]:
+            lines.append(f"{field}: {expected.get(field)!r} -> {actual[field]!r}")
+
+    expected_frame = expected.get('frame') or {}
+    for field in sorted(set(expected_frame) | set(actual['frame'])):
+        if expected_frame.get(field) != actual['frame'].get(field):
+            lines.append(f"frame {field}: {expected_frame.get(field)!r} -> "
+                         f"{actual['frame'].get(field)!r}")
+
+    if expected.get('sparql') != actual['sparql']:
+        diff = list(difflib.unified_diff((expected.get('sparql') or '').splitlines(),
+                                         (actual['sparql'] or '').splitlines(),
+                                         'golden', 'current', lineterm='', n=1))
+        lines.append("sparql:")
+        lines.extend(f"  {line}" for line in diff[:MAX_DIFF_LINES])
+        if len(diff) > MAX_DIFF_LINES:
+            lines.append(f"  ... {len(diff) - MAX_DIFF_LINES} more lines")
+
+    expected_result, result = expected.get('result'), actual['result']
+    if expected_result != result:
+        if expected_result and result and expected_result['columns'] != result['columns']:
+            lines.append(f"result columns: {expected_result['columns']} -> {result['columns']}")
+        else:
+            lines.append(f"result: {describe(expected_result)} -> {describe(result)}")
+    return lines
+
+
+def describe(result: Optional[Dict[str, Any]]) -> str:
+    if result is None:
+        return "no result"
+    return f"{result['rows']} rows ({result['sha256'][:12]})"
+
+
+def budget_overruns(golden: Dict[str, Any], report: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Budget overruns per question (classes without budgets are overruns too)"""
+    budgets = golden.get('budgets', {})
+    overruns: Dict[str, List[str]] = {}
+    for question, measured in report['measurements'].items():
+        query_class = report['queries'][question]['class']
+        budget = budgets.get(query_class)
+        if budget is None:
+            overruns[question] = [f"no budget for class {query_class} "
+                                  f"(run update to add it)"]
+            continue
+        problems = []
+        if measured['latency_ms'] > budget['latency_ms']:
+            problems.append(f"latency {measured['latency_ms']:.2f} ms over the "
+                            f"{query_class} budget of {budget['latency_ms']:.1f} ms")
+        if measured['allocation_kb'] > budget['allocation_kb']:
+            problems.append(f"allocation {measured['allocation_kb']:.0f} KB over the "
+                            f"{query_class} budget of {budget['allocation_kb']:.0f} KB")
+        if problems:
+            overruns[question] = problems
+    return overruns
+
+
+def check(golden: Dict[str, Any], report: Dict[str, Any]) -> int:
+    """
+    Compare a run with the golden output and print the differences
+
+    Args:
+        golden: Stored golden output
+        report: Result of run
+
+    Returns:
+        Exit status (1 on any difference, overrun or missing question,
+        MODEL_MISMATCH if the run used another spaCy model)
+    """
+    mismatch = model_mismatch(golden, report['meta']['spacy_model'])
+    if mismatch:
+        print(f"Refusing to check: {mismatch} (install the pinned model)")
+        return MODEL_MISMATCH
+    for key in ('spacy', 'rdflib', 'dataset', 'triples'):
+        if golden['meta'].get(key) != report['meta'][key]:
+            print(f"warning: golden output was recorded with {key} "
+                  f"{golden['meta'].get(key)}, this run uses {report['meta'][key]}")
+
+    expected = golden['queries']
+    missing = [question for question in report['queries'] if question not in expected]
+    stale = [question for question in expected if question not in report['queries']]
+    diffs = {question: semantic_diff(expected[question], answer)
+             for question, answer in report['queries'].items() if question in expected}
+    diffs = {question: lines for question, lines in diffs.items() if lines}
+    overruns = budget_overruns(golden, report)
+
+    for question in report['queries']:
+        problems = diffs.get(question, []) + overruns.get(question, [])
+        if question in missing:
+            problems = ["no golden output (run update to record it)"] + overruns.get(question, [])
+        if problems:
+            print(f"\n{question!r}")
+            for line in problems:
+                print(f"  {line}")
+    for question in stale:
+        print(f"warning: golden question no longer in the corpus: {question!r}")
+
+    print(f"\n{len(report['queries'])} questions: {len(diffs)} semantic diff(s), "
+          f"{len(overruns)} over budget, {len(missing)} without golden output")
+    return 1 if diffs or overruns or missing else 0
+
+
+def save(golden: Dict[str, Any], path: str):
+    with open(path, 'w', encoding='utf-8') as golden_file:
+        json.dump(golden, golden_file, indent=2, ensure_ascii=False)
+        golden_file.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    check_parser = commands.add_parser('check', help="compare with the golden output")
+    check_parser.add_argument('--no-budgets', action='store_true',
+                              help="only compare answers, skip latency and allocation")
+    update_parser = commands.add_parser('update', help="record the current answers as golden")
+    update_parser.add_argument('--budgets', action='store_true',
+                               help="re-derive the budgets of every class")
+    for command in (check_parser, update_parser):
+        command.add_argument('--repeat', type=int, default=5, help="timed runs per question")
+        command.add_argument('--data', help="dataset file (RDF_DATASET by default)")
+        command.add_argument('--corpus', default=CORPUS_PATH, help="question file")
+        command.add_argument('--golden', default=GOLDEN_PATH, help="golden output file")
+    args = parser.parse_args()
+
+    exists = os.path.exists(args.golden)
+    if args.command == 'check' and not exists:
+        print(f"No golden output at {args.golden}; record it with "
+              f"`python -m benchmarks.golden update`")
+        sys.exit(1)
+    golden = None
+    if exists:
+        with open(args.golden, encoding='utf-8') as golden_file:
+            golden = json.load(golden_file)
+
+    pipeline = load_pipeline(args.data)
+    model = model_identity(pipeline.nlp_processor.nlp)
+    if args.command == 'check':
+        mismatch = model_mismatch(golden, model)
+        if mismatch:
+            print(f"Refusing to check: {mismatch} (install the pinned model)")
+            sys.exit(MODEL_MISMATCH)
+    elif model['name'] != NLP_CONFIG['model']:
+        print(f"Refusing to record: golden output is recorded with {NLP_CONFIG['model']}, "
+              f"this run loads {describe_model(model)}")
+        sys.exit(MODEL_MISMATCH)
+
+    questions = corpus(args.corpus)
+    print(f"Answering {len(questions)} questions...")
+    measure = args.command == 'update' or not args.no_budgets
+    report = run(pipeline, questions, args.repeat, measure)
+
+    if args.command == 'check':
+        sys.exit(check(golden, report))
+
+    if golden and model_mismatch(golden, model):
+        print(f"Re-pinning: {model_mismatch(golden, model)} (re-derive the budgets "
+              f"with --budgets if the model is slower)")
+    budgets = derive_budgets(report)
+    if golden and not args.budgets:
+        # Keep reviewed budgets; only classes seen for the first time get new ones
+        budgets = {**budgets, **golden.get('budgets', {})}
+    save({'meta': report['meta'], 'budgets': dict(sorted(budgets.items())),
+          'queries': report['queries']}, args.golden)
+    print(f"saved {len(report['queries'])} questions and {len(budgets)} class budgets "
+          f"to {args.golden} ({describe_model(model)})")
+
+
+if __name__ == '__main__':
+    main()
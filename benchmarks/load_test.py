@@ -0,0 +1,514 @@
+"""
+Concurrent-session load test with a local stand-in server
+
+Simulates analyst sessions asking a weighted mix of questions and finds
+the load one box sustains. Targets:
+
+    inprocess    QueryPipeline.run, one worker thread per request in flight
+    http         POST /nl2sparql to --url, or to an api_server started in
+                 this process on a free local port when --url is omitted
+
+Arrival models:
+
+    closed       --sessions N analysts, each asking its next question once
+                 the previous answer arrived (after --think-ms on average)
+    open         questions arrive at --rates per second (Poisson), answered
+                 or not; latency counts from the arrival, so queueing
+                 behind a saturated server shows up in it
+
+Every comma-separated level of --sessions or --rates runs for --duration
+seconds and reports throughput, latency percentiles and outcomes: ok,
+busy (turned away by admission control), error (failed or rejected by
+the cost guard), timeout, dropped (open loop, over --max-in-flight) and
+connection error. Busy, timeout, dropped and connection errors are shed
+load. The saturation point is the first level that sheds more than
+--max-shed of its requests, exceeds the --slo-ms p95 objective, falls
+behind the arrival rate (open) or adds sessions past the throughput peak
+(closed); the level before it is the highest sustained load.
+
+Mix files have one question per line, optionally preceded by a weight
+and a tab ("3<TAB>List all customers"); # starts a comment. The example
+queries of config.py are the default mix.
+
+Usage:
+    python -m benchmarks.load_test [--target inprocess|http] [--url URL]
+        [--model closed|open] [--sessions 1,2,4,8] [--rates 5,10,20]
+        [--duration 10] [--think-ms 0] [--mix FILE] [--no-cache] [--save FILE]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from benchmarks import median, percentile
+from benchmarks.api_load import send
+from config import EXAMPLE_QUERIES
+from pipeline import QueryPipeline, create_pipeline
+
+# Outcomes that mean the target turned load away rather than answered it
+SHED = ('busy', 'timeout', 'dropped', 'connection error')
+
+# A closed-loop level that adds less throughput than this is saturated
+MIN_THROUGHPUT_GAIN = 0.05
+
+# An open-loop level answering less than this share of the offered rate is saturated
+MIN_RATE_SHARE = 0.9
+
+
+def load_mix(path: str = None) -> Tuple[List[str], List[float]]:
+    """
+    Questions of the load and their weights
+
+    Args:
+        path: Mix file (the example queries of config.py if omitted)
+
+    Returns:
+        Tuple of (questions, cumulative weights for random.choices)
+    """
+    if path is None:
+        return list(EXAMPLE_QUERIES), list(itertools.accumulate(1.0 for _ in EXAMPLE_QUERIES))
+    questions, weights = [], []
+    with open(path, encoding='utf-8') as mix_file:
+        for number, line in enumerate(mix_file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            weight, tab, question = line.partition('\t')
+            if not tab:
+                weight, question = '1', line
+            try:
+                weights.append(float(weight))
+            except ValueError:
+                raise ValueError(f"{path}:{number}: weight {weight!r} is not a number") from None
+            questions.append(question.strip())
+    if not questions:
+        raise ValueError(f"{path} has no questions")
+    return questions, list(itertools.accumulate(weights))
+
+
+class InProcessTarget:
+    """Answers questions with a pipeline in this process"""
+
+    name = 'inprocess'
+
+    def __init__(self, pipeline: QueryPipeline, workers: int, timeout: float):
+        self.pipeline = pipeline
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='load')
+        self.timeout = timeout
+
+    async def ask(self, session: int, question: str) -> str:
+        """Answer a question as a session; returns the outcome"""
+        call = partial(self.pipeline.run, question, session=f"load-{session}", record=False)
+        future = asyncio.get_running_loop().run_in_executor(self.executor, call)
+        try:
+            outcome = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            return 'timeout'
+        if outcome['busy']:
+            return 'busy'
+        return 'error' if outcome['error'] else 'ok'
+
+    async def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class HTTPTarget:
+    """Asks an API server over keep-alive connections"""
+
+    name = 'http'
+
+    def __init__(self, url: str, timeout: float):
+        address = urlsplit(url)
+        self.host, self.port = address.hostname, address.port or 80
+        self.url = url
+        self.timeout = timeout
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def ask(self, session: int, question: str) -> str:
+        """Send a question as a session; returns the outcome"""
+        try:
+            if self._idle:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+        except OSError:
+            return 'connection error'
+        try:
+            status, _, keep_alive = await asyncio.wait_for(
+                send(reader, writer, f"{self.host}:{self.port}", '/nl2sparql',
+                     {'query': question}, 'application/json', {'X-Session-Id': f"load-{session}"}),
+                self.timeout)
+        except asyncio.TimeoutError:
+            writer.close()
+            return 'timeout'
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return 'connection error'
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        if status == 200:
+            return 'ok'
+        return 'busy' if status == 503 else 'error'
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+            await writer.wait_closed()
+        self._idle.clear()
+
+
+class LevelRecorder:
+    """Latencies and outcomes of one load level"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.started = time.perf_counter()
+
+    def record(self, started: float, outcome: str):
+        # Latency of answers only; shed requests return early and would hide queueing
+        if outcome not in SHED:
+            self.latencies.append((time.perf_counter() - started) * 1000)
+        self.outcomes[outcome] += 1
+
+    def report(self, **level) -> Dict[str, Any]:
+        """Level summary: throughput (answers/s), latency percentiles (ms) and rates"""
+        seconds = time.perf_counter() - self.started
+        requests = sum(self.outcomes.values())
+        shed = sum(self.outcomes[name] for name in SHED)
+        report = {
+            **level,
+            'requests': requests,
+            'seconds': round(seconds, 3),
+            'throughput': round((requests - shed) / seconds, 1) if seconds else 0.0,
+            'outcomes': dict(self.outcomes),
+            'error_rate': round((requests - self.outcomes['ok']) / requests, 4) if requests else 0.0,
+            'shed_rate': round(shed / requests, 4) if requests else 0.0,
+        }
+        if self.latencies:
+            report.update({
+                'p50_ms': round(median(self.latencies), 2),
+                'p95_ms': round(percentile(self.latencies, 95), 2),
+                'p99_ms': round(percentile(self.latencies, 99), 2),
+                'max_ms': round(max(self.latencies), 2),
+            })
+        return report
+
+
+async def closed_loop(target, mix: Tuple[List[str], List[float]], sessions: int,
+                      duration: float, think_ms: float, seed: int) -> Dict[str, Any]:
+    """
+    Run sessions that each ask their next question after an answer
+
+    Args:
+        target: InProcessTarget or HTTPTarget
+        mix: Result of load_mix
+        sessions: Concurrent sessions
+        duration: Seconds to start new questions for
+        think_ms: Mean pause between an answer and the next question
+        seed: Seed of the question and think-time sequences
+
+    Returns:
+        Level report
+    """
+    questions, weights = mix
+    recorder = LevelRecorder()
+    deadline = recorder.started + duration
+
+    async def session(index: int):
+        rng = random.Random(seed * 1000003 + index)
+        while time.perf_counter() < deadline:
+            question = rng.choices(questions, cum_weights=weights)[0]
+            started = time.perf_counter()
+            recorder.record(started, await target.ask(index, question))
+            if think_ms:
+                await asyncio.sleep(rng.expovariate(1000 / think_ms))
+
+    await asyncio.gather(*(session(index) for index in range(sessions)))
+    return recorder.report(model='closed', sessions=sessions)
+
+
+async def open_loop(target, mix: Tuple[List[str], List[float]], rate: float, sessions: int,
+                    duration: float, max_in_flight: int, seed: int) -> Dict[str, Any]:
+    """
+    Send questions at Poisson arrival times regardless of answers
+
+    Args:
+        target: InProcessTarget or HTTPTarget
+        mix: Result of load_mix
+        rate: Offered questions per second
+        sessions: Sessions the arrivals are spread over (round robin)
+        duration: Seconds of arrivals
+        max_in_flight: Arrivals beyond this many unanswered are dropped
+        seed: Seed of the question and arrival sequences
+
+    Returns:
+        Level report
+    """
+    questions, weights = mix
+    rng = random.Random(seed)
+    recorder = LevelRecorder()
+    deadline = recorder.started + duration
+    in_flight = set()
+
+    async def arrival(index: int, question: str, arrived: float):
+        recorder.record(arrived, await target.ask(index % sessions, question))
+
+    arrival_time = recorder.started
+    for index in itertools.count():
+        arrival_time += rng.expovariate(rate)
+        if arrival_time >= deadline:
+            break
+        delay = arrival_time - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        question = rng.choices(questions, cum_weights=weights)[0]
+        if len(in_flight) >= max_in_flight:
+            recorder.outcomes['dropped'] += 1
+            continue
+        task = asyncio.ensure_future(arrival(index, question, arrival_time))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    arrivals = sum(recorder.outcomes.values())
+    return recorder.report(model='open', rate=rate, arrival_rate=round(arrivals / duration, 1),
+                           sessions=sessions)
+
+
+def saturation(levels: List[Dict[str, Any]], max_shed: float = 0.01,
+               slo_ms: float = None) -> Dict[str, Any]:
+    """
+    Saturation point of a sweep
+
+    A level is overloaded when it sheds more than max_shed of its
+    requests, its p95 exceeds slo_ms, or (open loop) it answers less than
+    MIN_RATE_SHARE of the questions that arrived. Below the first
+    overloaded level, a closed loop saturates at the level after the knee:
+    the first level within MIN_THROUGHPUT_GAIN of the peak throughput,
+    beyond which more sessions only add latency.
+
+    Args:
+        levels: Level reports in increasing load
+        max_shed: Largest acceptable share of shed requests
+        slo_ms: p95 latency objective (ignored if None)
+
+    Returns:
+        Dictionary with saturated_at (first saturated level, None if none
+        was), reason, and sustained / sustained_throughput (the level
+        before it and its throughput)
+    """
+    healthy = []
+    overload = None
+    for level in levels:
+        if level['shed_rate'] > max_shed:
+            overload = f"{level['shed_rate']:.1%} of requests shed"
+        elif slo_ms is not None and level.get('p95_ms', 0) > slo_ms:
+            overload = f"p95 {level['p95_ms']:.1f} ms over the {slo_ms:g} ms objective"
+        elif level['model'] == 'open' and level['throughput'] < level['arrival_rate'] * MIN_RATE_SHARE:
+            overload = (f"answered {level['throughput']:.1f} of {level['arrival_rate']:.1f} "
+                        f"questions/s that arrived")
+        if overload:
+            break
+        healthy.append(level)
+
+    saturated = levels[len(healthy)] if overload else None
+    if healthy and healthy[0]['model'] == 'closed':
+        peak = max(level['throughput'] for level in healthy)
+        knee = next(index for index, level in enumerate(healthy)
+                    if level['throughput'] * (1 + MIN_THROUGHPUT_GAIN) >= peak)
+        if knee + 1 < len(healthy):
+            saturated = healthy[knee + 1]
+            overload = (f"throughput stays at {healthy[knee]['throughput']:.1f} questions/s "
+                        f"(peak {peak:.1f}) from {healthy[knee]['sessions']} sessions on")
+            healthy = healthy[:knee + 1]
+
+    sustained = healthy[-1] if healthy else None
+    return {
+        'saturated_at': load_level(saturated) if saturated else None,
+        'reason': overload,
+        'sustained': load_level(sustained) if sustained else None,
+        'sustained_throughput': sustained['throughput'] if sustained else None,
+    }
+
+
+def load_level(level: Dict[str, Any]) -> float:
+    """Offered load of a level: arrival rate (open) or sessions (closed)"""
+    return level['rate'] if level['model'] == 'open' else level['sessions']
+
+
+async def run(target, mix: Tuple[List[str], List[float]], model: str, loads: List[float],
+              duration: float, think_ms: float = 0, sessions: int = 8,
+              max_in_flight: int = 256, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Warm the target up with every question of the mix, then run each load level
+
+    Args:
+        target: InProcessTarget or HTTPTarget
+        mix: Result of load_mix
+        model: 'closed' (loads are session counts) or 'open' (loads are rates)
+        loads: Load levels in increasing order
+        duration: Seconds per level
+        think_ms: Mean think time of closed-loop sessions
+        sessions: Sessions of the open loop
+        max_in_flight: Open-loop limit of unanswered questions
+        seed: Seed of the random sequences
+
+    Returns:
+        Level reports (printed as they finish)
+    """
+    for question in mix[0]:
+        await target.ask(0, question)
+
+    print_header()
+    levels = []
+    for load in loads:
+        if model == 'closed':
+            level = await closed_loop(target, mix, int(load), duration, think_ms, seed)
+        else:
+            level = await open_loop(target, mix, load, sessions, duration, max_in_flight, seed)
+        print_level(level)
+        levels.append(level)
+    return levels
+
+
+def print_header():
+    print(f"{'load':>8} {'requests':>9} {'answers/s':>10} {'p50':>9} {'p95':>9} "
+          f"{'p99':>9} {'errors':>7} {'shed':>7}")
+
+
+def print_level(level: Dict[str, Any]):
+    load = f"{level['rate']:g}/s" if level['model'] == 'open' else str(level['sessions'])
+    print(f"{load:>8} {level['requests']:>9} {level['throughput']:>10.1f} "
+          f"{level.get('p50_ms', 0):>9.2f} {level.get('p95_ms', 0):>9.2f} "
+          f"{level.get('p99_ms', 0):>9.2f} {level['error_rate']:>7.1%} {level['shed_rate']:>7.1%}")
+
+
+def print_saturation(point: Dict[str, Any], model: str):
+    unit = ' questions/s offered' if model == 'open' else ' sessions'
+    if point['saturated_at'] is None:
+        print(f"\nNot saturated; the highest level ({point['sustained']:g}{unit}) "
+              f"answered {point['sustained_throughput']:.1f} questions/s")
+        return
+    print(f"\nSaturated at {point['saturated_at']:g}{unit}: {point['reason']}")
+    if point['sustained'] is not None:
+        print(f"Highest sustained load: {point['sustained']:g}{unit}, "
+              f"{point['sustained_throughput']:.1f} questions/s")
+
+
+async def start_target(args, pipeline: Optional[QueryPipeline], workers: int):
+    """Target of the run, plus the stand-in API server if one was started"""
+    if args.target == 'inprocess':
+        return InProcessTarget(pipeline, workers, args.timeout), None
+    if args.url:
+        return HTTPTarget(args.url, args.timeout), None
+
+    from api_server import APIServer
+    api = APIServer(pipeline, args.workers)
+    server = await api.start('127.0.0.1', 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"Stand-in API server on http://{host}:{port}")
+    return HTTPTarget(f"http://{host}:{port}", args.timeout), (api, server)
+
+
+async def main_async(args, pipeline: Optional[QueryPipeline]) -> Dict[str, Any]:
+    loads = [float(value) for value in (args.sessions if args.model == 'closed'
+                                        else args.rates).split(',')]
+    workers = int(max(loads)) if args.model == 'closed' else args.max_in_flight
+    target, server = await start_target(args, pipeline, workers)
+    mix = load_mix(args.mix)
+    try:
+        levels = await run(target, mix, args.model, loads, args.duration, args.think_ms,
+                           args.open_sessions, args.max_in_flight, args.seed)
+    finally:
+        await target.close()
+        if server is not None:
+            api, listener = server
+            listener.close()
+            await listener.wait_closed()
+            # Let the connection handlers see the clients hang up before the loop ends
+            await asyncio.sleep(0.1)
+            api.close()
+
+    point = saturation(levels, args.max_shed, args.slo_ms)
+    print_saturation(point, args.model)
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'target': target.name,
+            'url': getattr(target, 'url', None),
+            'model': args.model,
+            'duration': args.duration,
+            'think_ms': args.think_ms,
+            'mix': args.mix or 'config.EXAMPLE_QUERIES',
+            'cache': not args.no_cache,
+        },
+        'levels': levels,
+        'saturation': point,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', default='inprocess', choices=('inprocess', 'http'))
+    parser.add_argument('--url', help="API server base URL (http target; a stand-in "
+                                      "server is started if omitted)")
+    parser.add_argument('--model', default='closed', choices=('closed', 'open'),
+                        help="arrival model")
+    parser.add_argument('--sessions', default='1,2,4,8,16',
+                        help="closed loop: comma-separated session counts")
+    parser.add_argument('--rates', default='5,10,20,40',
+                        help="open loop: comma-separated arrival rates (questions/s)")
+    parser.add_argument('--open-sessions', type=int, default=8,
+                        help="open loop: sessions the arrivals are spread over")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per level")
+    parser.add_argument('--think-ms', type=float, default=0.0,
+                        help="closed loop: mean pause between questions")
+    parser.add_argument('--max-in-flight', type=int, default=256,
+                        help="open loop: unanswered questions before arrivals are dropped")
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds per question")
+    parser.add_argument('--mix', help="question mix file (config.EXAMPLE_QUERIES by default)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the question sequence")
+    parser.add_argument('--max-shed', type=float, default=0.01,
+                        help="share of shed requests that counts as saturated")
+    parser.add_argument('--slo-ms', type=float, help="p95 latency objective")
+    parser.add_argument('--data', help="dataset file (RDF_DATASET by default)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="stand-in server worker threads (API_CONFIG by default)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="disable the result cache of the in-process pipeline")
+    parser.add_argument('--save', help="write the report as JSON")
+    args = parser.parse_args()
+
+    pipeline = None
+    if args.target == 'inprocess' or not args.url:
+        pipeline = create_pipeline(args.data, warm=False)
+        if args.no_cache:
+            pipeline.cache.enabled = False
+    elif args.no_cache or args.data:
+        print("--no-cache and --data only apply to an in-process pipeline", file=sys.stderr)
+
+    report = asyncio.run(main_async(args, pipeline))
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=2)
+        print(f"saved {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+"""
+Memory profile of graph load and query execution
+
+Attributes a worker's memory to what it loads and runs. Each dataset is
+profiled in a fresh process, phase by phase:
+
+    startup        imports (rdflib, pandas, spaCy); RSS only
+    graph_load     RDFQueryExecutor on the dataset
+    nlp_load       NLPProcessor (spaCy model, vocabularies)
+    generator      SPARQLGenerator
+    execute        per template: generation, parse and evaluation
+    dataframe      per template: DataFrame conversion of its rows
+
+tracemalloc gives the Python allocations of a phase: peak (highest point
+during it), held (right after it, its result still referenced) and, for
+templates, retained (left once the results are dropped: caches and
+leaks). The load phases list their top allocation sites. The RSS
+(resident set size), which also covers memory Python does not trace, is
+sampled by a background thread in a second run without tracemalloc,
+whose own bookkeeping would inflate it. Reports are saved as JSON and compared like the timing
+suite's baselines; --scales profiles synthetic datasets
+(benchmarks.synthetic) of the given sizes.
+
+Usage:
+    python -m benchmarks.memory run [--data FILE ...] [--scales 10k,100k] [--save FILE]
+                                    [--compare BASELINE]
+    python -m benchmarks.memory compare BASELINE CURRENT [--tolerance 0.2]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from benchmarks import PROJECT_ROOT, TEMPLATE_FRAMES, dataset_path
+from benchmarks.suite import load, report_regressions
+from config import COST_CONFIG
+from nlp_processor import NLPProcessor
+from query_algebra import parse_query
+from rdf_query_executor import RDFQueryExecutor
+from sparql_generator import SPARQLGenerator
+
+MB = 1024 * 1024
+
+# Differences below this are allocator noise, not regressions
+MIN_DELTA_MB = 1.0
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process (None where /proc is not available)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def megabytes(size: Optional[float]) -> Optional[float]:
+    return None if size is None else round(size / MB, 3)
+
+
+class RSSSampler:
+    """Samples the RSS in a background thread while a block runs, keeping the highest"""
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> 'RSSSampler':
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+
+def site(filename: str) -> str:
+    """Short name of a source file: relative to site-packages or the project"""
+    marker = 'site-packages' + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    if filename.startswith(PROJECT_ROOT):
+        return os.path.relpath(filename, PROJECT_ROOT)
+    return filename
+
+
+def measure(func: Callable[[], Any], top: int = 0) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Run one phase under tracemalloc if it is tracing, or the RSS sampler otherwise
+
+    Args:
+        func: Phase to run
+        top: Number of allocation sites (by file) to report when tracing
+
+    Returns:
+        Tuple of (result of func, measurements: peak_mb, held_mb and, if
+        top, top sites when tracing; rss_mb, rss_delta_mb and rss_peak_mb
+        otherwise)
+    """
+    gc.collect()
+    if not tracemalloc.is_tracing():
+        start_rss = rss_bytes()
+        with RSSSampler() as sampler:
+            result = func()
+        rss = rss_bytes()
+        return result, {
+            'rss_mb': megabytes(rss),
+            'rss_delta_mb': megabytes(None if rss is None else rss - start_rss),
+            'rss_peak_mb': megabytes(sampler.peak),
+        }
+
+    before = tracemalloc.take_snapshot() if top else None
+    start = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    entry = {'peak_mb': megabytes(peak - start), 'held_mb': megabytes(current - start)}
+    if top:
+        after = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        entry['top'] = [
+            {'site': site(stat.traceback[0].filename), 'mb': megabytes(stat.size_diff)}
+            for stat in after.compare_to(before, 'filename')[:top]]
+    return result, entry
+
+
+def profile_dataset(data_path: str, max_rows: int = None, top: int = 10,
+                    traced: bool = True) -> Dict[str, Any]:
+    """
+    Profile one dataset in this process
+
+    Args:
+        data_path: Dataset file
+        max_rows: Row cap of template evaluation (COST_CONFIG['row_cap'] if omitted)
+        top: Allocation sites listed for the load phases
+        traced: Measure with tracemalloc; RSS only if False
+
+    Returns:
+        Dictionary with triples, phases (startup and the load phases) and
+        templates (execute and dataframe measurements, retained_mb and rows
+        for each template)
+    """
+    phases = {'startup': {'rss_mb': megabytes(rss_bytes())}}
+    if traced:
+        tracemalloc.start()
+    if max_rows is None:
+        max_rows = COST_CONFIG.get('row_cap', 10000)
+
+    executor, phases['graph_load'] = measure(lambda: RDFQueryExecutor(data_path), top)
+    _, phases['nlp_load'] = measure(NLPProcessor, top)
+    generator, phases['generator'] = measure(SPARQLGenerator)
+    namespaces = dict(executor.graph.namespaces())
+
+    templates = {}
+    for name in generator.registry.names():
+        frame = TEMPLATE_FRAMES.get(name)
+        if frame is None:
+            print(f"skipping template {name}: no sample frame in benchmarks.TEMPLATE_FRAMES")
+            continue
+
+        def execute():
+            query = generator.generate_with(name, frame)
+            prepared = getattr(query, 'prepared', None)
+            if prepared is None:
+                prepared = parse_query(str(query), namespaces)
+            return query, executor.evaluate(prepared, getattr(query, 'lock', None), max_rows)
+
+        gc.collect()
+        start = tracemalloc.get_traced_memory()[0]
+        (query, (columns, data)), executed = measure(execute)
+        frame_df, converted = measure(
+            lambda: executor.to_dataframe(columns, data, getattr(query, 'local_names', None)))
+        templates[name] = {'execute': executed, 'dataframe': converted, 'rows': len(data)}
+        del query, columns, data, frame_df
+        if traced:
+            gc.collect()
+            templates[name]['retained_mb'] = megabytes(tracemalloc.get_traced_memory()[0] - start)
+    tracemalloc.stop()
+    return {'triples': len(executor.graph), 'phases': phases, 'templates': templates}
+
+
+def datasets_for(data_paths: List[str], scales: List[str], directory: str) -> Dict[str, str]:
+    """Label -> file of the datasets to profile, generating the synthetic ones"""
+    from benchmarks import synthetic
+    datasets = {}
+    for path in data_paths:
+        datasets[os.path.splitext(os.path.basename(path))[0]] = path
+    for scale in scales:
+        path = os.path.join(directory, f"cccm_{scale}.nt")
+        print(f"generating {scale} triples...")
+        synthetic.generate(synthetic.parse_size(scale), path)
+        datasets[scale] = path
+    if not datasets:
+        datasets['cccm'] = dataset_path()
+    return datasets
+
+
+def run(data_paths: List[str] = (), scales: List[str] = (), max_rows: int = None,
+        top: int = 10) -> Dict[str, Any]:
+    """
+    Profile every dataset, each in a fresh process
+
+    Args:
+        data_paths: Dataset files
+        scales: Sizes of synthetic datasets to generate and profile (e.g. '100k')
+        max_rows: Row cap of template evaluation
+        top: Allocation sites listed for the load phases
+
+    Returns:
+        Report with meta and datasets (label -> profile_dataset result);
+        the configured dataset is profiled if none is given
+    """
+    import pandas
+    import rdflib
+    import spacy
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'versions': {'rdflib': rdflib.__version__, 'pandas': pandas.__version__,
+                         'spacy': spacy.__version__},
+            'max_rows': max_rows,
+        },
+        'datasets': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='cccm-memory-') as directory:
+        for label, path in datasets_for(list(data_paths), list(scales), directory).items():
+            print(f"profiling {label} ({path})...")
+            passes = []
+            for traced in (True, False):
+                output = os.path.join(directory, f"{label}-{'traced' if traced else 'rss'}.json")
+                command = [sys.executable, '-m', 'benchmarks.memory', 'profile', path,
+                           '--output', output, '--top', str(top)]
+                if max_rows is not None:
+                    command += ['--max-rows', str(max_rows)]
+                if not traced:
+                    command.append('--rss-only')
+                subprocess.run(command, cwd=PROJECT_ROOT, check=True)
+                passes.append(load(output))
+            report['datasets'][label] = merge(*passes)
+    return report
+
+
+def merge(traced: Dict[str, Any], rss: Dict[str, Any]) -> Dict[str, Any]:
+    """Traced profile with the measurements of the RSS-only run added"""
+    for phase, entry in rss['phases'].items():
+        traced['phases'].setdefault(phase, {}).update(entry)
+    for name, entry in rss['templates'].items():
+        if name in traced['templates']:
+            for step in ('execute', 'dataframe'):
+                traced['templates'][name][step].update(entry[step])
+    return traced
+
+
+def measurements(profile: Dict[str, Any]) -> Dict[str, float]:
+    """Flat 'phase metric' -> MB view of a dataset profile, as compared"""
+    values = {}
+    for phase, entry in profile['phases'].items():
+        for key in ('peak_mb', 'held_mb', 'rss_delta_mb'):
+            if entry.get(key) is not None:
+                values[f"{phase} {key}"] = entry[key]
+    for name, entry in profile['templates'].items():
+        for step in ('execute', 'dataframe'):
+            for key in ('peak_mb', 'rss_delta_mb'):
+                if entry[step].get(key) is not None:
+                    values[f"{step}:{name} {key}"] = entry[step][key]
+        if entry.get('retained_mb') is not None:
+            values[f"template:{name} retained_mb"] = entry['retained_mb']
+    return values
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            tolerance: float = 0.2) -> List[str]:
+    """
+    Memory regressions of a report against a baseline
+
+    Args:
+        baseline: Report from run
+        current: Newer report
+        tolerance: Allowed growth (0.2 = 20%)
+
+    Returns:
+        One message per measurement that grew by more than the tolerance
+        and MIN_DELTA_MB (empty if none)
+    """
+    regressions = []
+    for label, profile in baseline['datasets'].items():
+        if label not in current['datasets']:
+            continue
+        before = measurements(profile)
+        after = measurements(current['datasets'][label])
+        for key, value in before.items():
+            if key not in after:
+                continue
+            grown = after[key] - value
+            if grown > MIN_DELTA_MB and after[key] > value * (1 + tolerance):
+                regressions.append(f"{label} {key}: {value:.1f} -> {after[key]:.1f} MB "
+                                   f"(+{grown:.1f} MB)")
+    return regressions
+
+
+def _mb(value: Optional[float]) -> str:
+    return f"{value:>9.2f}" if value is not None else f"{'-':>9}"
+
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None):
+    """Print each dataset's phases and templates (with the baseline's held MB if given)"""
+    for label, profile in report['datasets'].items():
+        base = (baseline or {}).get('datasets', {}).get(label)
+        print(f"\n{label}: {profile['triples']:,} triples (MB)\n")
+        header = (f"{'phase':<12} {'peak':>9} {'held':>9} {'rss':>9} {'rss +':>9} "
+                  f"{'rss peak':>9}")
+        print(header + (f" {'base held':>9}" if base else ""))
+        for phase, entry in profile['phases'].items():
+            line = (f"{phase:<12} {_mb(entry.get('peak_mb'))} {_mb(entry.get('held_mb'))} "
+                    f"{_mb(entry.get('rss_mb'))} {_mb(entry.get('rss_delta_mb'))} "
+                    f"{_mb(entry.get('rss_peak_mb'))}")
+            if base and phase in base['phases']:
+                line += f" {_mb(base['phases'][phase].get('held_mb'))}"
+            print(line)
+            for top in entry.get('top', [])[:5]:
+                print(f"    {top['mb']:>8.1f}  {top['site']}")
+
+        print(f"\n{'template':<32} {'exec peak':>9} {'rows held':>9} {'df peak':>9} "
+              f"{'df held':>9} {'retained':>9} {'exec rss+':>9} {'rows':>7}")
+        for name, entry in profile['templates'].items():
+            print(f"{name:<32} {_mb(entry['execute'].get('peak_mb'))} "
+                  f"{_mb(entry['execute'].get('held_mb'))} {_mb(entry['dataframe'].get('peak_mb'))} "
+                  f"{_mb(entry['dataframe'].get('held_mb'))} {_mb(entry.get('retained_mb'))} "
+                  f"{_mb(entry['execute'].get('rss_delta_mb'))} {entry['rows']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="profile datasets")
+    run_parser.add_argument('--data', nargs='+', default=[], help="dataset files")
+    run_parser.add_argument('--scales', default='',
+                            help="synthetic dataset sizes to profile, e.g. 10k,100k,1M")
+    run_parser.add_argument('--max-rows', type=int, default=None,
+                            help="row cap of template evaluation (COST_CONFIG['row_cap'])")
+    run_parser.add_argument('--top', type=int, default=10, help="allocation sites per load phase")
+    run_parser.add_argument('--save', help="write the report as JSON")
+    run_parser.add_argument('--compare', help="report to compare against")
+    run_parser.add_argument('--tolerance', type=float, default=0.2, help="allowed growth")
+
+    profile_parser = commands.add_parser('profile', help="profile one dataset in this process")
+    profile_parser.add_argument('data')
+    profile_parser.add_argument('--output', required=True)
+    profile_parser.add_argument('--max-rows', type=int, default=None)
+    profile_parser.add_argument('--top', type=int, default=10)
+    profile_parser.add_argument('--rss-only', action='store_true', help="no tracemalloc")
+
+    compare_parser = commands.add_parser('compare', help="compare two saved reports")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--tolerance', type=float, default=0.2, help="allowed growth")
+    args = parser.parse_args()
+
+    if args.command == 'profile':
+        profile = profile_dataset(args.data, args.max_rows, args.top, not args.rss_only)
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(profile, output_file, indent=2)
+        return
+
+    if args.command == 'compare':
+        baseline, current = load(args.baseline), load(args.current)
+        print_report(current, baseline)
+        sys.exit(report_regressions(compare(baseline, current, args.tolerance), args.tolerance))
+
+    scales = [scale for scale in args.scales.split(',') if scale]
+    report = run(args.data, scales, args.max_rows, args.top)
+    baseline = load(args.compare) if args.compare else None
+    print_report(report, baseline)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=2)
+        print(f"saved {args.save}")
+    if baseline:
+        sys.exit(report_regressions(compare(baseline, report, args.tolerance), args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
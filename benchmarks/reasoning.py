@@ -0,0 +1,93 @@
+"""
+Load-time materialization benchmark
+
+Measures what materializing RDFS subclass/subproperty entailments costs
+at load time and what it saves per query: institution queries match
+``a cccm:Institution`` through the type index on the materialized graph
+instead of ``FILTER(?type IN (...))`` over every typed resource. Also
+lists the templates whose results change once entailments are stored
+(e.g. remittances become transactions).
+
+Usage:
+    python -m benchmarks.reasoning [--repeat N]
+"""
+
+import argparse
+import math
+from rdflib import Graph
+from benchmarks import TEMPLATE_FRAMES, dataset_path, median, time_call
+from reasoning import RDFSReasoner
+from sparql_generator import SPARQLGenerator
+
+# Frames whose query differs between the two modes
+INSTITUTION_FRAMES = {
+    'institutions': {'classes': ['Institution']},
+    'institutions in India': {'classes': ['Institution'], 'filters': {'basedIn': 'India'}},
+}
+
+
+def load_graph() -> Graph:
+    graph = Graph()
+    graph.parse(dataset_path(), format='xml')
+    return graph
+
+
+def run(repeat: int = 20):
+    """
+    Benchmark loading and querying with and without materialization
+
+    Args:
+        repeat: Timed runs per measurement
+    """
+    plain = load_graph()
+    materialized = load_graph()
+    inferred, _ = RDFSReasoner().materialize(materialized)
+
+    load_ms = median(time_call(load_graph, repeat))
+    graphs = [load_graph() for _ in range(repeat)]
+    materialize_ms = median(time_call(lambda: RDFSReasoner().materialize(graphs.pop()), repeat))
+    print(f"{len(plain)} triples, {len(inferred)} inferred, {repeat} runs (median ms)\n")
+    print(f"load {load_ms:.2f}   materialize {materialize_ms:.2f} "
+          f"(+{materialize_ms / load_ms:.1%} load time)\n")
+
+    plain_generator = SPARQLGenerator(page_size=0, materialized=False)
+    materialized_generator = SPARQLGenerator(page_size=0, materialized=True)
+
+    print(f"{'query':<24} {'filter':>8} {'index':>8} {'saved':>8} {'break-even':>11}")
+    for name, frame in INSTITUTION_FRAMES.items():
+        plain_query = plain_generator.generate(frame)
+        materialized_query = materialized_generator.generate(frame)
+        plain_rows = sorted(plain.query(plain_query.prepared))
+        if plain_rows != sorted(materialized.query(materialized_query.prepared)):
+            raise AssertionError(f"Results differ between modes for {name}")
+
+        plain_ms = median(time_call(lambda: list(plain.query(plain_query.prepared)), repeat))
+        materialized_ms = median(time_call(
+            lambda: list(materialized.query(materialized_query.prepared)), repeat))
+        saved = plain_ms - materialized_ms
+        break_even = f"{math.ceil(materialize_ms / saved)} queries" if saved > 0 else "never"
+        print(f"{name:<24} {plain_ms:>8.2f} {materialized_ms:>8.2f} {saved:>8.2f} {break_even:>11}")
+
+    # Queries over a superclass see more instances once entailments are stored
+    changed = []
+    for name in plain_generator.registry.names():
+        frame = TEMPLATE_FRAMES.get(name)
+        if frame is None:
+            continue
+        query = plain_generator.generate_with(name, frame)
+        before = len(plain.query(query.prepared))
+        after = len(materialized.query(query.prepared))
+        if before != after:
+            changed.append(f"{name} ({before} -> {after} rows)")
+    print("\nresults changed by materialization: " + (", ".join(changed) or "none"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help="timed runs per measurement")
+    args = parser.parse_args()
+    run(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Benchmark suite with per-stage latency baselines
+
+Times every stage of answering a query separately, over every
+SPARQLGenerator template (benchmarks.TEMPLATE_FRAMES) and every question
+in test_queries.py:
+
+    nlp          NLPProcessor.process (test queries only)
+    generate     SPARQLGenerator.generate (query text, no algebra cache)
+    parse        rdflib parse of the generated text
+    evaluate     graph evaluation, reading every row
+    dataframe    DataFrame conversion and ID columns
+
+plus end-to-end latency and throughput of the test queries through NLP,
+generation with the algebra cache and execution. Reports p50/p95/p99 per
+stage; results can be saved as a JSON baseline and compared against one,
+flagging stages that got slower by more than a tolerance. --data runs it
+against another dataset, e.g. one made by benchmarks.synthetic.
+
+Usage:
+    python -m benchmarks.suite run [--repeat N] [--data FILE] [--save FILE] [--compare BASELINE]
+    python -m benchmarks.suite compare BASELINE CURRENT [--tolerance 0.2] [--cases]
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+from benchmarks import TEMPLATE_FRAMES, dataset_path, median, percentile
+from config import RDF_DATASET
+from nlp_processor import NLPProcessor
+from query_algebra import parse_query
+from rdf_query_executor import RDFQueryExecutor
+from sparql_generator import SPARQLGenerator
+from test_queries import TEST_QUERIES
+
+STAGES = ('nlp', 'generate', 'parse', 'evaluate', 'dataframe', 'end_to_end')
+
+# Differences below this are timer noise, not regressions
+MIN_DELTA_MS = 0.1
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 (ms) and sample count"""
+    return {
+        'p50': round(percentile(values, 50), 4),
+        'p95': round(percentile(values, 95), 4),
+        'p99': round(percentile(values, 99), 4),
+        'count': len(values),
+    }
+
+
+def timed(samples: List[float], func, *args):
+    """Call func(*args), appending its duration (ms) to samples"""
+    start = time.perf_counter()
+    result = func(*args)
+    samples.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def run(repeat: int = 20, data_path: str = None) -> Dict[str, Any]:
+    """
+    Run the suite
+
+    Args:
+        repeat: Timed runs per case
+        data_path: Dataset file (RDF_DATASET['file_path'] if omitted)
+
+    Returns:
+        Baseline dictionary with meta, stages (p50/p95/p99 per stage),
+        throughput (end-to-end queries per second) and cases (p50 per
+        stage for each template and test query)
+    """
+    executor = RDFQueryExecutor(data_path or dataset_path())
+    namespaces = dict(executor.graph.namespaces())
+    text_generator = SPARQLGenerator(algebra=False, materialized=executor.materialized)
+    processor = NLPProcessor()
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    cases: Dict[str, Dict[str, float]] = {}
+
+    def measure(case: str, frame: dict = None, query: str = None, template: str = None):
+        timings: Dict[str, List[float]] = defaultdict(list)
+        for _ in range(repeat):
+            if query is not None:
+                frame = timed(timings['nlp'], processor.process, query)
+            if template is not None:
+                text = timed(timings['generate'], text_generator.generate_with, template, frame)
+            else:
+                text = timed(timings['generate'], text_generator.generate, frame)
+            prepared = timed(timings['parse'], parse_query, str(text), namespaces)
+            columns, data = timed(timings['evaluate'], executor.evaluate, prepared)
+            timed(timings['dataframe'], executor.to_dataframe, columns, data,
+                  getattr(text, 'local_names', None))
+        cases[case] = {stage: round(median(values), 4) for stage, values in timings.items()}
+        for stage, values in timings.items():
+            samples[stage].extend(values)
+
+    for name in text_generator.registry.names():
+        frame = TEMPLATE_FRAMES.get(name)
+        if frame is None:
+            print(f"skipping template {name}: no sample frame in benchmarks.TEMPLATE_FRAMES")
+            continue
+        measure(f"template:{name}", frame=frame, template=name)
+
+    for query in TEST_QUERIES:
+        measure(f"query:{query}", query=query)
+
+    # End to end, as the app answers a question (algebra cache, no result cache)
+    generator = SPARQLGenerator(materialized=executor.materialized)
+    for query in TEST_QUERIES:
+        executor.execute(generator.generate(processor.process(query)))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in TEST_QUERIES:
+            timed(samples['end_to_end'], lambda: executor.execute(
+                generator.generate(processor.process(query))))
+    seconds = time.perf_counter() - start
+
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'dataset': data_path or RDF_DATASET['file_path'],
+            'triples': len(executor.graph),
+            'repeat': repeat,
+        },
+        'stages': {stage: summarize(samples[stage]) for stage in STAGES if samples[stage]},
+        'throughput': round(len(TEST_QUERIES) * repeat / seconds, 1),
+        'cases': cases,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2,
+            include_cases: bool = False) -> List[str]:
+    """
+    Regressions of a run against a baseline
+
+    Args:
+        baseline: Baseline from run
+        current: Newer run
+        tolerance: Allowed slowdown (0.2 = 20%)
+        include_cases: Also compare the p50 of every case
+
+    Returns:
+        One message per regression (empty if none)
+    """
+    regressions = []
+
+    def check(label: str, before: float, after: float):
+        if after > before * (1 + tolerance) and after - before > MIN_DELTA_MS:
+            regressions.append(f"{label}: {before:.3f} -> {after:.3f} ms "
+                               f"(+{(after - before) / before:.0%})")
+
+    for stage, stats in baseline['stages'].items():
+        if stage in current['stages']:
+            for key in ('p50', 'p95', 'p99'):
+                check(f"{stage} {key}", stats[key], current['stages'][stage][key])
+
+    before, after = baseline['throughput'], current['throughput']
+    if after < before * (1 - tolerance):
+        regressions.append(f"throughput: {before:.1f} -> {after:.1f} queries/s "
+                           f"({(after - before) / before:.0%})")
+
+    if include_cases:
+        for case, stages in baseline['cases'].items():
+            for stage, value in stages.items():
+                if stage in current['cases'].get(case, {}):
+                    check(f"{case} {stage} p50", value, current['cases'][case][stage])
+    return regressions
+
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None):
+    """Print the stage table (with the baseline p50 if given)"""
+    meta = report['meta']
+    print(f"{meta['triples']} triples, {len(report['cases'])} cases, "
+          f"{meta['repeat']} runs each (ms)\n")
+    header = f"{'stage':<12} {'p50':>9} {'p95':>9} {'p99':>9} {'samples':>8}"
+    print(header + (f" {'base p50':>9}" if baseline else ""))
+    for stage, stats in report['stages'].items():
+        line = (f"{stage:<12} {stats['p50']:>9.3f} {stats['p95']:>9.3f} "
+                f"{stats['p99']:>9.3f} {stats['count']:>8}")
+        if baseline and stage in baseline['stages']:
+            line += f" {baseline['stages'][stage]['p50']:>9.3f}"
+        print(line)
+    print(f"\nthroughput   {report['throughput']} queries/s end to end")
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)
+
+
+def report_regressions(regressions: List[str], tolerance: float) -> int:
+    """Print regressions; returns the exit status"""
+    if not regressions:
+        print(f"\nNo regressions beyond {tolerance:.0%}")
+        return 0
+    print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%}:")
+    for regression in regressions:
+        print(f"  {regression}")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the suite")
+    run_parser.add_argument('--repeat', type=int, default=20, help="timed runs per case")
+    run_parser.add_argument('--data', help="dataset file (RDF_DATASET by default)")
+    run_parser.add_argument('--save', help="write the results as a JSON baseline")
+    run_parser.add_argument('--compare', help="baseline to compare the results against")
+    run_parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown")
+    run_parser.add_argument('--cases', action='store_true', help="also compare every case")
+
+    compare_parser = commands.add_parser('compare', help="compare two saved results")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown")
+    compare_parser.add_argument('--cases', action='store_true', help="also compare every case")
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        baseline, current = load(args.baseline), load(args.current)
+        print_report(current, baseline)
+        sys.exit(report_regressions(compare(baseline, current, args.tolerance, args.cases),
+                                    args.tolerance))
+
+    report = run(args.repeat, args.data)
+    baseline = load(args.compare) if args.compare else None
+    print_report(report, baseline)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"saved {args.save}")
+    if baseline:
+        sys.exit(report_regressions(compare(baseline, report, args.tolerance, args.cases),
+                                    args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+"""
+Synthetic CCCM dataset generator
+
+Writes CCCM graphs of a requested size (10k to 50M triples) for scaling
+tests. The schema and the reference entities (countries, currencies,
+statuses, the named banks and fintechs) are copied from the configured
+dataset, so every query template and NLP filter keeps working; on top
+of them come generated customers, accounts, institutions, exchange
+rates, transactions and remittances with a realistic skew:
+
+- transactions per customer and accounts/transactions per institution
+  follow a power law (a few customers and institutions get most of them)
+- amounts and balances are log-normal; most transactions complete
+- transactions start in the initiator's currency; remittances mostly
+  go through fintechs
+
+The same seed and size always give the same graph. N-Triples and
+RDF/XML are streamed to disk, so any size fits in memory; a snapshot
+(pickled rdflib graph, the fastest to load) is built in memory and is
+meant for sizes up to a few million triples. RDFQueryExecutor and the
+benchmark suite (--data) load all three.
+
+Usage:
+    python -m benchmarks.synthetic --triples 1M [--seed 42] --output data/cccm_1m.nt
+    python -m benchmarks.synthetic --triples 100k --output data/cccm_100k.owl
+    python -m benchmarks.synthetic --triples 100k --output data/cccm_100k.pickle
+"""
+
+import argparse
+import bisect
+import itertools
+import math
+import os
+import pickle
+import random
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape, quoteattr
+from rdflib import OWL, RDF, RDFS, XSD, Graph, Literal, URIRef
+from benchmarks import dataset_path
+from config import RDF_DATASET
+
+CCCM = RDF_DATASET['namespace']
+TYPE = str(RDF.type)
+DOUBLE = str(XSD.double)
+
+# An object is an IRI string or a (lexical value, datatype IRI or None) literal
+Term = Union[str, Tuple[str, Optional[str]]]
+Entity = Tuple[str, List[Tuple[str, Term]]]
+
+# Classes whose instances are copied from the source dataset
+REFERENCE_CLASSES = ('Country', 'Currency', 'Status', 'Institution', 'Bank', 'FinTech')
+SCHEMA_TYPES = (OWL.Class, OWL.ObjectProperty, OWL.DatatypeProperty, OWL.Ontology)
+
+FIRST_NAMES = ['Aarav', 'Priya', 'Kiran', 'Ananya', 'Rahul', 'Meera', 'Vikram', 'Sana',
+               'Oliver', 'Amelia', 'Harry', 'Isla', 'James', 'Emma', 'Liam', 'Olivia',
+               'Noah', 'Sophia', 'Lukas', 'Mia', 'Hiroshi', 'Yuki', 'Jack', 'Chloe']
+LAST_NAMES = ['Sharma', 'Patel', 'Desai', 'Iyer', 'Gupta', 'Reddy', 'Khan', 'Singh',
+              'Smith', 'Jones', 'Taylor', 'Brown', 'Wilson', 'Johnson', 'Miller', 'Davis',
+              'Müller', 'Schmidt', 'Tanaka', 'Sato', 'Walker', 'Martin', 'Lee', 'Clark']
+INSTITUTION_WORDS = ['Global', 'United', 'First', 'Pacific', 'Metro', 'Capital', 'Prime',
+                     'National', 'Summit', 'Harbor', 'Crown', 'Apex']
+
+# Share of customers per country (others split the rest)
+COUNTRY_WEIGHTS = {'India': 0.35, 'USA': 0.2, 'UK': 0.15, 'Germany': 0.08, 'Australia': 0.07,
+                   'Japan': 0.06}
+STATUS_WEIGHTS = {'Completed': 0.8, 'Pending': 0.12, 'Failed': 0.08}
+# Approximate value of one unit in USD, for plausible exchange rates
+USD_VALUE = {'USD': 1.0, 'EUR': 1.08, 'GBP': 1.27, 'INR': 0.012, 'JPY': 0.0067, 'AUD': 0.66}
+
+REMITTANCE_SHARE = 0.3
+TRANSACTIONS_PER_CUSTOMER = 5
+MEAN_ACCOUNTS = 1.5
+POWER_LAW_ALPHA = 1.3
+
+
+def parse_size(text: str) -> int:
+    """Triple count such as 50000, 10k or 50M"""
+    text = text.strip().lower().replace('_', '')
+    factor = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+
+class SyntheticCCCM:
+    """
+    Deterministic generator of CCCM entities
+    """
+
+    def __init__(self, triples: int, seed: int = 42, source_path: str = None):
+        """
+        Initialize generator
+
+        Args:
+            triples: Approximate number of triples to generate
+            seed: Random seed
+            source_path: Dataset the schema and reference entities come from
+                (the configured dataset if omitted)
+        """
+        self.triples = triples
+        self.random = random.Random(seed)
+        source = Graph()
+        source.parse(source_path or dataset_path(), format='xml')
+        self.schema, self.reference = self._copy_source(source)
+
+        self.countries = self._instances(source, 'Country')
+        self.currencies = self._instances(source, 'Currency')
+        self.statuses = {str(o): str(s) for s, o in source.subject_objects(URIRef(CCCM + 'status'))}
+        self.country_currency = {str(s): str(o) for s, o in
+                                 source.subject_objects(URIRef(CCCM + 'usesCurrency'))}
+        self.institutions = self._instances(source, 'Bank') + self._instances(source, 'FinTech')
+        self.fintechs = set(self._instances(source, 'FinTech'))
+
+        fixed = sum(len(props) for _, props in self.schema + self.reference)
+        # Triples per customer: 3 own, 4 per account (hasAccount and the
+        # account's 3), 9 per transaction (a few have a second type)
+        per_customer = 3 + 4 * MEAN_ACCOUNTS + TRANSACTIONS_PER_CUSTOMER * 9.05
+        self.customer_count = max(10, int((triples - fixed) / per_customer))
+        self.transaction_count = self.customer_count * TRANSACTIONS_PER_CUSTOMER
+        self.extra_institutions = min(2000, self.customer_count // 500)
+        self.rates_per_pair = max(1, self.transaction_count // (len(self.currencies) ** 2 * 40))
+
+    @staticmethod
+    def _instances(graph: Graph, cls: str) -> List[str]:
+        return sorted(str(s) for s in graph.subjects(RDF.type, URIRef(CCCM + cls)))
+
+    @staticmethod
+    def _copy_source(graph: Graph) -> Tuple[List[Entity], List[Entity]]:
+        """Schema entities and reference entities of the source dataset"""
+        schema_subjects = {s for kind in SCHEMA_TYPES for s in graph.subjects(RDF.type, kind)}
+        reference_subjects = {s for cls in REFERENCE_CLASSES
+                              for s in graph.subjects(RDF.type, URIRef(CCCM + cls))}
+
+        def entity(subject) -> Entity:
+            props = []
+            for predicate, obj in sorted(graph.predicate_objects(subject)):
+                if isinstance(obj, Literal):
+                    datatype = str(obj.datatype) if obj.datatype else None
+                    props.append((str(predicate), (str(obj), datatype)))
+                else:
+                    props.append((str(predicate), str(obj)))
+            return str(subject), props
+
+        schema = [entity(s) for s in sorted(schema_subjects)]
+        reference = [entity(s) for s in sorted(reference_subjects - schema_subjects)]
+        return schema, reference
+
+    def entities(self) -> Iterator[Entity]:
+        """
+        All entities of the graph, in a fixed order
+
+        Returns:
+            Iterator of (subject IRI, [(predicate IRI, object)]) pairs
+        """
+        yield from self.schema
+        yield from self.reference
+        yield from self._institutions()
+        customers = yield from self._customers()
+        yield from self._rates()
+        yield from self._transactions(customers)
+
+    def _power_law_weights(self, count: int) -> List[float]:
+        """Cumulative Pareto weights, for bisect sampling"""
+        return list(itertools.accumulate(self.random.paretovariate(POWER_LAW_ALPHA)
+                                         for _ in range(count)))
+
+    def _pick(self, items: list, cumulative: List[float]):
+        return items[bisect.bisect(cumulative, self.random.random() * cumulative[-1])]
+
+    def _institutions(self) -> Iterator[Entity]:
+        """Generated banks and fintechs (larger sizes only)"""
+        for index in range(self.extra_institutions):
+            fintech = index % 3 == 2
+            kind = 'FinTech' if fintech else 'Bank'
+            iri = f"{CCCM}{kind}_{index:05d}"
+            name = f"{self.random.choice(INSTITUTION_WORDS)} {kind} {index}"
+            country = self.random.choice(self.countries)
+            self.institutions.append(iri)
+            if fintech:
+                self.fintechs.add(iri)
+            yield iri, [(TYPE, CCCM + kind), (CCCM + 'bankName', (name, None)),
+                        (CCCM + 'basedIn', country)]
+        self.institution_weights = self._power_law_weights(len(self.institutions))
+
+    def _customer_country(self) -> str:
+        roll = self.random.random()
+        for name, weight in COUNTRY_WEIGHTS.items():
+            if roll < weight and CCCM + name in self.countries:
+                return CCCM + name
+            roll -= weight
+        return self.random.choice(self.countries)
+
+    def _customers(self):
+        """Customers with their accounts; returns (IRIs, countries)"""
+        iris, countries = [], []
+        for index in range(self.customer_count):
+            iri = f"{CCCM}Cust_{index:07d}"
+            country = self._customer_country()
+            name = f"{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}"
+            # 1 account mostly, a geometric tail with more (mean MEAN_ACCOUNTS)
+            account_count = min(1 + int(self.random.expovariate(math.log(MEAN_ACCOUNTS / (MEAN_ACCOUNTS - 1)))), 8)
+            accounts = [f"{CCCM}Acc_{index:07d}_{number}" for number in range(1, account_count + 1)]
+            props = [(TYPE, CCCM + 'Customer'), (CCCM + 'fullName', (name, None)),
+                     (CCCM + 'basedIn', country)]
+            props.extend((CCCM + 'hasAccount', account) for account in accounts)
+            yield iri, props
+            for account in accounts:
+                balance = round(self.random.lognormvariate(8.5, 1.4), 2)
+                yield account, [(TYPE, CCCM + 'Account'), (CCCM + 'balance', (str(balance), DOUBLE)),
+                                (CCCM + 'heldAt', self._pick(self.institutions,
+                                                             self.institution_weights))]
+            iris.append(iri)
+            countries.append(country)
+        return iris, countries
+
+    def _rates(self) -> Iterator[Entity]:
+        """Exchange rates, a few per currency pair"""
+        self.pair_rates: Dict[Tuple[str, str], List[Tuple[str, float]]] = {}
+        for source in self.currencies:
+            for target in self.currencies:
+                if source == target:
+                    continue
+                code_source, code_target = source.split('#')[-1], target.split('#')[-1]
+                mid = USD_VALUE.get(code_source, 1.0) / USD_VALUE.get(code_target, 1.0)
+                rates = []
+                for variant in range(1, self.rates_per_pair + 1):
+                    iri = f"{CCCM}Rate_{code_source}_{code_target}_{variant}"
+                    value = round(mid * self.random.uniform(0.97, 1.03), 6)
+                    rates.append((iri, value))
+                    yield iri, [(TYPE, CCCM + 'Rate'), (CCCM + 'rateValue', (str(value), DOUBLE)),
+                                (CCCM + 'rateSource', source), (CCCM + 'rateTarget', target)]
+                self.pair_rates[(source, target)] = rates
+
+    def _transactions(self, customers) -> Iterator[Entity]:
+        """Transactions and remittances, power-law distributed over customers"""
+        iris, countries = customers
+        weights = self._power_law_weights(len(iris))
+        fintechs = [iri for iri in self.institutions if iri in self.fintechs]
+        fintech_weights = self._power_law_weights(len(fintechs))
+        statuses = [self.statuses[name] for name in STATUS_WEIGHTS if name in self.statuses]
+        status_weights = list(itertools.accumulate(
+            STATUS_WEIGHTS[name] for name in STATUS_WEIGHTS if name in self.statuses))
+
+        for index in range(self.transaction_count):
+            position = bisect.bisect(weights, self.random.random() * weights[-1])
+            initiator, country = iris[position], countries[position]
+            remittance = self.random.random() < REMITTANCE_SHARE
+            if remittance and fintechs and self.random.random() < 0.7:
+                processor = self._pick(fintechs, fintech_weights)
+            else:
+                processor = self._pick(self.institutions, self.institution_weights)
+
+            source = self.country_currency.get(country) or self.random.choice(self.currencies)
+            target = self.random.choice([c for c in self.currencies if c != source])
+            rate, value = self.random.choice(self.pair_rates[(source, target)])
+            sent = round(self.random.lognormvariate(8.0, 1.5), 2)
+
+            kind = 'Remittance' if remittance else 'Transaction'
+            props = [(TYPE, CCCM + kind)]
+            if sent >= 100000:
+                props.append((TYPE, CCCM + 'HighValueTransaction'))
+            elif sent < 100:
+                props.append((TYPE, CCCM + 'LowValueTransaction'))
+            props.extend([
+                (CCCM + 'amountSent', (str(sent), DOUBLE)),
+                (CCCM + 'amountReceived', (str(round(sent * value, 2)), DOUBLE)),
+                (CCCM + 'initiatedBy', initiator),
+                (CCCM + 'processedBy', processor),
+                (CCCM + 'fromCurrency', source),
+                (CCCM + 'toCurrency', target),
+                (CCCM + 'hasStatus', statuses[bisect.bisect(
+                    status_weights, self.random.random() * status_weights[-1])]),
+                (CCCM + 'appliedRate', rate),
+            ])
+            yield f"{CCCM}Txn_{index:08d}", props
+
+
+def _nt_term(term: Term) -> str:
+    if isinstance(term, str):
+        return f"<{term}>"
+    value, datatype = term
+    value = (value.replace('\\', '\\\\').replace('"', '\\"')
+             .replace('\n', '\\n').replace('\r', '\\r'))
+    return f'"{value}"^^<{datatype}>' if datatype else f'"{value}"'
+
+
+def write_ntriples(entities: Iterator[Entity], path: str) -> int:
+    """Stream entities as N-Triples; returns the triple count"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as output:
+        for subject, props in entities:
+            subject_term = f"<{subject}>"
+            output.write(''.join(f"{subject_term} <{predicate}> {_nt_term(obj)} .\n"
+                                 for predicate, obj in props))
+            count += len(props)
+    return count
+
+
+XML_PREFIXES = {'rdf': str(RDF), 'rdfs': str(RDFS), 'owl': str(OWL), 'cccm': CCCM}
+
+
+def _qname(iri: str) -> str:
+    for prefix, namespace in XML_PREFIXES.items():
+        if iri.startswith(namespace):
+            return f"{prefix}:{iri[len(namespace):]}"
+    raise ValueError(f"No XML prefix for predicate {iri}")
+
+
+def write_rdfxml(entities: Iterator[Entity], path: str) -> int:
+    """Stream entities as RDF/XML; returns the triple count"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as output:
+        output.write('<?xml version="1.0" encoding="utf-8"?>\n<rdf:RDF\n')
+        output.write(''.join(f'  xmlns:{prefix}="{namespace}"\n'
+                             for prefix, namespace in XML_PREFIXES.items()))
+        output.write('>\n')
+        for subject, props in entities:
+            lines = [f'  <rdf:Description rdf:about={quoteattr(subject)}>']
+            for predicate, obj in props:
+                name = _qname(predicate)
+                if isinstance(obj, str):
+                    lines.append(f'    <{name} rdf:resource={quoteattr(obj)}/>')
+                else:
+                    value, datatype = obj
+                    attribute = f' rdf:datatype={quoteattr(datatype)}' if datatype else ''
+                    lines.append(f'    <{name}{attribute}>{escape(value)}</{name}>')
+            lines.append('  </rdf:Description>\n')
+            output.write('\n'.join(lines))
+            count += len(props)
+        output.write('</rdf:RDF>\n')
+    return count
+
+
+def write_snapshot(entities: Iterator[Entity], path: str) -> int:
+    """Build the graph in memory and pickle it; returns the triple count"""
+    graph = Graph()
+    graph.bind('cccm', CCCM)
+    for subject, props in entities:
+        subject_ref = URIRef(subject)
+        for predicate, obj in props:
+            if isinstance(obj, str):
+                obj = URIRef(obj)
+            else:
+                obj = Literal(obj[0], datatype=URIRef(obj[1]) if obj[1] else None)
+            graph.add((subject_ref, URIRef(predicate), obj))
+    with open(path, 'wb') as output:
+        pickle.dump(graph, output, protocol=pickle.HIGHEST_PROTOCOL)
+    return len(graph)
+
+
+WRITERS = {'nt': write_ntriples, 'xml': write_rdfxml, 'snapshot': write_snapshot}
+
+
+def output_format(path: str) -> str:
+    """Format for an output path by its extension"""
+    if path.endswith(('.pickle', '.pkl')):
+        return 'snapshot'
+    if path.endswith('.nt'):
+        return 'nt'
+    return 'xml'
+
+
+def generate(triples: int, output: str, seed: int = 42, fmt: str = None) -> Dict[str, object]:
+    """
+    Generate a dataset file
+
+    Args:
+        triples: Approximate number of triples
+        output: Output path
+        seed: Random seed
+        fmt: 'nt', 'xml' or 'snapshot' (by the output extension if omitted)
+
+    Returns:
+        Summary with path, format, triples, customers, transactions and seconds
+    """
+    start = time.perf_counter()
+    generator = SyntheticCCCM(triples, seed)
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fmt = fmt or output_format(output)
+    count = WRITERS[fmt](generator.entities(), output)
+    return {
+        'path': output,
+        'format': fmt,
+        'triples': count,
+        'customers': generator.customer_count,
+        'transactions': generator.transaction_count,
+        'institutions': len(generator.institutions),
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--triples', type=parse_size, default=parse_size('100k'),
+                        help="approximate size, e.g. 10k, 1M, 50M")
+    parser.add_argument('--seed', type=int, default=42, help="random seed")
+    parser.add_argument('--output', required=True,
+                        help="output file: .nt, .owl/.rdf/.xml or .pickle (snapshot)")
+    parser.add_argument('--format', choices=sorted(WRITERS), default=None,
+                        help="output format (from the extension by default)")
+    args = parser.parse_args()
+
+    summary = generate(args.triples, args.output, args.seed, args.format)
+    for key, value in summary.items():
+        print(f"{key:<14} {value}")
+
+
+if __name__ == '__main__':
+    main()
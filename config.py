@@ -9,7 +9,8 @@ RDF_DATASET = {
     'file_path': 'CCCM PERFECTED.owl',
     'format': 'xml',  # Format: 'xml', 'turtle', 'n3', 'nt'
     'namespace': 'http://www.semanticweb.org/cccm#',
-    'prefix': 'cccm'
+    'prefix': 'cccm',
+    'materialize_inferences': False  # Store RDFS subclass/subproperty entailments at load time
 }
 
 # Streamlit UI Configuration
@@ -26,11 +27,18 @@ NLP_CONFIG = {
     'remove_stopwords': True,
     'lemmatize': True,
     'pos_tagging': True,
+    'enable_fast_path': True,  # Skip spaCy for queries made only of known words
+    'fuzzy_max_edit_distance': 1,  # Typo tolerance (0 disables correction)
+    'fuzzy_min_word_length': 5,  # Shorter words are never corrected
+    'vocabulary_reload_interval': 2.0,  # Seconds between config.py change checks (0 = off)
 }
 
 # Query Configuration
 QUERY_CONFIG = {
     'default_limit': 100,  # Default LIMIT for queries
+    'algebra_mode': True,  # Hand prepared algebra to rdflib instead of query text
+    'algebra_cache_size': 512,  # Distinct query texts kept parsed
+    'result_shaping': True,  # Derive ID columns from IRIs in Python, not STRAFTER BINDs
     'enable_aggregation': True,
     'enable_ordering': True,
     'enable_filtering': True,
@@ -59,7 +67,58 @@ EXAMPLE_QUERIES = [
     "Show completed remittances",
 ]
 
+# Example queries listed in the app sidebar, by category
+SIDEBAR_EXAMPLES = {
+    'Customer Queries': [
+        "List all customers",
+        "Show customers in India",
+        "List customers living in India",
+        "Show customers based in UK",
+    ],
+    'Institution Queries': [
+        "List all banks",
+        "Show institutions in India",
+        "List all fintechs",
+    ],
+    'Transaction Queries': [
+        "List all transactions",
+        "Show all remittances",
+        "List customers who initiated transactions",
+        "Show customers who initiated remittances",
+    ],
+    'Account Queries': [
+        "List customers with their accounts",
+        "Show customers with total number of accounts",
+        "Count accounts per customer",
+    ],
+    'Complex Queries': [
+        "List transactions and their processing institutions",
+        "Show completed transactions",
+        "List failed transactions",
+        "Show customers with multiple accounts",
+        "List remittances processed by fintech",
+        "Show cross-border transactions",
+        "Compare banks versus fintechs",
+        "Show transactions processed by ICICI",
+        "Show customers who use both banks and fintechs",
+        "Show full money trail",
+        "Show remittances over 200000",
+        "Show top customer by transaction amount",
+    ],
+}
+
+# Quick example buttons above the query box: (button label, query)
+QUICK_EXAMPLES = [
+    ("List all customers", "List all customers"),
+    ("Customers in India", "List all customers living in India"),
+    ("All institutions", "List institutions based in India"),
+    ("All transactions", "List all transactions"),
+]
+
 # Vocabulary Expansion
+# These are merged with the built-in vocabulary (vocabulary.py) and picked
+# up while the app runs, without reloading spaCy or the dataset. Entries
+# whose target does not exist in the dataset are ignored with a warning.
 # Add custom class mappings here
 CUSTOM_CLASS_MAPPINGS = {
     # 'keyword': 'RDFClass'
@@ -90,10 +149,58 @@ DEBUG_CONFIG = {
     'print_nlp_results': False,
     'print_sparql_queries': False,
     'show_error_traces': True,
+    'instrumentation': False,  # Metrics (GET /metrics) and per-query traces
+    'trace_log': 'logs/trace_log.jsonl',  # One JSON line per traced query ('' to skip)
+    'max_trace_log_bytes': 10485760,  # Rotated to .1 past this size
+    'slow_query_log': '',  # e.g. 'logs/slow_queries.jsonl'; traces every question while set
+    'slow_query_ms': 1000,
+    'max_slow_query_log_bytes': 10485760,  # Rotated to .1 past this size
+}
+
+# Query Cost Guard Configuration
+COST_CONFIG = {
+    'enable_cost_guard': True,  # False only reports the predicted cost
+    'max_estimated_work': 20000,  # Intermediate rows before rewriting or capping
+    'reject_estimated_work': 5000000,  # Intermediate rows before rejecting
+    'row_cap': 10000,  # Rows returned by a capped query
+}
+
+# HTTP API Configuration (api_server.py)
+API_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'max_workers': 4,  # Threads running NLP processing and query evaluation
+    'max_body_bytes': 1048576,  # Largest accepted request body
+    'max_batch': 100,  # Queries per /batch request
+    'max_rows': 10000,  # Row cap for /sparql requests without max_rows
+    'stream_chunk_rows': 500,  # Rows serialized per streamed chunk
 }
 
 # Cache Configuration
 CACHE_CONFIG = {
     'enable_caching': True,
     'cache_ttl': 3600,  # Time to live in seconds
+    'max_entries': 256,  # Cached questions (least recently used are evicted)
+    'coalesce_requests': True,  # Concurrent identical requests share one evaluation
+}
+
+# Warm-up Configuration
+# At startup the example queries and the most asked questions from the
+# query log are run in the background to fill the caches
+WARMUP_CONFIG = {
+    'enabled': True,
+    'query_log': 'logs/query_log.jsonl',  # Questions asked, for the top-N warm-up (None disables)
+    'max_log_bytes': 5242880,  # Log size at which it is rotated (one old file is kept)
+    'top_queries': 20,  # Most asked questions from the log to warm up
+    'log_window_days': 7,  # Only questions asked this recently count
+}
+
+# Admission Control Configuration
+ADMISSION_CONFIG = {
+    'enabled': True,
+    'max_concurrent': 4,  # Query evaluations running at the same time
+    'max_queue': 64,  # Queries waiting for a slot; further queries are turned away
+    'max_wait_ms': 2000,  # Longest (actual or predicted) wait before a busy response
+    'cheap_work': 1000,  # Estimated intermediate rows up to which a query takes the fast lane
+    'fast_burst': 4,  # Fast-lane admissions in a row while normal-lane queries wait
 }
@@ -0,0 +1,3 @@
+# test_queries.py is a script (python test_queries.py); its test_query takes
+# a processor and generator rather than pytest fixtures
+collect_ignore = ['test_queries.py']
@@ -0,0 +1,450 @@
+"""
+Cost Estimator Module
+
+This module predicts how expensive a generated SPARQL query is before it
+runs. Graph statistics (triples, distinct subjects and objects per
+predicate, instances per class) are combined over the query's algebra
+with textbook independence assumptions to estimate the result cardinality
+and the number of intermediate rows the evaluator will produce. CostGuard
+uses the estimate to rewrite, cap or reject expensive queries.
+"""
+
+import math
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from rdflib import RDF, Variable
+from rdflib.plugins.sparql.parserutils import CompValue
+from config import COST_CONFIG
+from instrumentation import INSTRUMENTATION
+from query_algebra import parse_query
+
+# Filter selectivities by comparison operator
+OPERATOR_SELECTIVITY = {
+    '=': None,  # 1 / distinct values of the compared variable
+    '!=': 0.9,
+    '<': 1 / 3, '>': 1 / 3, '<=': 1 / 3, '>=': 1 / 3,
+}
+DEFAULT_SELECTIVITY = 0.5
+
+# Algebra nodes that consume all input before producing output, so a
+# LIMIT above them does not shorten the work below
+BLOCKING_NODES = frozenset(['OrderBy', 'Group', 'AggregateJoin'])
+
+
+class GraphStatistics:
+    """
+    Per-predicate and per-class counts of an RDF graph
+    """
+
+    def __init__(self, graph):
+        """
+        Collect statistics in one pass over the graph
+
+        Args:
+            graph: rdflib Graph
+        """
+        triples = defaultdict(int)
+        subjects = defaultdict(set)
+        objects = defaultdict(set)
+        classes = defaultdict(int)
+        for s, p, o in graph:
+            triples[p] += 1
+            subjects[p].add(s)
+            objects[p].add(o)
+            if p == RDF.type:
+                classes[o] += 1
+
+        self.total_triples = len(graph)
+        self.predicate_triples = dict(triples)
+        self.predicate_subjects = {p: len(values) for p, values in subjects.items()}
+        self.predicate_objects = {p: len(values) for p, values in objects.items()}
+        self.class_counts = dict(classes)
+        self.total_subjects = max(len(set().union(*subjects.values())) if subjects else 0, 1)
+
+
+class CostEstimate(NamedTuple):
+    """Predicted rows of a query and intermediate rows needed to produce them"""
+    rows: float
+    work: float
+    cartesian: bool
+
+
+class _Relation:
+    """Estimated size and per-variable distinct counts of an intermediate result"""
+
+    __slots__ = ('rows', 'distinct', 'work', 'cartesian', 'blocking')
+
+    def __init__(self, rows: float, distinct: Dict[Variable, float] = None,
+                 work: float = 0.0, cartesian: bool = False, blocking: bool = False):
+        self.rows = rows
+        self.distinct = distinct or {}
+        self.work = work
+        self.cartesian = cartesian
+        self.blocking = blocking
+
+
+class CostEstimator:
+    """
+    Cardinality estimator over rdflib SPARQL algebra
+    """
+
+    def __init__(self, rdf_executor):
+        """
+        Initialize estimator
+
+        Args:
+            rdf_executor: RDFQueryExecutor; statistics are recomputed when
+                its data_version changes
+        """
+        self.rdf_executor = rdf_executor
+        self._statistics = None
+        self._statistics_version = None
+        self._lock = threading.Lock()
+
+    @property
+    def statistics(self) -> GraphStatistics:
+        """Statistics of the executor's current graph"""
+        version = self.rdf_executor.data_version
+        with self._lock:
+            if self._statistics is None or self._statistics_version != version:
+                self._statistics = GraphStatistics(self.rdf_executor.graph)
+                self._statistics_version = version
+            return self._statistics
+
+    @INSTRUMENTATION.timed('estimate')
+    def estimate(self, sparql_query: str) -> CostEstimate:
+        """
+        Estimate the cost of a query
+
+        Args:
+            sparql_query: Query text or a GeneratedQuery with prepared algebra
+
+        Returns:
+            CostEstimate with predicted result rows, intermediate rows
+            (work) and whether the plan contains a Cartesian product
+        """
+        prepared = getattr(sparql_query, 'prepared', None) or parse_query(str(sparql_query))
+        relation = self._estimate(prepared.algebra, self.statistics)
+        return CostEstimate(round(relation.rows), round(relation.work), relation.cartesian)
+
+    def _estimate(self, node: CompValue, stats: GraphStatistics) -> _Relation:
+        """Estimate an algebra node"""
+        name = node.name
+
+        if name in ('SelectQuery', 'Project', 'ToMultiSet', 'Reduced'):
+            return self._estimate(node.p, stats)
+
+        if name == 'BGP':
+            return self._bgp(node.triples, stats)
+
+        if name == 'Join':
+            return self._join(self._estimate(node.p1, stats),
+                              self._estimate(node.p2, stats))
+
+        if name == 'LeftJoin':
+            left = self._estimate(node.p1, stats)
+            joined = self._join(left, self._estimate(node.p2, stats))
+            joined.rows = max(joined.rows, left.rows)
+            return joined
+
+        if name == 'Union':
+            left = self._estimate(node.p1, stats)
+            right = self._estimate(node.p2, stats)
+            distinct = {var: left.distinct.get(var, 0) + right.distinct.get(var, 0)
+                        for var in set(left.distinct) | set(right.distinct)}
+            return _Relation(left.rows + right.rows, distinct, left.work + right.work,
+                             left.cartesian or right.cartesian,
+                             left.blocking or right.blocking)
+
+        if name == 'Minus':
+            left = self._estimate(node.p1, stats)
+            right = self._estimate(node.p2, stats)
+            left.work += right.work
+            return left
+
+        if name == 'Filter':
+            relation = self._estimate(node.p, stats)
+            selectivity, extra_work = self._filter(node.expr, relation, stats)
+            relation.work += extra_work
+            relation.rows *= selectivity
+            return relation
+
+        if name == 'Extend':
+            relation = self._estimate(node.p, stats)
+            relation.work += relation.rows
+            return relation
+
+        if name == 'Distinct':
+            relation = self._estimate(node.p, stats)
+            if relation.distinct:
+                relation.rows = min(relation.rows, math.prod(relation.distinct.values()))
+            return relation
+
+        if name == 'OrderBy':
+            relation = self._estimate(node.p, stats)
+            relation.work += relation.rows * math.log2(max(relation.rows, 2))
+            relation.blocking = True
+            return relation
+
+        if name == 'Group':
+            relation = self._estimate(node.p, stats)
+            groups = 1.0
+            for expr in node.expr or ():
+                groups *= relation.distinct.get(expr, relation.rows) if isinstance(expr, Variable) \
+                    else relation.rows
+            relation.rows = min(relation.rows, groups) if node.expr else 1.0
+            relation.blocking = True
+            return relation
+
+        if name == 'AggregateJoin':
+            relation = self._estimate(node.p, stats)
+            relation.blocking = True
+            return relation
+
+        if name == 'Slice':
+            relation = self._estimate(node.p, stats)
+            wanted = node.start + (node.length if node.length is not None else relation.rows)
+            if not relation.blocking and relation.rows > 0:
+                # Streaming plans stop once enough rows were produced
+                relation.work *= min(1.0, wanted / relation.rows)
+            relation.rows = max(min(relation.rows, wanted) - node.start, 0)
+            return relation
+
+        # Unknown node: combine whatever sub-patterns it has
+        children = [node[key] for key in ('p', 'p1', 'p2')
+                    if isinstance(node.get(key), CompValue)]
+        if not children:
+            return _Relation(1.0)
+        relation = self._estimate(children[0], stats)
+        for child in children[1:]:
+            relation = self._join(relation, self._estimate(child, stats))
+        return relation
+
+    def _bgp(self, triples: List[tuple], stats: GraphStatistics,
+             seed: _Relation = None) -> _Relation:
+        """
+        Estimate a basic graph pattern
+
+        rdflib evaluates the triples as nested loops in the order the algebra
+        lists them, so a pattern sharing no variable with the ones before it
+        multiplies the rows (a Cartesian product) even when a later pattern
+        connects them.
+        """
+        result = seed or _Relation(1.0)
+        for triple in triples:
+            result = self._join(result, self._triple(triple, stats), scan=False)
+        return result
+
+    def _triple(self, triple: tuple, stats: GraphStatistics) -> _Relation:
+        """Estimate a single triple pattern"""
+        s, p, o = triple
+        s_var, o_var = isinstance(s, Variable), isinstance(o, Variable)
+
+        if isinstance(p, Variable):
+            rows = float(stats.total_triples)
+            distinct = {}
+            if s_var:
+                distinct[s] = float(stats.total_subjects)
+            if o_var:
+                distinct[o] = rows
+            distinct[p] = float(len(stats.predicate_triples))
+            return _Relation(rows, distinct)
+
+        if p == RDF.type and not o_var:
+            rows = float(stats.class_counts.get(o, 0))
+            return _Relation(rows, {s: rows} if s_var else {})
+
+        count = stats.predicate_triples.get(p, 0)
+        subjects = max(stats.predicate_subjects.get(p, 0), 1)
+        objects = max(stats.predicate_objects.get(p, 0), 1)
+        if not s_var and not o_var:
+            return _Relation(min(count / (subjects * objects), 1.0))
+        if not s_var:
+            rows = count / subjects
+            return _Relation(rows, {o: min(rows, objects)})
+        if not o_var:
+            rows = count / objects
+            return _Relation(rows, {s: min(rows, subjects)})
+        if s == o:
+            return _Relation(count / max(subjects, objects), {s: min(subjects, objects)})
+        return _Relation(float(count), {s: float(subjects), o: float(objects)})
+
+    @staticmethod
+    def _join(left: _Relation, right: _Relation, scan: bool = True) -> _Relation:
+        """Estimate the join of two relations on their shared variables"""
+        shared = set(left.distinct) & set(right.distinct)
+        rows = left.rows * right.rows
+        distinct = dict(left.distinct)
+        for var, count in right.distinct.items():
+            if var in shared:
+                rows /= max(left.distinct[var], count, 1.0)
+                distinct[var] = min(left.distinct[var], count)
+            else:
+                distinct[var] = count
+        for var in distinct:
+            distinct[var] = min(distinct[var], max(rows, 1.0))
+
+        cartesian = left.cartesian or right.cartesian or \
+            (not shared and left.rows > 1 and right.rows > 1)
+        work = left.work + right.work + rows
+        if scan:
+            work += right.rows
+        return _Relation(rows, distinct, work, cartesian, left.blocking or right.blocking)
+
+    def _filter(self, expr: Any, relation: _Relation,
+                stats: GraphStatistics) -> Tuple[float, float]:
+        """Selectivity of a filter expression and the work it adds"""
+        name = getattr(expr, 'name', None)
+
+        if name == 'ConditionalAndExpression':
+            selectivity, work = self._filter(expr.expr, relation, stats)
+            for other in expr.other or ():
+                part, extra = self._filter(other, relation, stats)
+                selectivity *= part
+                work += extra
+            return selectivity, work
+
+        if name == 'ConditionalOrExpression':
+            selectivity, work = self._filter(expr.expr, relation, stats)
+            for other in expr.other or ():
+                part, extra = self._filter(other, relation, stats)
+                selectivity = selectivity + part - selectivity * part
+                work += extra
+            return selectivity, work
+
+        if name == 'RelationalExpression':
+            operator = str(expr.op)
+            selectivity = OPERATOR_SELECTIVITY.get(operator, DEFAULT_SELECTIVITY)
+            if selectivity is None:
+                variables = [term for term in (expr.expr, expr.other)
+                             if isinstance(term, Variable)]
+                counts = [relation.distinct.get(var, 0) for var in variables]
+                selectivity = 1 / max(max(counts, default=0), 1.0) if counts else DEFAULT_SELECTIVITY
+            return selectivity, relation.rows
+
+        if name in ('Builtin_EXISTS', 'Builtin_NOTEXISTS'):
+            # The inner pattern runs once per row, starting from that row's bindings
+            triples = _pattern_triples(expr.graph)
+            inner_vars = {term for triple in triples for term in triple if isinstance(term, Variable)}
+            seed = _Relation(1.0, {var: 1.0 for var in inner_vars & set(relation.distinct)})
+            inner = self._bgp(triples, stats, seed)
+            selectivity = min(inner.rows, 1.0)
+            if name == 'Builtin_NOTEXISTS':
+                selectivity = 1.0 - selectivity
+            return selectivity, relation.rows * max(inner.work, 1.0)
+
+        return DEFAULT_SELECTIVITY, relation.rows
+
+
+def _pattern_triples(node: Any) -> List[tuple]:
+    """Every triple pattern inside an (untranslated) group graph pattern"""
+    found = []
+    if isinstance(node, CompValue):
+        for key, value in node.items():
+            if key == 'triples':
+                found.extend(tuple(triple) for triple in value)
+            elif key != '_vars':
+                found.extend(_pattern_triples(value))
+    elif isinstance(node, list):
+        for item in node:
+            found.extend(_pattern_triples(item))
+    return found
+
+
+class CostGuard:
+    """
+    Applies the cost policy to generated queries
+
+    Above max_estimated_work a query is replaced by its template's rewrite
+    (if that is cheaper); if it is still too expensive it runs with a row
+    cap, or is rejected outright above reject_estimated_work.
+    """
+
+    def __init__(self, sparql_generator, estimator: CostEstimator,
+                 max_work: float = None, reject_work: float = None,
+                 row_cap: int = None, enabled: bool = None):
+        """
+        Initialize guard
+
+        Args:
+            sparql_generator: SPARQLGenerator
+            estimator: CostEstimator for the queried graph
+            max_work: Estimated intermediate rows before rewriting/capping
+            reject_work: Estimated intermediate rows before rejecting
+            row_cap: Rows returned by a capped query
+            enabled: Set to False to only report estimates
+        """
+        self.sparql_generator = sparql_generator
+        self.estimator = estimator
+        self.max_work = max_work or COST_CONFIG.get('max_estimated_work', 20000)
+        self.reject_work = reject_work or COST_CONFIG.get('reject_estimated_work', 5000000)
+        self.row_cap = row_cap or COST_CONFIG.get('row_cap', 10000)
+        self.enabled = enabled if enabled is not None else COST_CONFIG.get('enable_cost_guard', True)
+
+    def generate(self, nlp_result: Dict[str, Any],
+                 cursor: str = None) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Generate a query and decide whether and how it may run
+
+        The decision is made on the first page, so every page of a question
+        uses the same template and cursors stay valid.
+
+        Args:
+            nlp_result: Dictionary containing NLP analysis results
+            cursor: Token returned by next_cursor to fetch a later page
+
+        Returns:
+            Tuple of (SPARQL query or None if rejected, cost dict with
+            template, estimated_rows, estimated_work, cartesian, action
+            ('run', 'rewrite', 'cap' or 'reject'), row_cap and message)
+        """
+        generator = self.sparql_generator
+        template = generator.select_template(nlp_result)
+        query = generator.generate_with(template.name, nlp_result)
+        estimate = self.estimator.estimate(query)
+        action = 'run'
+        message = None
+
+        if self.enabled and estimate.work > self.max_work and template.rewrite:
+            rewritten = generator.generate_with(template.rewrite, nlp_result)
+            rewritten_estimate = self.estimator.estimate(rewritten)
+            if rewritten_estimate.work < estimate.work:
+                message = (f"Rewritten from '{template.name}' "
+                           f"({self._describe(estimate)})")
+                template = generator.registry.get(template.rewrite)
+                query, estimate, action = rewritten, rewritten_estimate, 'rewrite'
+
+        row_cap = None
+        if self.enabled and estimate.work > self.reject_work:
+            cost = self._cost(template.name, estimate, 'reject', None,
+                              f"Query rejected: {self._describe(estimate)} "
+                              f"exceeds {self.reject_work:,}")
+            return None, cost
+        if self.enabled and estimate.work > self.max_work:
+            action, row_cap = 'cap', self.row_cap
+            message = f"Result capped at {row_cap:,} rows ({self._describe(estimate)})"
+
+        if cursor:
+            query = generator.generate_with(template.name, nlp_result, cursor)
+        return query, self._cost(template.name, estimate, action, row_cap, message)
+
+    @staticmethod
+    def _describe(estimate: CostEstimate) -> str:
+        text = f"estimated {estimate.work:,} intermediate rows"
+        if estimate.cartesian:
+            text += " from a Cartesian product"
+        return text
+
+    @staticmethod
+    def _cost(template: str, estimate: CostEstimate, action: str,
+              row_cap: Optional[int], message: Optional[str]) -> Dict[str, Any]:
+        return {
+            'template': template,
+            'estimated_rows': estimate.rows,
+            'estimated_work': estimate.work,
+            'cartesian': estimate.cartesian,
+            'action': action,
+            'row_cap': row_cap,
+            'message': message,
+        }
@@ -0,0 +1,149 @@
+"""
+Entity Gazetteer Module
+
+This module builds a gazetteer of named entities (institutions, customers,
+countries and currencies) from the literals in the loaded RDF graph and
+compiles it into a token-boundary keyword matcher.
+"""
+
+from typing import Dict, List, Iterable, Set, Tuple
+from rdflib import Literal, URIRef
+from keyword_matcher import KeywordMatcher, KeywordHit, split_key
+from fuzzy_index import FuzzyIndex
+from config import RDF_DATASET, NLP_CONFIG
+
+# Literal properties that name an entity, and the entity kind they name
+GAZETTEER_PREDICATES = {
+    'bankName': 'institution',
+    'fullName': 'customer',
+    'countryName': 'country',
+    'isoCode': 'currency',
+}
+
+
+class EntityGazetteer:
+    """
+    Gazetteer of entity names taken from the RDF graph
+
+    Every name is registered under one or more aliases; an alias maps to
+    the local name of the entity (e.g. "icici bank" -> "ICICI_Bank").
+    Changes to the graph are applied incrementally through apply_changes.
+    """
+
+    def __init__(self, namespace: str = None):
+        """
+        Initialize an empty gazetteer
+
+        Args:
+            namespace: Namespace of the dataset's resources
+        """
+        self.namespace = namespace or RDF_DATASET['namespace']
+        self.predicates = {
+            URIRef(self.namespace + local): kind
+            for local, kind in GAZETTEER_PREDICATES.items()
+        }
+        self.matcher = KeywordMatcher()
+        self.fuzzy_index = FuzzyIndex(NLP_CONFIG.get('fuzzy_max_edit_distance', 1),
+                                      NLP_CONFIG.get('fuzzy_min_word_length', 5))
+
+        # (kind, alias) -> local names of the entities using that alias
+        self._aliases: Dict[Tuple[str, str], Set[str]] = {}
+        # word -> number of aliases containing it
+        self._word_counts: Dict[str, int] = {}
+
+    @classmethod
+    def from_graph(cls, graph, namespace: str = None) -> 'EntityGazetteer':
+        """
+        Build a gazetteer from every name literal in a graph
+
+        Args:
+            graph: rdflib Graph to read names from
+            namespace: Namespace of the dataset's resources
+
+        Returns:
+            Populated EntityGazetteer
+        """
+        gazetteer = cls(namespace)
+        for predicate in gazetteer.predicates:
+            gazetteer.apply_changes(graph.triples((None, predicate, None)), ())
+        return gazetteer
+
+    @property
+    def words(self) -> Set[str]:
+        """Tokens that occur in at least one alias"""
+        return self._word_counts.keys()
+
+    def apply_changes(self, added: Iterable[tuple], removed: Iterable[tuple]):
+        """
+        Update the gazetteer from triples added to or removed from the graph
+
+        Triples that do not carry an entity name are ignored, so this can
+        be registered directly as an RDFQueryExecutor change listener.
+
+        Args:
+            added: Triples added to the graph
+            removed: Triples removed from the graph
+        """
+        for triple in removed:
+            for kind, alias, name in self._aliases_for(triple):
+                self._remove_alias(kind, alias, name)
+        for triple in added:
+            for kind, alias, name in self._aliases_for(triple):
+                self._add_alias(kind, alias, name)
+
+    def match(self, tokens: List[str], lemmas: List[str]) -> List[KeywordHit]:
+        """Find every entity alias in the token stream"""
+        return self.matcher.match(tokens, lemmas)
+
+    def _aliases_for(self, triple: tuple) -> List[Tuple[str, str, str]]:
+        """Return the (kind, alias, local name) entries a triple defines"""
+        subject, predicate, obj = triple
+        kind = self.predicates.get(predicate)
+        if kind is None or not isinstance(obj, Literal):
+            return []
+
+        name = str(subject)
+        if name.startswith(self.namespace):
+            name = name[len(self.namespace):]
+        label = str(obj).strip().lower()
+
+        aliases = {label, name.replace('_', ' ').lower()}
+        if kind == 'institution':
+            # "ICICI Bank" is usually written as just "ICICI"
+            for alias in list(aliases):
+                parts = split_key(alias)
+                if len(parts) > 1 and parts[-1] == 'bank':
+                    aliases.add(' '.join(parts[:-1]))
+
+        return [(kind, alias, name) for alias in aliases if split_key(alias)]
+
+    def _add_alias(self, kind: str, alias: str, name: str):
+        """Register one alias of an entity"""
+        names = self._aliases.setdefault((kind, alias), set())
+        if name in names:
+            return
+        if not names:
+            for word in split_key(alias):
+                self._word_counts[word] = self._word_counts.get(word, 0) + 1
+                if word.isalpha():
+                    self.fuzzy_index.add(word)
+        names.add(name)
+        self.matcher.add(kind, alias, min(names))
+
+    def _remove_alias(self, kind: str, alias: str, name: str):
+        """Unregister one alias of an entity"""
+        names = self._aliases.get((kind, alias))
+        if not names or name not in names:
+            return
+        names.discard(name)
+        if names:
+            self.matcher.add(kind, alias, min(names))
+            return
+
+        del self._aliases[(kind, alias)]
+        self.matcher.remove(kind, alias)
+        for word in split_key(alias):
+            self._word_counts[word] -= 1
+            if not self._word_counts[word]:
+                del self._word_counts[word]
+                self.fuzzy_index.remove(word)
@@ -0,0 +1,165 @@
+"""
+Fuzzy Index Module
+
+This module provides typo-tolerant word lookup using the symmetric delete
+algorithm: every indexed word is stored under all strings reachable by
+deleting up to N characters, so a lookup only generates the deletes of the
+query word and verifies the few candidates that share one.
+"""
+
+from typing import Dict, Iterable, Optional, Set
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance between two words
+
+    Counts insertions, deletions, substitutions and adjacent
+    transpositions. Only the diagonal band of width 2 * limit + 1 is
+    computed, and limit + 1 is returned as soon as the distance is known
+    to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if limit == 1:
+        return _distance_within_one(a, b)
+
+    over = limit + 1
+    len_b = len(b)
+    previous2 = None
+    previous = [j if j <= limit else over for j in range(len_b + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len_b + 1)
+        if i <= limit:
+            current[0] = i
+        low = max(1, i - limit)
+        high = min(len_b, i + limit)
+        char_a = a[i - 1]
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = 0 if char_a == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1,
+                        previous[j - 1] + cost)
+            if (i > 1 and j > 1 and char_a == b[j - 2]
+                    and a[i - 2] == b[j - 1]):
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value if value < over else over
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _distance_within_one(a: str, b: str) -> int:
+    """Linear-time edit_distance for limit 1 (returns 0, 1 or 2)"""
+    if a == b:
+        return 0
+    if len(a) > len(b):
+        a, b = b, a
+
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+
+    if len(a) == len(b):
+        if a[i + 1:] == b[i + 1:]:
+            return 1
+        if (i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i]
+                and a[i + 2:] == b[i + 2:]):
+            return 1
+        return 2
+    return 1 if a[i:] == b[i + 1:] else 2
+
+
+class FuzzyIndex:
+    """
+    Symmetric delete index over a set of words
+    """
+
+    def __init__(self, max_distance: int = 1, min_length: int = 4):
+        """
+        Initialize an empty index
+
+        Args:
+            max_distance: Largest edit distance a lookup may correct
+            min_length: Words shorter than this are never corrected
+        """
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self._words: Set[str] = set()
+        self._deletes: Dict[str, Set[str]] = {}
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._words
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def add(self, word: str):
+        """Index a word"""
+        if word in self._words:
+            return
+        self._words.add(word)
+        for variant in self._variants(word):
+            self._deletes.setdefault(variant, set()).add(word)
+
+    def add_all(self, words: Iterable[str]):
+        """Index every word of an iterable"""
+        for word in words:
+            self.add(word)
+
+    def remove(self, word: str):
+        """Remove a word from the index"""
+        if word not in self._words:
+            return
+        self._words.discard(word)
+        for variant in self._variants(word):
+            bucket = self._deletes.get(variant)
+            if bucket is not None:
+                bucket.discard(word)
+                if not bucket:
+                    del self._deletes[variant]
+
+    def lookup(self, word: str) -> Optional[tuple]:
+        """
+        Find the closest indexed word
+
+        Args:
+            word: Possibly misspelled word
+
+        Returns:
+            Tuple of (indexed word, distance), or None if no indexed word
+            is within max_distance. Ties are broken alphabetically.
+        """
+        if word in self._words:
+            return word, 0
+        if self.max_distance <= 0 or len(word) < self.min_length:
+            return None
+
+        candidates = set()
+        for variant in self._variants(word):
+            candidates.update(self._deletes.get(variant, ()))
+
+        best = None
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, self.max_distance)
+            if distance > self.max_distance:
+                continue
+            if best is None or (distance, candidate) < best[::-1]:
+                best = (candidate, distance)
+        return best
+
+    def _variants(self, word: str) -> Set[str]:
+        """All strings reachable by deleting up to max_distance characters"""
+        variants = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            next_frontier = set()
+            for item in frontier:
+                for i in range(len(item)):
+                    next_frontier.add(item[:i] + item[i + 1:])
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
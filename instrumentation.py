@@ -0,0 +1,431 @@
+"""
+Instrumentation Module
+
+This module collects metrics and traces from the pipeline: latency
+histograms per stage (NLP, generation, parse, evaluation, DataFrame
+conversion) and per query template, counters for queries, result rows
+and errors, and cache statistics read from the components when metrics
+are scraped. Every question gets a query ID and a trace of the stages it
+went through, written as one JSON line per question to the trace log.
+Metrics are exported in the Prometheus text format.
+
+Instrumentation is off unless DEBUG_CONFIG['instrumentation'] is set;
+while off, every hook returns after checking two flags. Setting tracing
+collects traces without metrics or the trace log, for the slow-query
+log (slow_query_log.py), which needs the stage timings of a question.
+"""
+
+import atexit
+import itertools
+import json
+import multiprocessing.util
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import DEBUG_CONFIG
+from jsonl_log import JsonlLog
+
+# Latency buckets (seconds) and result size buckets (rows)
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+ROW_BUCKETS = [0, 1, 10, 100, 1000, 10000, 100000]
+
+# Metric name -> (type, help)
+METRICS = {
+    'nl2sparql_stage_seconds': ('histogram', "Time spent in each pipeline stage"),
+    'nl2sparql_query_seconds': ('histogram', "Time to answer a query, by template"),
+    'nl2sparql_queries_total': ('counter', "Queries answered, by template and status"),
+    'nl2sparql_result_rows': ('histogram', "Rows returned per query"),
+    'nl2sparql_errors_total': ('counter', "Errors raised in each pipeline stage"),
+}
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket (cumulative, Prometheus style)
+    """
+
+    def __init__(self, bounds: List[float]):
+        """
+        Initialize histogram
+
+        Args:
+            bounds: Increasing bucket upper bounds; larger values only
+                count towards +Inf
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Record one value"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the histogram
+
+        Returns:
+            Dictionary with buckets (upper bound -> observations at or
+            below it), count and sum
+        """
+        buckets, total = {}, 0
+        for bound, count in zip(self.bounds + ['+Inf'], self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {'buckets': buckets, 'count': self.count, 'sum': round(self.sum, 3)}
+
+
+class Trace:
+    """Stages and attributes of one question"""
+
+    __slots__ = ('query_id', 'query', 'started', 'ended', 'spans', 'attrs')
+
+    def __init__(self, query_id: str, query: str):
+        self.query_id = query_id
+        self.query = query
+        self.started = time.perf_counter()
+        self.ended = None
+        # (stage, started, ended, error) as perf_counter times
+        self.spans: List[tuple] = []
+        self.attrs: Dict[str, Any] = {}
+
+    @property
+    def seconds(self) -> float:
+        """Duration of the trace (so far, while it is open)"""
+        return (self.ended or time.perf_counter()) - self.started
+
+    def span_entries(self) -> List[Dict[str, Any]]:
+        """Spans as dictionaries of stage, start_ms (from the trace start), duration_ms and error"""
+        entries = []
+        for name, started, ended, error in self.spans:
+            entry = {'stage': name,
+                     'start_ms': round((started - self.started) * 1000, 3),
+                     'duration_ms': round((ended - started) * 1000, 3)}
+            if error is not None:
+                entry['error'] = error
+            entries.append(entry)
+        return entries
+
+
+class _Stage:
+    """Times a stage: observes its latency and adds a span to the current trace"""
+
+    __slots__ = ('owner', 'name', 'started')
+
+    def __init__(self, owner: 'Instrumentation', name: str):
+        self.owner = owner
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.owner._end_stage(self.name, self.started, time.perf_counter(), exc)
+        return False
+
+
+class _TraceScope:
+    """Makes a trace current for its block, and finishes it at the end"""
+
+    __slots__ = ('owner', 'trace')
+
+    def __init__(self, owner: 'Instrumentation', trace: Trace):
+        self.owner = owner
+        self.trace = trace
+
+    def __enter__(self) -> Trace:
+        self.owner._local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.trace.ended = time.perf_counter()
+        self.owner._local.trace = None
+        if exc is not None:
+            self.trace.attrs.setdefault('status', 'error')
+            self.trace.attrs.setdefault('error', str(exc))
+        self.owner._finish(self.trace)
+        return False
+
+
+class _NoScope:
+    """Block that does nothing (instrumentation off, or already traced)"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NO_SCOPE = _NoScope()
+
+
+class Instrumentation:
+    """
+    Metrics registry, tracer and trace log (thread-safe)
+    """
+
+    def __init__(self, enabled: bool = None, trace_log: str = None, max_log_bytes: int = None):
+        """
+        Initialize instrumentation
+
+        Args:
+            enabled: Collect metrics and traces (DEBUG_CONFIG['instrumentation']
+                if omitted)
+            trace_log: JSONL file traces are written to (DEBUG_CONFIG['trace_log']
+                if omitted; traces are not written if that is empty)
+            max_log_bytes: Size at which the trace log is rotated to path + '.1'
+        """
+        self.enabled = (DEBUG_CONFIG.get('instrumentation', False)
+                        if enabled is None else enabled)
+        self.trace_log = DEBUG_CONFIG.get('trace_log') if trace_log is None else trace_log
+        self.max_log_bytes = max_log_bytes or DEBUG_CONFIG.get('max_trace_log_bytes', 10485760)
+        # Collect traces even while metrics are off (set by the slow-query log)
+        self.tracing = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self._collectors: Dict[str, Callable[[], List[tuple]]] = {}
+        # Query IDs: a random per-process prefix and a sequence number
+        self._prefix = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+        self._pending: List[str] = []
+        self._log = JsonlLog(self.trace_log, self.max_log_bytes, 'trace log') if self.trace_log else None
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+        multiprocessing.util.register_after_fork(self, Instrumentation._close_at_exit)
+
+    # Hooks called by the components
+
+    def trace(self, query: str):
+        """
+        Trace a question for the duration of a with block
+
+        Args:
+            query: Question (or SPARQL text) being answered
+
+        Returns:
+            Context manager yielding the Trace, or None when neither
+            instrumentation nor tracing is on or a trace is already open in
+            this thread (the outer trace then covers the block)
+        """
+        if not (self.enabled or self.tracing) or getattr(self._local, 'trace', None) is not None:
+            return NO_SCOPE
+        query_id = f"{self._prefix}-{next(self._sequence):06d}"
+        return _TraceScope(self, Trace(query_id, query))
+
+    def stage(self, name: str):
+        """
+        Time a stage for the duration of a with block
+
+        Args:
+            name: Stage name (nlp, generate, parse, evaluate, dataframe)
+
+        Returns:
+            Context manager
+        """
+        if not (self.enabled or self.tracing):
+            return NO_SCOPE
+        return _Stage(self, name)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator timing every call of a function as a stage"""
+        def decorate(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not (self.enabled or self.tracing):
+                    return func(*args, **kwargs)
+                with _Stage(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def annotate(self, **attrs):
+        """
+        Set attributes of the current trace (template, rows, status, ...)
+
+        Does nothing when no trace is open.
+        """
+        if self.enabled or self.tracing:
+            trace = getattr(self._local, 'trace', None)
+            if trace is not None:
+                trace.attrs.update(attrs)
+
+    def current_query_id(self) -> Optional[str]:
+        """Query ID of the trace open in this thread (None if there is none)"""
+        trace = getattr(self._local, 'trace', None)
+        return None if trace is None else trace.query_id
+
+    def set_collector(self, name: str, collector: Callable[[], List[tuple]]):
+        """
+        Register a function read when metrics are exported
+
+        Args:
+            name: Collector name (a later collector of the same name replaces it)
+            collector: Callable returning (metric, type, help, labels dict,
+                value) samples, e.g. cache statistics a component keeps anyway
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    # Recording
+
+    def _histogram(self, name: str, labels: tuple, bounds: List[float]) -> Histogram:
+        """Histogram of a metric and label set, created on first use (lock held)"""
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(bounds)
+        return histogram
+
+    def _count(self, name: str, labels: tuple):
+        """Increment a counter (lock held)"""
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + 1
+
+    def _record_stages(self, spans: List[tuple]):
+        """Observe (stage, started, ended, error) spans (lock held)"""
+        for name, started, ended, error in spans:
+            labels = (('stage', name),)
+            self._histogram('nl2sparql_stage_seconds', labels, LATENCY_BUCKETS).observe(ended - started)
+            if error is not None:
+                self._count('nl2sparql_errors_total', labels)
+
+    def _end_stage(self, name: str, started: float, ended: float, exc: Optional[BaseException]):
+        span = (name, started, ended, None if exc is None else str(exc))
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            # Recorded along with the rest of the trace when it finishes
+            trace.spans.append(span)
+            return
+        if not self.enabled:
+            return
+        with self._lock:
+            self._record_stages([span])
+
+    def _finish(self, trace: Trace):
+        """Record a finished trace in the metrics and the trace log"""
+        if not self.enabled:
+            return
+        seconds = trace.seconds
+        attrs = trace.attrs
+        template = attrs.get('template') or 'none'
+        status = attrs.get('status') or ('error' if attrs.get('error') else 'ok')
+        with self._lock:
+            self._record_stages(trace.spans)
+            self._histogram('nl2sparql_query_seconds', (('template', template),),
+                            LATENCY_BUCKETS).observe(seconds)
+            self._count('nl2sparql_queries_total', (('template', template), ('status', status)))
+            if attrs.get('rows') is not None:
+                self._histogram('nl2sparql_result_rows', (), ROW_BUCKETS).observe(attrs['rows'])
+        if self.trace_log:
+            entry = {'time': round(time.time(), 3), 'query_id': trace.query_id,
+                     'query': trace.query, 'duration_ms': round(seconds * 1000, 3),
+                     'status': status}
+            entry.update(attrs)
+            entry['spans'] = trace.span_entries()
+            self._write(json.dumps(entry, default=str))
+
+    def _write(self, line: str):
+        """Queue a line for the trace log; a timer writes the queue out within a second"""
+        with self._lock:
+            self._pending.append(line + '\n')
+            if len(self._pending) == 1:
+                timer = threading.Timer(1.0, self.close)
+                timer.daemon = True
+                timer.start()
+
+    def _flush(self):
+        """Append the queued lines to the trace log in one write (lock held)"""
+        lines, self._pending = ''.join(self._pending), []
+        if lines and self._log:
+            self._log.append(lines)
+
+    def close(self):
+        """Write out the queued trace log lines"""
+        with self._lock:
+            self._flush()
+
+    def _after_fork(self):
+        """Fresh state in a forked child (e.g. a batch worker)"""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pending = []
+        if self._log:
+            self._log.after_fork()
+        self._prefix = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+
+    def _close_at_exit(self):
+        """Write out the trace log when a multiprocessing child exits"""
+        # Pool workers leave through os._exit, skipping atexit
+        multiprocessing.util.Finalize(self, self.close, exitpriority=10)
+
+    # Export
+
+    def samples(self) -> List[tuple]:
+        """
+        Get every metric
+
+        Returns:
+            List of (metric, type, help, labels dict, value) tuples, where
+            the value of a histogram is its snapshot
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [(key, histogram.snapshot()) for key, histogram in self._histograms.items()]
+            collectors = list(self._collectors.values())
+        samples = []
+        for (name, labels), value in counters + histograms:
+            kind, help_text = METRICS[name]
+            samples.append((name, kind, help_text, dict(labels), value))
+        for collector in collectors:
+            try:
+                samples.extend(collector())
+            except Exception as error:
+                print(f"Error collecting metrics: {error}")
+        return samples
+
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines, described = [], set()
+        for name, kind, help_text, labels, value in sorted(self.samples(), key=lambda s: s[0]):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+            if kind == 'histogram':
+                for bound, count in value['buckets'].items():
+                    lines.append(f"{name}_bucket{_labels(dict(labels, le=bound))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    """Prometheus label set, e.g. {stage="nlp"}"""
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+# Shared by the pipeline components
+INSTRUMENTATION = Instrumentation()
@@ -0,0 +1,93 @@
+"""
+JSONL Log Module
+
+This module appends JSON lines to a file that is rotated once it grows
+past a size limit; one rotated file (path + '.1') is kept and still
+read. The query log, the slow-query log and the trace log are written
+through it.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator
+
+
+class JsonlLog:
+    """
+    Rotating, append-only JSON lines file (thread-safe)
+    """
+
+    def __init__(self, path: str, max_bytes: int, name: str = 'log'):
+        """
+        Initialize log
+
+        Args:
+            path: JSONL file (its directory is created on the first write)
+            max_bytes: Size at which the file is rotated to path + '.1'
+            name: What the log is called in error messages
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.name = name
+        self._lock = threading.Lock()
+
+    def append(self, lines: str):
+        """
+        Append whole lines
+
+        Args:
+            lines: One or more lines, each ending with a newline
+        """
+        data = lines.encode('utf-8')
+        with self._lock:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+                # One append per call, so processes sharing the log never split a line
+                descriptor = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(descriptor, data)
+                finally:
+                    os.close(descriptor)
+            except OSError as error:
+                print(f"Error writing {self.name}: {error}")
+
+    def write(self, entry: Dict[str, Any]):
+        """
+        Append an entry as one line
+
+        Args:
+            entry: JSON-serializable dictionary (other values are written
+                as strings)
+        """
+        self.append(json.dumps(entry, default=str) + '\n')
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """
+        Read the logged entries, oldest first
+
+        Yields:
+            Entry dictionaries (the rotated file's first)
+        """
+        for path in (self.path + '.1', self.path):
+            try:
+                with open(path, encoding='utf-8') as log_file:
+                    for line in log_file:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            # A line cut short by a crash
+                            continue
+                        yield entry
+            except FileNotFoundError:
+                continue
+            except OSError as error:
+                print(f"Error reading {self.name}: {error}")
+
+    def after_fork(self):
+        """Fresh lock in a forked child"""
+        self._lock = threading.Lock()
@@ -0,0 +1,179 @@
+"""
+Keyword Matcher Module
+
+This module compiles the NLP vocabularies into a single token trie so that
+every keyword (single or multiword) is found in one pass over the query.
+"""
+
+import re
+from typing import Dict, List, Any, Iterable, NamedTuple, Optional, Sequence
+
+# Keys are split the same way the tokenizer splits text once punctuation
+# is dropped, so "cross-border" and "cross border" compile to one path.
+KEY_SPLIT_PATTERN = re.compile(r"[\s\-]+")
+
+
+class KeywordHit(NamedTuple):
+    """A single vocabulary match over the token stream"""
+    kind: str
+    value: Any
+    key: str
+    start: int
+    end: int
+    via_lemma: bool
+
+
+def split_key(key: str) -> List[str]:
+    """Split a vocabulary key into the token sequence it should match"""
+    return [part for part in KEY_SPLIT_PATTERN.split(key.lower()) if part]
+
+
+class KeywordMatcher:
+    """
+    Token trie over all vocabularies
+
+    Each trie node is a dict from token to child node; the reserved
+    ``None`` key of a node holds the (kind, key, value) entries that
+    end there.
+    """
+
+    def __init__(self):
+        """Initialize an empty trie"""
+        self._root: Dict[Optional[str], Any] = {}
+        self.max_key_length = 0
+
+    def add(self, kind: str, key: str, value: Any):
+        """
+        Add a vocabulary key to the trie
+
+        Args:
+            kind: Vocabulary the key belongs to (e.g. 'class', 'country')
+            key: Keyword or phrase as written in the vocabulary
+            value: Value emitted when the key matches
+        """
+        parts = split_key(key)
+        if not parts:
+            return
+
+        node = self._root
+        for part in parts:
+            node = node.setdefault(part, {})
+
+        entries = node.setdefault(None, [])
+        entries[:] = [entry for entry in entries
+                      if not (entry[0] == kind and entry[1] == key)]
+        entries.append((kind, key, value))
+        self.max_key_length = max(self.max_key_length, len(parts))
+
+    def add_mapping(self, kind: str, mapping: Dict[str, Any]):
+        """Add every key of a vocabulary dict under the given kind"""
+        for key, value in mapping.items():
+            self.add(kind, key, value)
+
+    def remove(self, kind: str, key: str):
+        """
+        Remove a vocabulary key from the trie
+
+        Args:
+            kind: Vocabulary the key belongs to
+            key: Keyword or phrase to remove
+        """
+        parts = split_key(key)
+        path = [self._root]
+        for part in parts:
+            child = path[-1].get(part)
+            if child is None:
+                return
+            path.append(child)
+
+        entries = path[-1].get(None, [])
+        entries[:] = [entry for entry in entries
+                      if not (entry[0] == kind and entry[1] == key)]
+        if not entries:
+            path[-1].pop(None, None)
+
+        # Prune branches that no longer lead to any entry
+        for depth in range(len(parts), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][parts[depth - 1]]
+
+    def words(self) -> Iterable[str]:
+        """Yield every token that appears in some compiled key"""
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            for token, child in node.items():
+                if token is not None:
+                    yield token
+                    stack.append(child)
+
+    def match(self, tokens: Sequence[str],
+              lemmas: Sequence[str]) -> List[KeywordHit]:
+        """
+        Find every vocabulary key in the token stream
+
+        At each position both the surface token and its lemma may
+        continue a key, so a single walk covers both forms.
+
+        Args:
+            tokens: Surface tokens (punctuation removed)
+            lemmas: Lemmas aligned with tokens
+
+        Returns:
+            List of hits ordered by start position
+        """
+        hits = []
+        length = len(tokens)
+
+        for start in range(length):
+            # Active states: (trie node, matched through a lemma)
+            states = [(self._root, False)]
+            end = start
+            while states and end < length:
+                token = tokens[end]
+                lemma = lemmas[end]
+                next_states = []
+                for node, via_lemma in states:
+                    child = node.get(token)
+                    if child is not None:
+                        next_states.append((child, via_lemma))
+                    if lemma != token:
+                        child = node.get(lemma)
+                        if child is not None:
+                            next_states.append((child, True))
+                end += 1
+
+                seen = set()
+                for node, via_lemma in next_states:
+                    for kind, key, value in node.get(None, ()):
+                        marker = (kind, key, via_lemma)
+                        if marker in seen:
+                            continue
+                        seen.add(marker)
+                        hits.append(KeywordHit(kind, value, key,
+                                               start, end, via_lemma))
+                states = next_states
+
+        return hits
+
+
+def first_hit(hits: List[KeywordHit], kind: str) -> Optional[KeywordHit]:
+    """
+    Return the preferred hit of a kind
+
+    Surface-token hits win over lemma-only hits, then the earliest
+    position wins, matching the old ``tokens + lemmas`` scan order.
+    """
+    best = None
+    for hit in hits:
+        if hit.kind != kind:
+            continue
+        if best is None or (hit.via_lemma, hit.start) < (best.via_lemma, best.start):
+            best = hit
+    return best
+
+
+def hits_of(hits: List[KeywordHit], kind: str) -> List[KeywordHit]:
+    """Return all hits of a kind in position order"""
+    return [hit for hit in hits if hit.kind == kind]
@@ -7,11 +7,50 @@ This module handles natural language processing using classical NLP techniques:
 - Stopword removal
 - POS tagging
 - Rule-based entity and intent detection
+
+Short queries made only of known words skip the spaCy pipeline and are
+tokenized by a regex plus a precomputed lemma table (the fast path).
 """
 
 import spacy
 import re
-from typing import Dict, List, Any
+import time
+from typing import Dict, List, Any, Optional, Tuple
+from keyword_matcher import KeywordHit, first_hit, hits_of
+from nlp_result import NLPResult
+from vocabulary import Vocabulary, VocabularyStore
+from config import NLP_CONFIG
+from instrumentation import INSTRUMENTATION
+
+# Whitespace-separated chunks the fast path can tokenize exactly like spaCy:
+# plain or hyphenated words, plain numbers, optional trailing punctuation
+FAST_CHUNK_PATTERN = re.compile(r"(?:[a-z]+(?:-[a-z]+)*|\d+(?:[.,]\d+)*%?)[.,?!]*")
+FAST_TOKEN_PATTERN = re.compile(r"\d+(?:[.,]\d+)*|[a-z]+|\S")
+
+# Words after which _detect_filters reads an entity name off the POS tags
+ENTITY_PREPOSITIONS = ('in', 'at', 'with', 'for')
+
+
+class FastToken:
+    """
+    Minimal stand-in for a spaCy Token, produced by the fast path
+
+    Exposes only the attributes NLPProcessor reads from a Doc.
+    """
+    
+    __slots__ = ('text', 'lemma_', 'pos_', 'is_punct', 'is_stop',
+                 'like_num', 'is_title')
+    
+    def __init__(self, text: str, lemma: str, pos: str, is_punct: bool,
+                 is_stop: bool, like_num: bool):
+        self.text = text
+        self.lemma_ = lemma
+        self.pos_ = pos
+        self.is_punct = is_punct
+        self.is_stop = is_stop
+        self.like_num = like_num
+        self.is_title = False
+
 
 class NLPProcessor:
     """
@@ -19,8 +58,18 @@ class NLPProcessor:
     using classical NLP techniques (no LLMs)
     """
     
-    def __init__(self):
-        """Initialize spaCy model and define RDF mappings"""
+    def __init__(self, enable_fast_path: bool = None):
+        """
+        Initialize spaCy model and compile the RDF mapping vocabulary
+        
+        Args:
+            enable_fast_path: Serve fully covered queries without spaCy
+                (defaults to NLP_CONFIG['enable_fast_path'])
+        """
+        if enable_fast_path is None:
+            enable_fast_path = NLP_CONFIG.get('enable_fast_path', True)
+        self.enable_fast_path = enable_fast_path
+        
         try:
             self.nlp = spacy.load("en_core_web_sm")
         except OSError:
@@ -29,239 +78,229 @@ class NLPProcessor:
             subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
             self.nlp = spacy.load("en_core_web_sm")
         
-        # RDF Class mappings (keywords -> RDF classes)
-        self.class_mappings = {
-            'customer': 'Customer',
-            'customers': 'Customer',
-            'people': 'Customer',
-            'person': 'Customer',
-            'user': 'Customer',
-            'users': 'Customer',
-            
-            'transaction': 'Transaction',
-            'transactions': 'Transaction',
-            'txn': 'Transaction',
-            'transfer': 'Transaction',
-            'transfers': 'Transaction',
-            
-            'remittance': 'Remittance',
-            'remittances': 'Remittance',
-            'remit': 'Remittance',
-            
-            'account': 'Account',
-            'accounts': 'Account',
-            'acc': 'Account',
-            
-            'bank': 'Bank',
-            'banks': 'Bank',
-            
-            'fintech': 'FinTech',
-            'fintechs': 'FinTech',
-            
-            'institution': 'Institution',
-            'institutions': 'Institution',
-            
-            'currency': 'Currency',
-            'currencies': 'Currency',
-            
-            'country': 'Country',
-            'countries': 'Country',
-            
-            'rate': 'Rate',
-            'rates': 'Rate',
-            'exchange': 'Rate',
-            
-            'status': 'Status',
-        }
+        # Graph-derived entity names, see attach_gazetteer
+        self.gazetteer = None
         
-        # RDF Property mappings (keywords -> RDF properties)
-        self.property_mappings = {
-            'name': 'fullName',
-            'names': 'fullName',
-            'fullname': 'fullName',
-            'full': 'fullName',
-            
-            'country': 'basedIn',
-            'location': 'basedIn',
-            'based': 'basedIn',
-            'living': 'basedIn',
-            'live': 'basedIn',
-            'from': 'basedIn',
-            
-            'amount': 'amountSent',
-            'sent': 'amountSent',
-            'send': 'amountSent',
-            
-            'received': 'amountReceived',
-            'receive': 'amountReceived',
-            
-            'initiated': 'initiatedBy',
-            'initiate': 'initiatedBy',
-            'sender': 'initiatedBy',
-            
-            'processed': 'processedBy',
-            'process': 'processedBy',
-            'processor': 'processedBy',
-            
-            'account': 'hasAccount',
-            'accounts': 'hasAccount',
-            
-            'balance': 'balance',
-            
-            'status': 'hasStatus',
-            'state': 'hasStatus',
-            
-            'bankname': 'bankName',
-            
-            'currency': 'fromCurrency',
-            'fromcurrency': 'fromCurrency',
-            'tocurrency': 'toCurrency',
-            
-            'rate': 'appliedRate',
-        }
+        # Built-in + config.py mappings, hot reloaded when config.py changes
+        self.vocabulary_store = VocabularyStore(self.nlp)
+        self._tokenizer_exceptions = set(getattr(self.nlp.tokenizer, 'rules', None) or ())
         
-        # Country mappings
-        self.countries = {
-            'india': 'India',
-            'indian': 'India',
-            'uk': 'UK',
-            'britain': 'UK',
-            'england': 'UK',
-            'usa': 'USA',
-            'america': 'USA',
-            'us': 'USA',
-            'united states': 'USA',
+        # Fast path usage counters
+        self.fast_path_stats = {
+            'fast_path_queries': 0,
+            'spacy_queries': 0,
+            'fast_path_seconds': 0.0,
+            'spacy_seconds': 0.0,
         }
         
-        # Status mappings
-        self.statuses = {
-            'completed': 'Completed',
-            'complete': 'Completed',
-            'success': 'Completed',
-            'successful': 'Completed',
-            'pending': 'Pending',
-            'failed': 'Failed',
-            'failure': 'Failed',
-            'fail': 'Failed',
-        }
+    def attach_gazetteer(self, gazetteer):
+        """
+        Use a graph-derived entity gazetteer for entity detection
+        
+        Args:
+            gazetteer: EntityGazetteer built from the loaded RDF graph
+        """
+        self.gazetteer = gazetteer
+    
+    @property
+    def vocabulary(self) -> Vocabulary:
+        """Currently installed compiled vocabulary"""
+        return self.vocabulary_store.current
+    
+    def reload_vocabulary(self) -> bool:
+        """
+        Re-read custom mappings from config.py without reloading spaCy
+
+        Returns:
+            True on success (on failure vocabulary_store.reload_error says why)
+        """
+        return self.vocabulary_store.reload()
+    
+    def validate_vocabulary(self, graph) -> List[str]:
+        """
+        Check mapping targets against the classes and properties in a graph
         
-        # Intent keywords
-        self.intent_keywords = {
-            'list': 'list',
-            'show': 'list',
-            'display': 'list',
-            'get': 'list',
-            'retrieve': 'list',
-            'find': 'list',
-            'fetch': 'list',
+        Args:
+            graph: rdflib Graph the queries run against
             
-            'count': 'count',
-            'number': 'count',
-            'total': 'count',
-            'how many': 'count',
+        Returns:
+            List of warning messages; invalid custom mappings are dropped
+        """
+        return self.vocabulary_store.validate(graph)
+    
+    def _is_known_word(self, word: str, vocab: Vocabulary) -> bool:
+        """Check whether a word is in the lemma table or the gazetteer"""
+        if word in vocab.lemma_table:
+            return True
+        return self.gazetteer is not None and word in self.gazetteer.words
+    
+    def _correct_typos(self, tokens: List[str], lemmas: List[str],
+                       vocab: Vocabulary) -> Tuple[List[str], List[str], Dict[str, str]]:
+        """
+        Replace misspelled words with the closest vocabulary or entity word
+        
+        Args:
+            tokens: Surface tokens
+            lemmas: Lemmas aligned with tokens
+            vocab: Vocabulary to correct against
             
-            'filter': 'filter',
-            'where': 'filter',
-            'with': 'filter',
-        }
+        Returns:
+            Tuple of (corrected tokens, corrected lemmas, corrections made)
+        """
+        corrections = {}
+        if vocab.fuzzy_index.max_distance <= 0:
+            return tokens, lemmas, corrections
         
-        # Aggregation keywords
-        self.aggregation_keywords = {
-            'count': 'COUNT',
-            'total': 'COUNT',
-            'number': 'COUNT',
-            'sum': 'SUM',
-            'average': 'AVG',
-            'avg': 'AVG',
-            'minimum': 'MIN',
-            'min': 'MIN',
-            'maximum': 'MAX',
-            'max': 'MAX',
-            'highest': 'MAX',
-            'lowest': 'MIN',
-        }
+        tokens = list(tokens)
+        lemmas = list(lemmas)
+        for i, token in enumerate(tokens):
+            if not token.isalpha() or self._is_known_word(token, vocab) \
+                    or self._is_known_word(lemmas[i], vocab):
+                continue
+            
+            match = vocab.fuzzy_index.lookup(token)
+            if self.gazetteer is not None:
+                entity_match = self.gazetteer.fuzzy_index.lookup(token)
+                if entity_match and (not match or entity_match[1] < match[1]):
+                    match = entity_match
+            if match:
+                word = match[0]
+                tokens[i] = word
+                lemmas[i] = vocab.lemma_table.get(word, (word,))[0]
+                corrections[token] = word
         
-        # Comparison keywords
-        self.comparison_keywords = {
-            'greater': '>',
-            'more': '>',
-            'over': '>',
-            'above': '>',
-            'less': '<',
-            'under': '<',
-            'below': '<',
-            'equal': '=',
-            'equals': '=',
-        }
+        return tokens, lemmas, corrections
+    
+    def _fast_doc(self, query: str, vocab: Vocabulary) -> Optional[List[FastToken]]:
+        """
+        Tokenize a lowercased query without spaCy
+        
+        Args:
+            query: Lowercased query
+            vocab: Vocabulary whose lemma table defines coverage
+        
+        Returns:
+            List of FastToken, or None if any token is not covered by the
+            lemma table, or its tag would be read in context, and the
+            query must go through spaCy
+        """
+        doc = []
+        lexicon = self.nlp.vocab
+        for chunk in query.split():
+            if not FAST_CHUNK_PATTERN.fullmatch(chunk):
+                return None
+            for text in FAST_TOKEN_PATTERN.findall(chunk):
+                if text in self._tokenizer_exceptions:
+                    return None
+                # Lemma table tags are context-free; whether a word after a
+                # preposition is a proper noun is spaCy's call
+                if doc and doc[-1].text in ENTITY_PREPOSITIONS:
+                    return None
+                lexeme = lexicon[text]
+                if text in vocab.lemma_table:
+                    lemma, pos = vocab.lemma_table[text]
+                elif self.gazetteer is not None and text in self.gazetteer.words:
+                    lemma, pos = text, 'PROPN'
+                elif lexeme.like_num:
+                    lemma, pos = text, 'NUM'
+                elif lexeme.is_punct:
+                    lemma, pos = text, 'PUNCT'
+                else:
+                    return None
+                doc.append(FastToken(text, lemma, pos, lexeme.is_punct,
+                                     lexeme.is_stop, lexeme.like_num))
+        return doc
+    
+    def get_fast_path_stats(self) -> Dict[str, Any]:
+        """
+        Report how much traffic the fast path served
         
-        # Special query patterns
-        self.special_patterns = {
-            'multiple': 'HAVING_MULTIPLE',
-            'both': 'BOTH_TYPES',
-            'cross-border': 'CROSS_BORDER',
-            'international': 'CROSS_BORDER',
-            'foreign': 'FOREIGN',
-            'highest': 'TOP',
-            'top': 'TOP',
-            'most': 'TOP',
-            'trail': 'FULL_CHAIN',
-            'chain': 'FULL_CHAIN',
-            'compare': 'COMPARISON',
-            'versus': 'COMPARISON',
-            'vs': 'COMPARISON',
+        Returns:
+            Dictionary with query counts, fast path share (percent) and
+            mean tokenization latency per path in milliseconds
+        """
+        stats = self.fast_path_stats
+        fast = stats['fast_path_queries']
+        slow = stats['spacy_queries']
+        total = fast + slow
+        return {
+            'fast_path_queries': fast,
+            'spacy_queries': slow,
+            'fast_path_share': 100.0 * fast / total if total else 0.0,
+            'fast_path_mean_ms': 1000 * stats['fast_path_seconds'] / fast if fast else 0.0,
+            'spacy_mean_ms': 1000 * stats['spacy_seconds'] / slow if slow else 0.0,
         }
         
-    def process(self, query: str) -> Dict[str, Any]:
+    @INSTRUMENTATION.timed('nlp')
+    def process(self, query: str, keep_doc: bool = True) -> NLPResult:
         """
         Process natural language query and extract structured information
         
         Args:
             query: Natural language query string
+            keep_doc: Keep the Doc so token/lemma/POS views can be built
+                on access; batch and API callers that only need the
+                semantic fields pass False to save memory
             
         Returns:
-            Dictionary containing extracted entities and intent
+            Dict-compatible NLPResult with extracted entities and intent
         """
+        # Use one vocabulary snapshot for the whole query
+        self.vocabulary_store.maybe_reload()
+        vocab = self.vocabulary_store.current
+        
         # Convert to lowercase for processing
         query_lower = query.lower()
         
-        # Process with spaCy
-        doc = self.nlp(query_lower)
+        # Tokenize with the fast path when possible, otherwise with spaCy
+        started = time.perf_counter()
+        doc = self._fast_doc(query_lower, vocab) if self.enable_fast_path else None
+        if doc is not None:
+            self.fast_path_stats['fast_path_queries'] += 1
+            self.fast_path_stats['fast_path_seconds'] += time.perf_counter() - started
+        else:
+            doc = self.nlp(query_lower)
+            self.fast_path_stats['spacy_queries'] += 1
+            self.fast_path_stats['spacy_seconds'] += time.perf_counter() - started
         
         # Extract tokens and lemmas
         tokens = [token.text for token in doc if not token.is_punct]
         lemmas = [token.lemma_ for token in doc if not token.is_punct]
-        pos_tags = [token.pos_ for token in doc if not token.is_punct]
         
-        # Remove stopwords for better analysis
-        filtered_tokens = [token.text for token in doc 
-                          if not token.is_stop and not token.is_punct]
+        # Correct misspelled vocabulary and entity words
+        match_tokens, match_lemmas, corrections = self._correct_typos(tokens, lemmas, vocab)
+        
+        # Find every vocabulary keyword in a single pass
+        hits = vocab.matcher.match(match_tokens, match_lemmas)
+        if self.gazetteer is not None:
+            hits += self.gazetteer.match(match_tokens, match_lemmas)
         
         # Detect intent
-        intent = self._detect_intent(tokens, lemmas)
+        intent = self._detect_intent(hits)
         
         # Detect classes
-        classes = self._detect_classes(tokens, lemmas)
+        classes = self._detect_classes(hits)
         
         # Detect properties
-        properties = self._detect_properties(tokens, lemmas)
+        properties = self._detect_properties(hits)
         
         # Detect filters (conditions)
-        filters = self._detect_filters(query_lower, tokens, lemmas, doc)
+        filters = self._detect_filters(match_tokens, hits, doc)
         
         # Detect aggregation
-        aggregation = self._detect_aggregation(tokens, lemmas)
+        aggregation = self._detect_aggregation(hits)
         
         # Detect ordering
-        order_by = self._detect_ordering(tokens, lemmas)
+        order_by = self._detect_ordering(hits)
         
         # Detect special patterns
-        special_pattern = self._detect_special_pattern(tokens, lemmas, query_lower)
+        special_pattern = self._detect_special_pattern(hits)
         
         # Detect comparison filters
-        comparison = self._detect_comparison(tokens, lemmas, query_lower)
+        comparison = self._detect_comparison(match_tokens, hits, query_lower)
         
         # Detect specific institutions
-        specific_institution = self._detect_specific_institution(query_lower)
+        specific_institution = self._detect_specific_institution(hits)
         
         # Determine query type
         query_type = 'SELECT'
@@ -270,69 +309,49 @@ class NLPProcessor:
         if special_pattern:
             query_type = f'SELECT_{special_pattern}'
         
-        result = {
-            'original_query': query,
-            'tokens': tokens,
-            'lemmas': lemmas,
-            'pos_tags': pos_tags,
-            'filtered_tokens': filtered_tokens,
-            'intent': intent,
-            'classes': classes,
-            'properties': properties,
-            'filters': filters,
-            'aggregation': aggregation,
-            'order_by': order_by,
-            'query_type': query_type,
-            'special_pattern': special_pattern,
-            'comparison': comparison,
-            'specific_institution': specific_institution,
-        }
-        
-        return result
+        return NLPResult(
+            doc if keep_doc else None,
+            original_query=query,
+            corrections=corrections,
+            intent=intent,
+            classes=classes,
+            properties=properties,
+            filters=filters,
+            aggregation=aggregation,
+            order_by=order_by,
+            query_type=query_type,
+            special_pattern=special_pattern,
+            comparison=comparison,
+            specific_institution=specific_institution,
+        )
     
-    def _detect_intent(self, tokens: List[str], lemmas: List[str]) -> str:
+    def _detect_intent(self, hits: List[KeywordHit]) -> str:
         """Detect the intent of the query"""
-        for token in tokens + lemmas:
-            if token in self.intent_keywords:
-                return self.intent_keywords[token]
-        return 'list'
+        hit = first_hit(hits, 'intent')
+        return hit.value if hit else 'list'
     
-    def _detect_classes(self, tokens: List[str], lemmas: List[str]) -> List[str]:
+    def _detect_classes(self, hits: List[KeywordHit]) -> List[str]:
         """Detect RDF classes mentioned in the query"""
-        classes = set()
-        
-        for token in tokens + lemmas:
-            if token in self.class_mappings:
-                classes.add(self.class_mappings[token])
-        
-        return list(classes)
+        return list(dict.fromkeys(hit.value for hit in hits_of(hits, 'class')))
     
-    def _detect_properties(self, tokens: List[str], lemmas: List[str]) -> List[str]:
+    def _detect_properties(self, hits: List[KeywordHit]) -> List[str]:
         """Detect RDF properties mentioned in the query"""
-        properties = set()
-        
-        for token in tokens + lemmas:
-            if token in self.property_mappings:
-                properties.add(self.property_mappings[token])
-        
-        return list(properties)
+        return list(dict.fromkeys(hit.value for hit in hits_of(hits, 'property')))
     
-    def _detect_filters(self, query: str, tokens: List[str], 
-                       lemmas: List[str], doc) -> Dict[str, Any]:
+    def _detect_filters(self, tokens: List[str], hits: List[KeywordHit],
+                       doc) -> Dict[str, Any]:
         """Detect filter conditions in the query"""
         filters = {}
         
         # Detect country filters
-        for token in tokens + lemmas:
-            if token in self.countries:
-                filters['basedIn'] = self.countries[token]
-                break
+        hit = first_hit(hits, 'country')
+        if hit:
+            filters['basedIn'] = hit.value
         
         # Detect status filters
-        for token in tokens + lemmas:
-            if token in self.statuses:
-                filters['status'] = self.statuses[token]
-                break
+        hit = first_hit(hits, 'status')
+        if hit:
+            filters['status'] = hit.value
         
         # Detect numeric filters (e.g., "aged 21", "with 3 credits")
         for i, token in enumerate(doc):
@@ -347,19 +366,22 @@ class NLPProcessor:
                     elif prev_token in ['balance']:
                         filters['balance'] = float(token.text)
         
-        # Detect currency filters (e.g., "from USD to INR")
-        currencies = ['usd', 'inr', 'gbp', 'eur', 'jpy', 'aud']
-        for curr in currencies:
-            if curr in query:
-                if 'from' in query:
-                    filters['fromCurrency'] = curr.upper()
-                if 'to' in query and query.index('to') > query.index(curr):
-                    filters['toCurrency'] = curr.upper()
-        
+        # Detect currency filters (e.g., "from USD to INR", "USD to INR")
+        for hit in hits_of(hits, 'currency'):
+            prev_token = tokens[hit.start - 1] if hit.start > 0 else None
+            next_token = tokens[hit.end] if hit.end < len(tokens) else None
+            if prev_token in ('to', 'into'):
+                filters['toCurrency'] = hit.value
+            elif prev_token == 'from' or next_token in ('to', 'into'):
+                filters['fromCurrency'] = hit.value
+        
+        # Customer names (gazetteer hits) are not a filter: no template
+        # selects by customer, and the frame is the result cache key
+
         # Detect specific entity mentions (e.g., "enrolled in Data Structures")
         # Look for preposition + capitalized words
         for i, token in enumerate(doc):
-            if token.text in ['in', 'at', 'with', 'for'] and i < len(doc) - 1:
+            if token.text in ENTITY_PREPOSITIONS and i < len(doc) - 1:
                 next_token = doc[i+1]
                 if next_token.pos_ == 'PROPN' or next_token.is_title:
                     # Capture multi-word proper nouns
@@ -372,41 +394,24 @@ class NLPProcessor:
         
         return filters
     
-    def _detect_aggregation(self, tokens: List[str], 
-                           lemmas: List[str]) -> Dict[str, str]:
+    def _detect_aggregation(self, hits: List[KeywordHit]) -> Dict[str, str]:
         """Detect aggregation functions in the query"""
-        for token in tokens + lemmas:
-            if token in self.aggregation_keywords:
-                return {
-                    'type': self.aggregation_keywords[token],
-                    'variable': '?acc' if 'account' in tokens + lemmas else '?item'
-                }
-        
-        # Check for phrases like "total number of"
-        query_str = ' '.join(tokens)
-        if 'total' in query_str and 'number' in query_str:
+        hit = first_hit(hits, 'aggregation')
+        if hit:
+            mentions_account = any(h.key == 'account' for h in hits)
             return {
-                'type': 'COUNT',
-                'variable': '?acc' if 'account' in tokens + lemmas else '?item'
+                'type': hit.value,
+                'variable': '?acc' if mentions_account else '?item'
             }
         
         return None
     
-    def _detect_ordering(self, tokens: List[str], 
-                        lemmas: List[str]) -> Dict[str, str]:
+    def _detect_ordering(self, hits: List[KeywordHit]) -> Dict[str, str]:
         """Detect ORDER BY clauses"""
-        order_keywords = ['order', 'sort', 'arrange']
-        direction_keywords = {
-            'ascending': 'ASC',
-            'asc': 'ASC',
-            'descending': 'DESC',
-            'desc': 'DESC',
-        }
-        
-        has_order = any(keyword in tokens + lemmas for keyword in order_keywords)
+        direction_hit = first_hit(hits, 'direction')
         
-        if has_order or 'desc' in tokens + lemmas:
-            direction = 'DESC' if 'desc' in tokens + lemmas else 'ASC'
+        if first_hit(hits, 'order') or direction_hit:
+            direction = direction_hit.value if direction_hit else 'ASC'
             return {
                 'variable': '?NumAcc',
                 'direction': direction
@@ -414,78 +419,43 @@ class NLPProcessor:
         
         return None
     
-    def _detect_special_pattern(self, tokens: List[str], 
-                                lemmas: List[str], query: str) -> str:
+    def _detect_special_pattern(self, hits: List[KeywordHit]) -> str:
         """Detect special query patterns"""
-        for token in tokens + lemmas:
-            if token in self.special_patterns:
-                return self.special_patterns[token]
-        
-        # Pattern-based detection
-        if 'multiple' in query and 'account' in query:
-            return 'HAVING_MULTIPLE'
-        if ('cross' in query and 'border' in query) or 'currency conversion' in query:
-            return 'CROSS_BORDER'
-        if 'compare' in query or 'vs' in query or 'versus' in query:
-            return 'COMPARISON'
-        if 'trail' in query or 'chain' in query or 'linked' in query:
-            return 'FULL_CHAIN'
-        if 'both' in query and ('bank' in query or 'fintech' in query):
-            return 'BOTH_TYPES'
-        if 'foreign' in query or 'different country' in query:
-            return 'FOREIGN'
-        if 'lost' in query or 'loss' in query:
-            return 'LOSS_FILTER'
-        
-        return None
+        hit = first_hit(hits, 'pattern') or first_hit(hits, 'pattern_phrase')
+        return hit.value if hit else None
     
-    def _detect_comparison(self, tokens: List[str], 
-                          lemmas: List[str], query: str) -> Dict[str, Any]:
+    def _detect_comparison(self, tokens: List[str], hits: List[KeywordHit],
+                          query: str) -> Dict[str, Any]:
         """Detect comparison operations"""
         comparison = {}
         
         # Check for percentage filters
         if '%' in query or 'percent' in query:
             # Extract percentage value
-            import re
             match = re.search(r'(\d+)\s*%', query)
             if match:
                 comparison['percentage'] = int(match.group(1))
                 
                 # Check what it's comparing
-                if 'lost' in query or 'loss' in query:
+                if any(hit.value == 'LOSS_FILTER'
+                       for hit in hits_of(hits, 'pattern_phrase')):
                     comparison['type'] = 'LOSS_PERCENTAGE'
         
         # Check for numeric comparisons
-        for i, token in enumerate(tokens):
-            if token in self.comparison_keywords:
-                comparison['operator'] = self.comparison_keywords[token]
-                
-                # Look for numeric value nearby
-                if i + 1 < len(tokens):
-                    next_token = tokens[i + 1]
-                    if next_token.replace(',', '').replace('.', '').isdigit():
-                        comparison['value'] = float(next_token.replace(',', ''))
+        for hit in hits_of(hits, 'comparison'):
+            if hit.via_lemma:
+                continue
+            comparison['operator'] = hit.value
+            
+            # Look for numeric value nearby
+            if hit.end < len(tokens):
+                next_token = tokens[hit.end]
+                if next_token.replace(',', '').replace('.', '').isdigit():
+                    comparison['value'] = float(next_token.replace(',', ''))
         
         return comparison if comparison else None
     
-    def _detect_specific_institution(self, query: str) -> str:
+    def _detect_specific_institution(self, hits: List[KeywordHit]) -> str:
         """Detect specific institution names in the query"""
-        institutions = {
-            'icici': 'ICICI_Bank',
-            'hdfc': 'HDFC',
-            'axis': 'Axis_Bank',
-            'kotak': 'Kotak_Bank',
-            'wise': 'Wise',
-            'paytm': 'Paytm',
-            'phonepe': 'PhonePe',
-            'razorpay': 'Razorpay',
-            'barclays': 'Barclays',
-            'chase': 'Chase',
-        }
-        
-        for keyword, inst_name in institutions.items():
-            if keyword in query:
-                return inst_name
-        
-        return None
+        hit = first_hit(hits, 'institution')
+        return hit.value if hit else None
@@ -0,0 +1,130 @@
+"""
+NLP Result Module
+
+This module defines the compact result object returned by NLPProcessor.
+Semantic fields are stored directly; token, lemma and POS views are only
+built from the underlying Doc when they are first accessed.
+"""
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List
+
+# Field order matches the dict NLPProcessor.process used to return
+SEMANTIC_FIELDS = (
+    'original_query',
+    'corrections',
+    'intent',
+    'classes',
+    'properties',
+    'filters',
+    'aggregation',
+    'order_by',
+    'query_type',
+    'special_pattern',
+    'comparison',
+    'specific_institution',
+)
+VIEW_FIELDS = ('tokens', 'lemmas', 'pos_tags', 'filtered_tokens')
+FIELDS = ('original_query',) + VIEW_FIELDS + SEMANTIC_FIELDS[1:]
+_FIELD_SET = frozenset(FIELDS)
+
+
+class NLPResult(Mapping):
+    """
+    Read-only, dict-compatible NLP analysis result
+
+    Supports ``result['classes']``, ``result.get('filters')``,
+    ``'pos_tags' in result`` and ``dict(result)`` like the plain dict it
+    replaces. When created without a Doc (batch/API mode) the token views
+    are empty lists.
+    """
+
+    __slots__ = SEMANTIC_FIELDS + ('_doc', '_tokens', '_lemmas',
+                                   '_pos_tags', '_filtered_tokens')
+
+    def __init__(self, doc=None, **fields):
+        """
+        Initialize result
+
+        Args:
+            doc: spaCy Doc (or fast path token list) the views derive from
+            **fields: Values for every name in SEMANTIC_FIELDS
+        """
+        for name in SEMANTIC_FIELDS:
+            setattr(self, name, fields.get(name))
+        self._doc = doc
+        self._tokens = None
+        self._lemmas = None
+        self._pos_tags = None
+        self._filtered_tokens = None
+
+    @property
+    def doc(self):
+        """Underlying Doc, or None if it was not kept"""
+        return self._doc
+
+    @property
+    def tokens(self) -> List[str]:
+        """Token texts, punctuation removed"""
+        if self._tokens is None:
+            self._tokens = [token.text for token in self._words()]
+        return self._tokens
+
+    @property
+    def lemmas(self) -> List[str]:
+        """Token lemmas, punctuation removed"""
+        if self._lemmas is None:
+            self._lemmas = [token.lemma_ for token in self._words()]
+        return self._lemmas
+
+    @property
+    def pos_tags(self) -> List[str]:
+        """Token POS tags, punctuation removed"""
+        if self._pos_tags is None:
+            self._pos_tags = [token.pos_ for token in self._words()]
+        return self._pos_tags
+
+    @property
+    def filtered_tokens(self) -> List[str]:
+        """Token texts with stopwords and punctuation removed"""
+        if self._filtered_tokens is None:
+            self._filtered_tokens = [token.text for token in self._words()
+                                     if not token.is_stop]
+        return self._filtered_tokens
+
+    def semantic_frame(self) -> Dict[str, Any]:
+        """Return only the semantic fields, without touching the Doc"""
+        return {name: getattr(self, name) for name in SEMANTIC_FIELDS}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return every field as a plain dict"""
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def _words(self):
+        """Non-punctuation tokens of the Doc"""
+        if self._doc is None:
+            return []
+        return [token for token in self._doc if not token.is_punct]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # Mapping.get goes through __getitem__ and a try/except
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        return default
+
+    def __contains__(self, key: object) -> bool:
+        return key in _FIELD_SET
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return f"NLPResult({self.semantic_frame()!r})"
@@ -0,0 +1,372 @@
+"""
+Query Pipeline Module
+
+This module chains the NLP processor, SPARQL generator and RDF executor
+into a single natural-language-to-results call, with a result cache
+keyed by the semantic frame of the question. Identical questions asked
+concurrently share one run, and query execution goes through admission
+control. Each question is traced (instrumentation.py) when instrumentation
+is enabled or a slow-query log is attached; questions slower than the
+log's threshold (DEBUG_CONFIG['slow_query_ms']) are recorded in it with
+their traces. create_pipeline wires the components the same way for the
+Streamlit app and the API server, and starts the background warm-up.
+"""
+
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import pandas as pd
+from config import ADMISSION_CONFIG, CACHE_CONFIG, DEBUG_CONFIG, RDF_DATASET, WARMUP_CONFIG
+from admission import AdmissionController, AdmissionRejected
+from nlp_processor import NLPProcessor
+from sparql_generator import SPARQLGenerator
+from rdf_query_executor import RDFQueryExecutor
+from entity_gazetteer import EntityGazetteer
+from query_cache import PipelineCache, semantic_fingerprint
+from cost_estimator import CostEstimator, CostGuard
+from single_flight import SingleFlight
+from instrumentation import INSTRUMENTATION
+from query_log import QueryLog
+from slow_query_log import SlowQueryLog
+from warmup import CacheWarmer, warmup_queries
+
+
+class QueryPipeline:
+    """
+    Natural language -> SPARQL -> results pipeline
+    """
+
+    def __init__(self, nlp_processor: NLPProcessor,
+                 sparql_generator: SPARQLGenerator,
+                 rdf_executor: RDFQueryExecutor,
+                 cache: PipelineCache = None,
+                 cost_guard: CostGuard = None,
+                 admission: AdmissionController = None,
+                 query_log: QueryLog = None,
+                 slow_log: SlowQueryLog = None,
+                 keep_doc: bool = True):
+        """
+        Initialize pipeline from already constructed components
+
+        Args:
+            nlp_processor: NLP processor
+            sparql_generator: SPARQL generator
+            rdf_executor: RDF query executor
+            cache: Result cache (a default PipelineCache if omitted)
+            cost_guard: Cost policy applied before execution (none if omitted)
+            admission: Admission control for query execution (unbounded if omitted)
+            query_log: Log the asked questions are recorded in (none if omitted)
+            slow_log: Log slow questions are recorded in (none if omitted;
+                needs INSTRUMENTATION.tracing or instrumentation on)
+            keep_doc: Keep the spaCy Doc of each question for the token,
+                lemma and POS views (the app shows them; API and batch
+                callers only need the semantic fields)
+        """
+        self.nlp_processor = nlp_processor
+        self.sparql_generator = sparql_generator
+        self.rdf_executor = rdf_executor
+        self.cache = cache if cache is not None else PipelineCache()
+        self.cost_guard = cost_guard
+        self.admission = admission
+        self.query_log = query_log
+        self.slow_log = slow_log
+        self.keep_doc = keep_doc
+        # Set by create_pipeline when the caches are warmed at startup
+        self.warmer: Optional[CacheWarmer] = None
+        # Concurrent runs of the same question share one evaluation
+        self.flights = SingleFlight() if CACHE_CONFIG.get('coalesce_requests', True) else None
+        # Cache and queue statistics are read when metrics are exported
+        INSTRUMENTATION.set_collector('pipeline', self.collect_metrics)
+
+    def translate(self, query: str, cursor: str = None, keep_doc: bool = None) -> Dict[str, Any]:
+        """
+        Turn a natural language query into SPARQL without running it
+        
+        Args:
+            query: Natural language query string
+            cursor: next_cursor from a previous run of the same query
+            keep_doc: Keep the spaCy Doc in nlp_result (self.keep_doc if omitted)
+            
+        Returns:
+            Dictionary with nlp_result, sparql_query (None if the cost
+            guard rejected it), cost (CostGuard decision or None) and
+            query_id (trace ID, None when tracing is off)
+        """
+        with INSTRUMENTATION.trace(query):
+            nlp_result = self.nlp_processor.process(
+                query, self.keep_doc if keep_doc is None else keep_doc)
+            sparql_query, cost = self._generate(nlp_result, cursor)
+            if cost:
+                INSTRUMENTATION.annotate(cost=cost['action'])
+            return {'nlp_result': nlp_result, 'sparql_query': sparql_query, 'cost': cost,
+                    'query_id': INSTRUMENTATION.current_query_id()}
+    
+    def run(self, query: str, cursor: str = None, session: Hashable = None,
+            record: bool = True, keep_doc: bool = None) -> Dict[str, Any]:
+        """
+        Answer a natural language query
+
+        Args:
+            query: Natural language query string
+            cursor: next_cursor from a previous run of the same query
+            session: Caller identity for fair admission (e.g. the Streamlit session)
+            record: Record the question in the query log (first pages only)
+            keep_doc: Keep the spaCy Doc in nlp_result (self.keep_doc if omitted)
+
+        Returns:
+            Dictionary with nlp_result, sparql_query, results (DataFrame),
+            error (message or None), next_cursor (None on the last page),
+            cost (CostGuard decision or None), cached (bool), busy (bool,
+            turned away by admission control; error says why), coalesced
+            (bool, the run of a concurrent identical request was reused)
+            and query_id (trace ID, None when tracing is off)
+        """
+        if record and cursor is None and self.query_log is not None:
+            self.query_log.record(query)
+        if keep_doc is None:
+            keep_doc = self.keep_doc
+        with INSTRUMENTATION.trace(query) as trace:
+            if self.flights is None:
+                outcome, shared = self._run(query, cursor, session, keep_doc), False
+            else:
+                # A run without the Doc is not shared with callers that need it
+                key = (' '.join(query.split()), cursor, keep_doc, self.rdf_executor.data_version)
+                outcome, shared = self.flights.do(key, self._run, query, cursor, session, keep_doc)
+            outcome = dict(outcome, coalesced=shared, query_id=INSTRUMENTATION.current_query_id())
+            if INSTRUMENTATION.enabled:
+                INSTRUMENTATION.annotate(**self._trace_attributes(outcome))
+        if trace is not None and self.slow_log is not None:
+            self.slow_log.observe(trace, outcome)
+        return outcome
+    
+    def execute(self, sparql_query: str, max_rows: int = None, session: Hashable = None,
+                cost: Dict[str, Any] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        """
+        Execute SPARQL once admission control lets it run
+        
+        Args:
+            sparql_query: SPARQL query (text or GeneratedQuery)
+            max_rows: Row cap passed to the executor
+            session: Caller identity for fair admission
+            cost: CostGuard decision, used to pick the lane
+            
+        Returns:
+            Tuple of (results DataFrame, error message)
+            
+        Raises:
+            AdmissionRejected: The executor is too busy
+        """
+        with INSTRUMENTATION.trace(str(sparql_query)):
+            if self.admission is None:
+                return self.rdf_executor.execute(sparql_query, max_rows)
+            try:
+                with self.admission.admit(session, self.admission.lane_for(cost)):
+                    return self.rdf_executor.execute(sparql_query, max_rows)
+            except AdmissionRejected:
+                INSTRUMENTATION.annotate(status='busy')
+                raise
+    
+    def _run(self, query: str, cursor: str = None, session: Hashable = None,
+             keep_doc: bool = True) -> Dict[str, Any]:
+        """Answer a query (run without coalescing)"""
+        nlp_result = self.nlp_processor.process(query, keep_doc)
+
+        key = semantic_fingerprint(nlp_result) + '|' + (cursor or '')
+        data_version = self.rdf_executor.data_version
+        cached = self.cache.get(key, data_version)
+        if cached is not None:
+            sparql_query, results_df, error, next_cursor, cost = cached
+            return {
+                'nlp_result': nlp_result,
+                'sparql_query': sparql_query,
+                'results': results_df,
+                'error': error,
+                'next_cursor': next_cursor,
+                'cost': cost,
+                'cached': True,
+                'busy': False,
+            }
+
+        sparql_query, cost = self._generate(nlp_result, cursor)
+
+        next_cursor = None
+        busy = False
+        if sparql_query is None:
+            # Rejected by the cost guard
+            results_df, error = None, cost['message']
+        else:
+            row_cap = cost['row_cap'] if cost else None
+            try:
+                results_df, error = self.execute(sparql_query, row_cap, session, cost)
+            except AdmissionRejected as rejection:
+                results_df, error, busy = None, str(rejection), True
+            if error is None:
+                next_cursor = self.sparql_generator.next_cursor(sparql_query, len(results_df))
+                self.cache.put(key, (sparql_query, results_df, error, next_cursor, cost),
+                               data_version)
+
+        return {
+            'nlp_result': nlp_result,
+            'sparql_query': sparql_query,
+            'results': results_df,
+            'error': error,
+            'next_cursor': next_cursor,
+            'cost': cost,
+            'cached': False,
+            'busy': busy,
+        }
+    
+    def get_coalescing_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Single-flight statistics of the NL stage and the SPARQL stage
+        
+        Returns:
+            Dictionary with 'nl' and 'sparql' SingleFlight stats (a stage
+            is missing when coalescing is disabled)
+        """
+        stats = {}
+        if self.flights is not None:
+            stats['nl'] = self.flights.get_stats()
+        if self.rdf_executor.flights is not None:
+            stats['sparql'] = self.rdf_executor.flights.get_stats()
+        return stats
+    
+    @staticmethod
+    def _trace_attributes(outcome: Dict[str, Any]) -> Dict[str, Any]:
+        """Trace attributes of a run's outcome"""
+        cost = outcome['cost']
+        if outcome['busy']:
+            status = 'busy'
+        elif outcome['sparql_query'] is None and cost:
+            status = 'rejected'
+        elif outcome['error']:
+            status = 'error'
+        else:
+            status = 'ok'
+        attributes = {'status': status, 'cached': outcome['cached'],
+                      'coalesced': outcome['coalesced']}
+        if cost:
+            attributes.update(template=cost['template'], cost=cost['action'])
+        if outcome['error']:
+            attributes['error'] = outcome['error']
+        if outcome['results'] is not None:
+            attributes['rows'] = len(outcome['results'])
+        return attributes
+    
+    def collect_metrics(self) -> List[tuple]:
+        """
+        Cache, vocabulary, coalescing and admission statistics as metric samples
+        
+        Returns:
+            List of (metric, type, help, labels dict, value) tuples for
+            Instrumentation.set_collector
+        """
+        samples = []
+        cache = self.cache.get_stats()
+        samples += [
+            ('nl2sparql_cache_hits_total', 'counter', "Cache lookups answered from the cache",
+             {'cache': 'result'}, cache['hits']),
+            ('nl2sparql_cache_misses_total', 'counter', "Cache lookups that missed",
+             {'cache': 'result'}, cache['misses']),
+            ('nl2sparql_cache_entries', 'gauge', "Entries held by the cache",
+             {'cache': 'result'}, cache['size']),
+        ]
+        algebra = self.sparql_generator.algebra
+        if algebra is not None:
+            stats = algebra.get_stats()
+            samples += [
+                ('nl2sparql_cache_hits_total', 'counter', "Cache lookups answered from the cache",
+                 {'cache': 'algebra'}, stats['hits']),
+                ('nl2sparql_cache_misses_total', 'counter', "Cache lookups that missed",
+                 {'cache': 'algebra'}, stats['parses']),
+                ('nl2sparql_cache_entries', 'gauge', "Entries held by the cache",
+                 {'cache': 'algebra'}, stats['size']),
+            ]
+        stats = self.nlp_processor.vocabulary_store.get_stats()
+        samples += [
+            ('nl2sparql_vocabulary_version', 'gauge', "Version of the installed vocabulary", {},
+             stats['version']),
+            ('nl2sparql_vocabulary_reloads_total', 'counter', "Vocabulary reloads from config.py",
+             {'result': 'ok'}, stats['reloads']),
+            ('nl2sparql_vocabulary_reloads_total', 'counter', "Vocabulary reloads from config.py",
+             {'result': 'failed'}, stats['failed_reloads']),
+        ]
+        for stage, stats in self.get_coalescing_stats().items():
+            samples.append(('nl2sparql_coalesced_total', 'counter',
+                            "Calls answered by a concurrent identical call",
+                            {'stage': stage}, stats['saved']))
+        if self.admission is not None:
+            stats = self.admission.get_stats()
+            samples += [
+                ('nl2sparql_admission_active', 'gauge', "Query evaluations running", {},
+                 stats['active']),
+                ('nl2sparql_admission_waiting', 'gauge', "Queries waiting for a slot", {},
+                 stats['waiting']),
+                ('nl2sparql_admission_wait_milliseconds', 'histogram',
+                 "Time queries waited for a slot", {}, stats['wait_ms']),
+            ]
+            for reason in ('full', 'predicted', 'timeout'):
+                samples.append(('nl2sparql_admission_rejected_total', 'counter',
+                                "Queries turned away by admission control",
+                                {'reason': reason}, stats[f'rejected_{reason}']))
+        return samples
+    
+    def _generate(self, nlp_result: Dict[str, Any],
+                  cursor: str = None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Generate SPARQL, through the cost guard if there is one"""
+        if self.cost_guard is not None:
+            return self.cost_guard.generate(nlp_result, cursor)
+        return self.sparql_generator.generate(nlp_result, cursor), None
+
+
+def create_pipeline(rdf_file_path: str = None, warm: bool = None,
+                    keep_doc: bool = True) -> QueryPipeline:
+    """
+    Build a pipeline over an RDF file
+    
+    Args:
+        rdf_file_path: Path to the RDF/OWL file (RDF_DATASET['file_path'] if omitted)
+        warm: Start the background warm-up (WARMUP_CONFIG['enabled'] if omitted)
+        keep_doc: Keep each question's spaCy Doc (False for callers that
+            never show tokens, lemmas or POS tags)
+        
+    Returns:
+        QueryPipeline with entity gazetteer, cost guard, admission control,
+        query log and slow-query log attached
+    """
+    nlp_processor = NLPProcessor()
+    rdf_executor = RDFQueryExecutor(rdf_file_path or RDF_DATASET['file_path'])
+    sparql_generator = SPARQLGenerator(materialized=rdf_executor.materialized)
+    
+    # Entity names come from the graph and follow its changes
+    gazetteer = EntityGazetteer.from_graph(rdf_executor.graph)
+    rdf_executor.add_listener(gazetteer.apply_changes)
+    nlp_processor.attach_gazetteer(gazetteer)
+    
+    # Drop custom mappings that point at classes/properties not in the data
+    nlp_processor.validate_vocabulary(rdf_executor.graph)
+    
+    # Predict query cost from graph statistics before running anything
+    cost_guard = CostGuard(sparql_generator, CostEstimator(rdf_executor))
+    
+    # Bound concurrent evaluations, cheap templates first
+    admission = AdmissionController() if ADMISSION_CONFIG.get('enabled', True) else None
+    
+    log_path = WARMUP_CONFIG.get('query_log')
+    query_log = QueryLog(log_path, WARMUP_CONFIG.get('max_log_bytes', 5242880)) if log_path else None
+    
+    # Slow questions are kept with their stage timings, which come from traces
+    slow_log = None
+    slow_path = DEBUG_CONFIG.get('slow_query_log')
+    if slow_path and DEBUG_CONFIG.get('slow_query_ms'):
+        slow_log = SlowQueryLog(slow_path, DEBUG_CONFIG['slow_query_ms'],
+                                DEBUG_CONFIG.get('max_slow_query_log_bytes', 10485760))
+        INSTRUMENTATION.tracing = True
+    pipeline = QueryPipeline(nlp_processor, sparql_generator, rdf_executor, cost_guard=cost_guard,
+                             admission=admission, query_log=query_log, slow_log=slow_log,
+                             keep_doc=keep_doc)
+    
+    # Fill the caches with the common questions while serving starts
+    if warm is None:
+        warm = WARMUP_CONFIG.get('enabled', True)
+    if warm:
+        pipeline.warmer = CacheWarmer(pipeline, warmup_queries(query_log)).start()
+    return pipeline
@@ -0,0 +1,194 @@
+"""
+Query Algebra Module
+
+This module turns generated SPARQL into rdflib algebra without a parse
+per request. Each distinct unpaginated query text is parsed once and
+kept in an LRU cache; LIMIT/OFFSET is applied by wrapping the cached
+algebra in a Slice node, so every page of a question shares one parse.
+
+rdflib is not thread-safe in two places this relies on: its SPARQL
+parser (pyparsing) fails under concurrent use, so every parse goes
+through parse_query; and evaluation keeps state on the expression nodes
+of the algebra, so a shared algebra comes with a lock that is held while
+it is evaluated.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from rdflib.term import Node
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import Query
+
+
+# Serializes the (non-reentrant) SPARQL parser across threads
+PARSE_LOCK = threading.Lock()
+
+# Keys of an algebra node that hold its sub-patterns
+PATTERN_KEYS = ('p', 'p1', 'p2')
+
+
+def parse_query(text: str, namespaces: Mapping[str, Any] = None) -> Query:
+    """
+    Parse SPARQL into a prepared query, one parse at a time
+
+    Args:
+        text: SPARQL query text
+        namespaces: Prefixes available without PREFIX declarations
+
+    Returns:
+        rdflib Query
+    """
+    with PARSE_LOCK:
+        return prepareQuery(text, initNs=namespaces)
+
+
+class GeneratedQuery(str):
+    """
+    SPARQL text plus what the executor needs to run and shape it
+
+    Behaves like the plain query string everywhere text is needed (display,
+    logging, cache values). RDFQueryExecutor evaluates ``prepared`` (if set)
+    instead of re-parsing the text, holding ``lock`` while it does, and
+    turns the raw IRI columns named in ``local_names`` into local-name ID
+    columns.
+    """
+
+    def __new__(cls, text: str, prepared: Query = None,
+                local_names: Dict[str, str] = None, lock: threading.Lock = None):
+        query = super().__new__(cls, text)
+        query.prepared = prepared
+        query.local_names = local_names or {}
+        query.lock = lock
+        return query
+
+    def __reduce__(self):
+        # rdflib algebra does not pickle reliably; other processes re-parse
+        return (GeneratedQuery, (str(self), None, self.local_names))
+
+
+def with_slice(prepared: Query, limit: int, offset: int = 0) -> Query:
+    """
+    Apply LIMIT/OFFSET to a prepared SELECT query without re-parsing it
+
+    Args:
+        prepared: Query without a LIMIT
+        limit: Maximum number of rows
+        offset: Rows to skip
+
+    Returns:
+        New Query sharing the original algebra below the Slice
+    """
+    root = prepared.algebra
+    algebra = CompValue(root.name, **root)
+    algebra['p'] = CompValue('Slice', p=root.p, start=offset, length=limit)
+    algebra['p']['_vars'] = root.p.get('_vars', set())
+    return Query(prepared.prologue, algebra)
+
+
+def explain(prepared: Query) -> str:
+    """
+    Algebra of a prepared query as an indented operator tree
+
+    Args:
+        prepared: rdflib Query
+
+    Returns:
+        One operator per line with its arguments, sub-patterns indented
+        below it and the triples of a BGP listed under it
+    """
+    namespaces = prepared.prologue.namespace_manager
+    lines: List[str] = []
+
+    def term(value: Any) -> str:
+        if isinstance(value, Node):
+            return value.n3(namespaces)
+        if isinstance(value, CompValue):
+            arguments = ', '.join(f"{key}={term(item)}" for key, item in value.items()
+                                  if not key.startswith('_'))
+            return f"{value.name}({arguments})"
+        if isinstance(value, (list, tuple)):
+            return '[' + ', '.join(term(item) for item in value) + ']'
+        return str(value)
+
+    def operator(node: CompValue, depth: int):
+        arguments = [f"{key}={term(value)}" for key, value in node.items()
+                     if key not in PATTERN_KEYS and key != 'triples'
+                     and not key.startswith('_') and value is not None]
+        lines.append('  ' * depth + ' '.join([node.name] + arguments))
+        for triple in (node['triples'] if 'triples' in node else ()):
+            lines.append('  ' * (depth + 1) + ' '.join(term(part) for part in triple))
+        for key in PATTERN_KEYS:
+            if key in node and isinstance(node[key], CompValue):
+                operator(node[key], depth + 1)
+
+    operator(prepared.algebra, 0)
+    return '\n'.join(lines)
+
+
+class AlgebraBuilder:
+    """
+    Thread-safe LRU cache of prepared queries keyed by query text
+    """
+
+    def __init__(self, max_entries: int = 512):
+        """
+        Initialize builder
+
+        Args:
+            max_entries: Distinct query texts kept prepared
+        """
+        self.max_entries = max_entries
+        self._prepared: 'OrderedDict[str, Tuple[Query, threading.Lock]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'parses': 0, 'hits': 0}
+
+    def prepare(self, base_text: str,
+                page: Optional[Tuple[int, int]] = None) -> Tuple[Query, threading.Lock]:
+        """
+        Prepared query for a generated query
+
+        Args:
+            base_text: Query text without the LIMIT/OFFSET suffix
+            page: (limit, offset) the suffix stands for, or None
+
+        Returns:
+            Tuple of (rdflib Query sharing the cached algebra of base_text,
+            lock to hold while evaluating it)
+        """
+        prepared, lock = self._parse(base_text)
+        if page is not None:
+            prepared = with_slice(prepared, *page)
+        return prepared, lock
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with parse and hit counts and the cache size
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._prepared)
+        return stats
+
+    def _parse(self, text: str) -> Tuple[Query, threading.Lock]:
+        """Prepared query and evaluation lock for a text, parsing it on first use"""
+        with self._lock:
+            entry = self._prepared.get(text)
+            if entry is not None:
+                self._prepared.move_to_end(text)
+                self.stats['hits'] += 1
+                return entry
+
+        # Parse outside the cache lock; a concurrent duplicate parse only wastes time
+        prepared = parse_query(text)
+        with self._lock:
+            self.stats['parses'] += 1
+            entry = self._prepared.setdefault(text, (prepared, threading.Lock()))
+            self._prepared.move_to_end(text)
+            while len(self._prepared) > self.max_entries:
+                self._prepared.popitem(last=False)
+        return entry
@@ -0,0 +1,147 @@
+"""
+Query Cache Module
+
+This module provides the bounded result cache used by QueryPipeline.
+Entries are keyed by the semantic fingerprint of an NLP result, so
+different phrasings of the same question share one entry.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from config import CACHE_CONFIG
+
+# NLP result fields SPARQLGenerator.generate reads
+FINGERPRINT_FIELDS = (
+    'classes',
+    'properties',
+    'filters',
+    'aggregation',
+    'order_by',
+    'special_pattern',
+    'comparison',
+    'specific_institution',
+)
+
+
+def semantic_fingerprint(nlp_result) -> str:
+    """
+    Canonical key for the semantic frame of an NLP result
+
+    Properties are order-insensitive; classes keep their order because
+    the default template uses the first detected class.
+
+    Args:
+        nlp_result: NLPResult or dict returned by NLPProcessor.process
+
+    Returns:
+        Stable string key
+    """
+    frame = {name: nlp_result.get(name) for name in FINGERPRINT_FIELDS}
+    frame['properties'] = sorted(frame['properties'] or [])
+    return json.dumps(frame, sort_keys=True, default=str)
+
+
+class PipelineCache:
+    """
+    Thread-safe LRU cache of (SPARQL query, results, error) entries
+
+    The whole cache is dropped when the dataset's data version changes.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None,
+                 enabled: bool = None):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: Maximum number of entries (LRU eviction)
+            ttl: Seconds an entry stays valid
+            enabled: Set to False to make every lookup a miss
+        """
+        self.max_entries = max_entries or CACHE_CONFIG.get('max_entries', 256)
+        self.ttl = ttl if ttl is not None else CACHE_CONFIG.get('cache_ttl', 3600)
+        self.enabled = enabled if enabled is not None else CACHE_CONFIG.get('enable_caching', True)
+
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._data_version = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key: str, data_version: int) -> Optional[Any]:
+        """
+        Look up an entry
+
+        Args:
+            key: Semantic fingerprint
+            data_version: Current data version of the dataset
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._check_version(data_version)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any, data_version: int):
+        """
+        Store an entry, evicting the least recently used one if full
+
+        Args:
+            key: Semantic fingerprint
+            value: Value to cache
+            data_version: Data version the value was computed against
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._check_version(data_version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with hit/miss counts, hit rate (0-1) and size
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _check_version(self, data_version: int):
+        """Invalidate all entries if the data changed (lock held)"""
+        if data_version != self._data_version:
+            if self._entries:
+                self._entries.clear()
+                self.stats['invalidations'] += 1
+            self._data_version = data_version
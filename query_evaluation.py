@@ -0,0 +1,69 @@
+"""
+Query Evaluation Module
+
+Custom rdflib SPARQL evaluation hooks. Importing this module registers
+them in rdflib's CUSTOM_EVALS; each hook raises NotImplementedError for
+algebra nodes it does not handle, so rdflib falls back to its own code.
+"""
+
+import heapq
+import itertools
+from rdflib.plugins.sparql import CUSTOM_EVALS
+from rdflib.plugins.sparql.evaluate import evalPart
+from rdflib.plugins.sparql.evalutils import _val
+from rdflib.plugins.sparql.parserutils import CompValue, value
+
+
+class _OrderKey:
+    """Sort key comparing ORDER BY conditions with per-condition direction"""
+
+    __slots__ = ('values', 'descending')
+
+    def __init__(self, values: tuple, descending: tuple):
+        self.values = values
+        self.descending = descending
+
+    def __lt__(self, other: '_OrderKey') -> bool:
+        for a, b, desc in zip(self.values, other.values, self.descending):
+            if a < b:
+                return not desc
+            if b < a:
+                return desc
+        return False
+
+    def __eq__(self, other: '_OrderKey') -> bool:
+        # heapq compares (key, index, row) tuples, so ties must compare
+        # equal for the index to keep the sort stable
+        return not (self < other or other < self)
+
+
+def evaluate_top_k(ctx, part: CompValue):
+    """
+    Evaluate LIMIT over ORDER BY as a bounded top-k selection
+
+    Handles ``Slice(Project(OrderBy(...)))`` with a LIMIT: only the first
+    OFFSET + LIMIT rows are kept in a heap instead of sorting every row.
+    The order (including ties) matches rdflib's stable sort.
+    """
+    if part.name != 'Slice' or part.length is None:
+        raise NotImplementedError()
+    project = part.p
+    if project.name != 'Project' or project.p.name != 'OrderBy':
+        raise NotImplementedError()
+
+    order_by = project.p
+    conditions = order_by.expr
+    descending = tuple(bool(c.order and c.order == 'DESC') for c in conditions)
+
+    def key(row):
+        return _OrderKey(
+            tuple(_val(value(row, c.expr, variables=True)) for c in conditions),
+            descending,
+        )
+
+    top = heapq.nsmallest(part.start + part.length, evalPart(ctx, order_by.p), key=key)
+    rows = (row.project(project.PV) for row in top)
+    return itertools.islice(rows, part.start, None)
+
+
+CUSTOM_EVALS['cccm_top_k'] = evaluate_top_k
@@ -0,0 +1,62 @@
+"""
+Query Log Module
+
+This module records the natural language questions users ask (one JSON
+line per question, with a timestamp) so the most asked ones can be
+warmed up at the next start. The log is rotated once it grows past a
+size limit; one rotated file is kept and still read.
+"""
+
+import time
+from collections import Counter
+from typing import List
+from jsonl_log import JsonlLog
+
+
+def normalize_query(query: str) -> str:
+    """Query text with whitespace collapsed, as it is logged and counted"""
+    return ' '.join(query.split())
+
+
+class QueryLog:
+    """
+    Append-only log of asked questions (thread-safe)
+    """
+
+    def __init__(self, path: str, max_bytes: int = 5242880):
+        """
+        Initialize log
+
+        Args:
+            path: JSONL file (its directory is created on the first write)
+            max_bytes: Size at which the file is rotated to path + '.1'
+        """
+        self.path = path
+        self.log = JsonlLog(path, max_bytes, 'query log')
+
+    def record(self, query: str):
+        """
+        Append a question
+
+        Args:
+            query: Natural language query string
+        """
+        self.log.write({'time': round(time.time(), 3), 'query': normalize_query(query)})
+
+    def top(self, n: int, window_days: float = 7) -> List[str]:
+        """
+        Most asked questions
+
+        Args:
+            n: Number of questions
+            window_days: Only count questions asked this recently
+
+        Returns:
+            Up to n questions, most asked first
+        """
+        since = time.time() - window_days * 86400
+        counts = Counter()
+        for entry in self.log.entries():
+            if entry.get('time', 0) >= since and entry.get('query'):
+                counts[entry['query']] += 1
+        return [query for query, _ in counts.most_common(n)]
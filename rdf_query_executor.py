@@ -2,12 +2,55 @@
 RDF Query Executor Module
 
 This module executes SPARQL queries on the RDF dataset and returns results.
+Concurrent executions of the same query share one evaluation.
 """
 
+import itertools
+import logging
+import pickle
+import threading
+from contextlib import nullcontext
 import rdflib
 from rdflib import Graph
+from rdflib.util import guess_format
 import pandas as pd
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Callable, Iterable
+from rdflib.plugins.sparql.sparql import Query
+import query_evaluation  # registers the top-k ORDER BY ... LIMIT evaluator
+from query_algebra import parse_query
+from config import CACHE_CONFIG, RDF_DATASET
+from instrumentation import INSTRUMENTATION
+from result_shaping import ResultShaper
+from reasoning import RDFSReasoner
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Pickled rdflib graphs (benchmarks.synthetic writes them); load only your own files
+SNAPSHOT_SUFFIXES = ('.pickle', '.pkl')
+
+
+def load_graph(rdf_file_path: str) -> Graph:
+    """
+    Read an RDF file into a new graph
+    
+    Args:
+        rdf_file_path: RDF/XML or OWL file, any other format rdflib knows by
+            its extension (e.g. .nt, .ttl), or a graph snapshot (.pickle)
+        
+    Returns:
+        rdflib Graph
+    """
+    if rdf_file_path.endswith(SNAPSHOT_SUFFIXES):
+        with open(rdf_file_path, 'rb') as snapshot:
+            graph = pickle.load(snapshot)
+        if not isinstance(graph, Graph):
+            raise ValueError(f"{rdf_file_path} is not a graph snapshot")
+        return graph
+    graph = Graph()
+    graph.parse(rdf_file_path, format=guess_format(rdf_file_path) or 'xml')
+    return graph
+
 
 class RDFQueryExecutor:
     """
@@ -15,75 +58,218 @@ class RDFQueryExecutor:
     Loads RDF data and executes SPARQL queries
     """
     
-    def __init__(self, rdf_file_path: str):
+    def __init__(self, rdf_file_path: str, materialize: bool = None):
         """
         Initialize RDF graph from file
         
         Args:
-            rdf_file_path: Path to the RDF/OWL file
+            rdf_file_path: Path to the RDF/OWL file (or N-Triples, Turtle,
+                graph snapshot; see load_graph)
+            materialize: Store RDFS subclass/subproperty entailments in the
+                graph (RDF_DATASET['materialize_inferences'] if omitted)
         """
         self.graph = Graph()
         self.rdf_file_path = rdf_file_path
         
+        # Derives ID columns (IRI local names) after queries run
+        self.result_shaper = ResultShaper(self.graph, [RDF_DATASET['namespace']])
+        
+        # Bumped on every data change; listeners receive (added, removed)
+        self.data_version = 0
+        self._listeners = []
+        
+        # Concurrent executions of the same query share one evaluation
+        self.flights = SingleFlight() if CACHE_CONFIG.get('coalesce_requests', True) else None
+        
+        if materialize is None:
+            materialize = RDF_DATASET.get('materialize_inferences', False)
+        self.reasoner = RDFSReasoner() if materialize else None
+        
         # Load RDF data
         try:
             print(f"Loading RDF data from {rdf_file_path}...")
-            self.graph.parse(rdf_file_path, format='xml')
+            self.graph = load_graph(rdf_file_path)
+            self.result_shaper.refresh(self.graph)
             print(f"Loaded {len(self.graph)} triples from RDF dataset")
+            if self.reasoner:
+                inferred, _ = self.reasoner.materialize(self.graph)
+                print(f"Materialized {len(inferred)} inferred triples")
         except Exception as e:
-            print(f"Error loading RDF file: {e}")
+            logger.error("Error loading RDF file %s: %s", rdf_file_path, e)
             raise
     
-    def execute(self, sparql_query: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    @property
+    def materialized(self) -> bool:
+        """True if the graph stores RDFS subclass/subproperty entailments"""
+        return self.reasoner is not None
+
+    def add_listener(self, listener: Callable[[list, list], None]):
+        """
+        Register a callback invoked after every data change
+        
+        Args:
+            listener: Callable receiving (added triples, removed triples)
+        """
+        self._listeners.append(listener)
+    
+    def update(self, added: Iterable[tuple] = (), removed: Iterable[tuple] = ()):
+        """
+        Add and remove triples, then notify listeners of the effective change
+        
+        Args:
+            added: Triples to add to the graph
+            removed: Triples to remove from the graph
+        """
+        removed = [triple for triple in removed if triple in self.graph]
+        for triple in removed:
+            self.graph.remove(triple)
+        added = list(added)
+        if self.reasoner:
+            # Asserting an inferred triple keeps it when its support goes
+            self.reasoner.mark_asserted(added)
+        added = [triple for triple in added if triple not in self.graph]
+        for triple in added:
+            self.graph.add(triple)
+        if self.reasoner:
+            added, removed = self._materialize(added, removed)
+        self._notify(added, removed)
+    
+    def reload(self):
+        """Re-read the RDF file and notify listeners of what changed"""
+        new_graph = load_graph(self.rdf_file_path)
+        if self.reasoner:
+            self.reasoner = RDFSReasoner()
+            self.reasoner.materialize(new_graph)
+        added = list(new_graph - self.graph)
+        removed = list(self.graph - new_graph)
+        self.graph = new_graph
+        self.result_shaper.refresh(new_graph)
+        print(f"Reloaded {len(self.graph)} triples from RDF dataset")
+        self._notify(added, removed)
+    
+    def _materialize(self, added: list, removed: list) -> Tuple[list, list]:
+        """Update inferred triples after a change and merge them into it"""
+        inferred_added, inferred_removed = self.reasoner.materialize(self.graph)
+        # A triple removed and re-inferred (or vice versa) did not change
+        unchanged = set(removed) & set(inferred_added) | set(added) & set(inferred_removed)
+        added = [t for t in added + inferred_added if t not in unchanged]
+        removed = [t for t in removed + inferred_removed if t not in unchanged]
+        return added, removed
+    
+    def _notify(self, added: list, removed: list):
+        """Bump the data version and call every change listener"""
+        if not added and not removed:
+            return
+        self.data_version += 1
+        for listener in self._listeners:
+            listener(added, removed)
+    
+    def execute(self, sparql_query: str,
+                max_rows: int = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
         """
         Execute SPARQL query on the RDF graph
         
         Args:
-            sparql_query: SPARQL query string
+            sparql_query: SPARQL query string, or a GeneratedQuery whose
+                prepared algebra is evaluated without parsing the text and
+                whose raw IRI columns are turned into local-name ID columns
+            max_rows: Stop reading results after this many rows
             
         Returns:
             Tuple of (results DataFrame, error message)
         """
+        if self.flights is None:
+            return self._execute(sparql_query, max_rows)
+        local_names = getattr(sparql_query, 'local_names', None) or {}
+        key = (str(sparql_query), tuple(sorted(local_names.items())), max_rows, self.data_version)
+        result, _ = self.flights.do(key, self._execute, sparql_query, max_rows)
+        return result
+    
+    def _execute(self, sparql_query: str,
+                 max_rows: int = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        """Execute a query (without coalescing)"""
         try:
             # Execute query
-            results = self.graph.query(sparql_query)
+            prepared, lock = self._prepare(sparql_query)
+            columns, data = self.evaluate(prepared, lock, max_rows)
             
             # Convert results to pandas DataFrame
-            if results:
-                # Get variable names
-                vars = results.vars
-                
-                # Extract data
-                data = []
-                for row in results:
-                    row_data = []
-                    for item in row:
-                        if item is not None:
-                            # Convert RDF terms to strings
-                            row_data.append(str(item))
-                        else:
-                            row_data.append(None)
-                    data.append(row_data)
-                
-                # Create DataFrame
-                if data:
-                    columns = [str(var) for var in vars] if vars else ['result']
-                    df = pd.DataFrame(data, columns=columns)
-                    return df, None
-                else:
-                    # Empty result set
-                    columns = [str(var) for var in vars] if vars else ['result']
-                    df = pd.DataFrame(columns=columns)
-                    return df, None
-            else:
-                # No results
-                return pd.DataFrame(), None
+            df = self.to_dataframe(columns, data, getattr(sparql_query, 'local_names', None))
+            INSTRUMENTATION.annotate(rows=len(df))
+            return df, None
                 
         except Exception as e:
             error_msg = f"Error executing SPARQL query: {str(e)}"
-            print(error_msg)
+            logger.error(error_msg)
+            INSTRUMENTATION.annotate(status='error', error=error_msg)
             return None, error_msg
     
+    @INSTRUMENTATION.timed('evaluate')
+    def evaluate(self, prepared: Query, lock: Optional[threading.Lock] = None,
+                 max_rows: int = None) -> Tuple[list, list]:
+        """
+        Evaluate a prepared query and read its rows
+        
+        Args:
+            prepared: Prepared rdflib query
+            lock: Lock to hold while the query's algebra is evaluated
+            max_rows: Stop after this many rows (no limit if omitted)
+            
+        Returns:
+            Tuple of (column names, rows as lists of strings or None)
+        """
+        with lock or nullcontext():
+            results = self.graph.query(prepared)
+            
+            # Read results lazily so a row cap also stops the evaluation
+            rows = results if max_rows is None else itertools.islice(results, max_rows)
+            
+            # Extract data
+            data = []
+            for row in rows:
+                row_data = []
+                for item in row:
+                    if item is not None:
+                        # Convert RDF terms to strings
+                        row_data.append(str(item))
+                    else:
+                        row_data.append(None)
+                data.append(row_data)
+        
+        # Get variable names
+        vars = results.vars
+        columns = [str(var) for var in vars] if vars else ['result']
+        return columns, data
+    
+    @INSTRUMENTATION.timed('dataframe')
+    def to_dataframe(self, columns: list, data: list,
+                     local_names: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Build the results DataFrame of evaluated rows
+        
+        Args:
+            columns: Column names
+            data: Rows from evaluate
+            local_names: ID columns to derive (GeneratedQuery.local_names)
+            
+        Returns:
+            DataFrame (empty, without columns, if there are no rows)
+        """
+        if not data:
+            # No results
+            return pd.DataFrame()
+        df = pd.DataFrame(data, columns=columns)
+        return self.result_shaper.apply(df, local_names)
+    
+    def _prepare(self, sparql_query: str) -> Tuple[Query, Optional[threading.Lock]]:
+        """Prepared query and the lock to hold while evaluating it"""
+        prepared = getattr(sparql_query, 'prepared', None)
+        if prepared is not None:
+            return prepared, getattr(sparql_query, 'lock', None)
+        # A private parse, so only the parse itself is serialized
+        with INSTRUMENTATION.stage('parse'):
+            return parse_query(str(sparql_query), dict(self.graph.namespaces())), None
+    
     def get_statistics(self) -> dict:
         """
         Get statistics about the RDF dataset
@@ -111,15 +297,14 @@ class RDFQueryExecutor:
         """
         
         try:
-            results = self.graph.query(class_query)
+            rows = list(self.graph.query(self._prepare(class_query)[0]))
+            class_names = self.result_shaper.shorten(str(row[0]) for row in rows)
             class_counts = {}
-            for row in results:
-                class_name = str(row[0]).split('#')[-1]
-                count = int(row[1])
-                class_counts[class_name] = count
+            for class_name, row in zip(class_names, rows):
+                class_counts[class_name] = int(row[1])
             stats['class_counts'] = class_counts
         except Exception as e:
-            print(f"Error getting class statistics: {e}")
+            logger.error("Error getting class statistics: %s", e)
             stats['class_counts'] = {}
         
         return stats
@@ -136,7 +321,7 @@ class RDFQueryExecutor:
         """
         try:
             # Try to parse the query
-            self.graph.query(sparql_query)
+            self._prepare(sparql_query)
             return True, None
         except Exception as e:
             return False, str(e)
@@ -160,11 +345,11 @@ class RDFQueryExecutor:
         """
         
         try:
-            results = self.graph.query(query)
+            results = self.graph.query(self._prepare(query)[0])
             classes = [str(row[0]).split('#')[-1] for row in results]
             return sorted(classes)
         except Exception as e:
-            print(f"Error getting classes: {e}")
+            logger.error("Error getting classes: %s", e)
             return []
     
     def get_all_properties(self) -> list:
@@ -185,9 +370,9 @@ class RDFQueryExecutor:
         """
         
         try:
-            results = self.graph.query(query)
+            results = self.graph.query(self._prepare(query)[0])
             properties = [str(row[0]).split('#')[-1] for row in results]
             return sorted(properties)
         except Exception as e:
-            print(f"Error getting properties: {e}")
+            logger.error("Error getting properties: %s", e)
             return []
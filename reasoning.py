@@ -0,0 +1,131 @@
+"""
+Reasoning Module
+
+This module materializes RDFS subclass and subproperty entailments into
+the loaded graph, so that e.g. every ``cccm:Bank`` is also stored as a
+``cccm:Institution`` and queries can match the superclass through the
+type index instead of filtering over every typed resource. Only
+rdfs:subClassOf and rdfs:subPropertyOf are used (RDFS rules 5, 7, 9 and
+11); domain/range and OWL axioms are not.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+from rdflib import RDF, RDFS, URIRef
+
+
+def transitive_closure(pairs: List[Tuple[URIRef, URIRef]]) -> Dict[URIRef, Set[URIRef]]:
+    """
+    All (strict) ancestors of every node of a sub-of relation
+
+    Args:
+        pairs: (child, parent) pairs
+
+    Returns:
+        Dictionary mapping each child to the set of its ancestors
+    """
+    parents = defaultdict(set)
+    for child, parent in pairs:
+        if child != parent:
+            parents[child].add(parent)
+
+    ancestors = {}
+    for node in parents:
+        found = set()
+        stack = list(parents[node])
+        while stack:
+            parent = stack.pop()
+            if parent not in found and parent != node:
+                found.add(parent)
+                stack.extend(parents.get(parent, ()))
+        ancestors[node] = found
+    return ancestors
+
+
+class RDFSReasoner:
+    """
+    Keeps a graph's subclass/subproperty entailments materialized
+
+    The reasoner remembers which triples it added, so after the data
+    changes it can add new entailments and drop ones that lost their
+    support without touching asserted triples.
+    """
+
+    def __init__(self):
+        """Initialize reasoner with no inferred triples"""
+        self.inferred: Set[tuple] = set()
+
+    def materialize(self, graph) -> Tuple[List[tuple], List[tuple]]:
+        """
+        Bring the graph's inferred triples up to date
+
+        Args:
+            graph: rdflib Graph, modified in place
+
+        Returns:
+            Tuple of (triples added, triples removed)
+        """
+        entailed = self.entailments(graph)
+        removed = [triple for triple in self.inferred - entailed if triple in graph]
+        for triple in removed:
+            graph.remove(triple)
+        added = [triple for triple in entailed if triple not in graph]
+        for triple in added:
+            graph.add(triple)
+        self.inferred = entailed
+        return added, removed
+
+    def mark_asserted(self, triples: List[tuple]):
+        """
+        Record that triples were asserted, so they are kept even if the
+        entailment that produced them goes away
+
+        Args:
+            triples: Triples added by an update
+        """
+        self.inferred.difference_update(triples)
+
+    def entailments(self, graph) -> Set[tuple]:
+        """
+        Triples entailed by the asserted triples of a graph
+
+        Args:
+            graph: rdflib Graph
+
+        Returns:
+            Set of entailed triples that are not asserted
+        """
+        def asserted(triple):
+            return triple in graph and triple not in self.inferred
+
+        def uris(predicate):
+            return [(s, o) for s, o in graph.subject_objects(predicate)
+                    if isinstance(s, URIRef) and isinstance(o, URIRef)
+                    and asserted((s, predicate, o))]
+
+        entailed = set()
+        superclasses = transitive_closure(uris(RDFS.subClassOf))
+        superproperties = transitive_closure(uris(RDFS.subPropertyOf))
+
+        # Transitivity of the hierarchies themselves (rdfs5, rdfs11)
+        for hierarchy, predicate in ((superclasses, RDFS.subClassOf),
+                                     (superproperties, RDFS.subPropertyOf)):
+            for node, ancestors in hierarchy.items():
+                for ancestor in ancestors:
+                    entailed.add((node, predicate, ancestor))
+
+        # Instances of a class are instances of its superclasses (rdfs9)
+        for cls, ancestors in superclasses.items():
+            for instance in graph.subjects(RDF.type, cls):
+                if asserted((instance, RDF.type, cls)):
+                    for ancestor in ancestors:
+                        entailed.add((instance, RDF.type, ancestor))
+
+        # Statements with a property hold for its superproperties (rdfs7)
+        for prop, ancestors in superproperties.items():
+            for s, o in graph.subject_objects(prop):
+                if asserted((s, prop, o)):
+                    for ancestor in ancestors:
+                        entailed.add((s, ancestor, o))
+
+        return {triple for triple in entailed if triple in self.inferred or triple not in graph}
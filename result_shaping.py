@@ -0,0 +1,157 @@
+"""
+Result Shaping Module
+
+This module derives ID columns (IRI local names) in Python after a query
+has run, instead of per row inside the SPARQL engine. The generator strips
+``BIND(STRAFTER(STR(?x), "#") AS ?xID)`` from its templates and selects the
+raw IRI; the executor then maps each distinct IRI to its local name once,
+using a prefix table of the graph's namespaces.
+"""
+
+import re
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+
+# ID columns computed by the templates, as BIND lines and SELECT expressions
+LOCAL_NAME_BIND_PATTERN = re.compile(
+    r'\n[ \t]*BIND\(STRAFTER\(STR\((\?\w+)\),\s*"#"\)\s+AS\s+(\?\w+)\)[ \t]*(?=\n)')
+LOCAL_NAME_SELECT_PATTERN = re.compile(
+    r'\(STRAFTER\(STR\((\?\w+)\),\s*"#"\)\s+AS\s+(\?\w+)\)')
+SELECT_LINE_PATTERN = re.compile(r'^SELECT\b.*$', re.MULTILINE)
+
+
+def strip_local_name_binds(query: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Replace STRAFTER local-name expressions with the raw IRI variable
+
+    Args:
+        query: SPARQL query text
+
+    Returns:
+        Tuple of (rewritten query, {raw column: ID column}); the query is
+        returned unchanged with an empty mapping if it has no such BIND
+    """
+    local_names = {}
+
+    binds = LOCAL_NAME_BIND_PATTERN.findall(query)
+    if binds:
+        query = LOCAL_NAME_BIND_PATTERN.sub('', query)
+        select = SELECT_LINE_PATTERN.search(query)
+        if select:
+            line = select.group(0)
+            for raw, alias in binds:
+                line = re.sub(re.escape(alias) + r'\b', raw, line)
+                local_names[raw[1:]] = alias[1:]
+            query = query[:select.start()] + line + query[select.end():]
+
+    def select_raw(match):
+        local_names[match.group(1)[1:]] = match.group(2)[1:]
+        return match.group(1)
+
+    query = LOCAL_NAME_SELECT_PATTERN.sub(select_raw, query)
+    return query, local_names
+
+
+def row_values(df: pd.DataFrame) -> List[list]:
+    """DataFrame rows as lists of JSON-ready values (missing values as None)"""
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+class ResultShaper:
+    """
+    Converts raw IRI result columns to local names
+    """
+
+    def __init__(self, graph=None, namespaces: Iterable[str] = ()):
+        """
+        Initialize shaper
+
+        Args:
+            graph: rdflib Graph whose bound namespaces form the prefix table
+            namespaces: Extra namespace IRIs
+        """
+        self.graph = graph
+        self.extra_namespaces = tuple(namespaces)
+        self._namespaces = None
+        self._lock = threading.Lock()
+
+    @property
+    def namespaces(self) -> FrozenSet[str]:
+        """Prefix table of namespace IRIs (built on first use)"""
+        namespaces = self._namespaces
+        if namespaces is None:
+            with self._lock:
+                if self._namespaces is None:
+                    self._namespaces = self._build_namespaces()
+                namespaces = self._namespaces
+        return namespaces
+
+    def refresh(self, graph=None):
+        """Drop the prefix table, e.g. after the graph was reloaded"""
+        with self._lock:
+            if graph is not None:
+                self.graph = graph
+            self._namespaces = None
+
+    def local_name(self, iri: str) -> str:
+        """
+        Local name of an IRI
+
+        Splits after the last '#' or '/' and checks the namespace part
+        against the prefix table; IRIs outside every known namespace fall
+        back to the text after the first '#', like STRAFTER.
+        """
+        cut = max(iri.rfind('#'), iri.rfind('/')) + 1
+        if cut and iri[:cut] in self.namespaces:
+            return iri[cut:]
+        return iri.partition('#')[2]
+
+    def shorten(self, values: Iterable) -> List:
+        """
+        Local names of a sequence of IRIs, computed once per distinct IRI
+
+        Args:
+            values: IRI strings (None passes through)
+
+        Returns:
+            List of local names in input order
+        """
+        return list(self._shorten(pd.Series(list(values), dtype=object)))
+
+    def apply(self, df: pd.DataFrame, local_names: Dict[str, str]) -> pd.DataFrame:
+        """
+        Turn raw IRI columns into ID columns
+
+        Args:
+            df: Query result
+            local_names: {raw column: ID column} from strip_local_name_binds
+
+        Returns:
+            DataFrame with each raw column replaced by its ID column
+        """
+        if df is None or not local_names:
+            return df
+        columns = {raw: alias for raw, alias in local_names.items() if raw in df.columns}
+        if not columns:
+            return df
+        df = df.rename(columns=columns)
+        for alias in columns.values():
+            df[alias] = self._shorten(df[alias])
+        return df
+
+    def _shorten(self, column: pd.Series) -> np.ndarray:
+        """Map a column to local names, one local_name call per distinct IRI"""
+        codes, uniques = pd.factorize(column)
+        # Missing values get code -1, which picks the trailing None
+        names = np.array([self.local_name(str(iri)) for iri in uniques] + [None],
+                         dtype=object)
+        return names[codes]
+
+    def _build_namespaces(self) -> FrozenSet[str]:
+        """Collect namespace IRIs from the graph and the extra namespaces"""
+        namespaces = set(self.extra_namespaces)
+        if self.graph is not None:
+            namespaces.update(str(ns) for _, ns in self.graph.namespaces())
+        return frozenset(namespaces)
@@ -0,0 +1,146 @@
+"""
+Single-Flight Module
+
+This module coalesces concurrent identical requests: while a call for a
+key is in flight, further callers with the same key wait for it and get
+its result instead of evaluating again. SingleFlight is for threads
+(Streamlit sessions, worker pools), AsyncSingleFlight for coroutines on
+one event loop. Nothing is kept once a call finishes; remembering
+results is the job of the caches.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """An in-flight call and the outcome its waiters receive"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread-safe request coalescing
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight"""
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'evaluations': 0, 'saved': 0, 'errors': 0}
+
+    def do(self, key: Hashable, func: Callable, *args) -> Tuple[Any, bool]:
+        """
+        Call func(*args), or wait for the identical call already running
+
+        Args:
+            key: Identifies identical calls
+            func: Function to evaluate
+            *args: Arguments for func
+
+        Returns:
+            Tuple of (result, whether it was shared from another caller's
+            call); an exception raised by the call is raised in every caller
+        """
+        with self._lock:
+            self.stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.stats['evaluations'] += 1
+                leader = True
+            else:
+                self.stats['saved'] += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args)
+        except Exception as error:
+            call.error = error
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing statistics
+
+        Returns:
+            Dictionary with calls, evaluations, saved (calls answered by
+            another caller's evaluation), errors and in_flight
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+class AsyncSingleFlight:
+    """
+    Request coalescing for coroutines on one event loop
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight"""
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {'calls': 0, 'evaluations': 0, 'saved': 0, 'errors': 0}
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable]) -> Tuple[Any, bool]:
+        """
+        Await factory(), or the identical call already running
+
+        The call runs as its own task, so a caller that is cancelled (e.g.
+        its client disconnected) does not cancel it for the others.
+
+        Args:
+            key: Identifies identical calls
+            factory: Returns the awaitable to evaluate
+
+        Returns:
+            Tuple of (result, whether it was shared from another caller's call)
+        """
+        self.stats['calls'] += 1
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.stats['saved'] += 1
+        else:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            self.stats['evaluations'] += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        """Forget a finished call (and retrieve its error so it is not reported as lost)"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats['errors'] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing statistics
+
+        Returns:
+            Dictionary with calls, evaluations, saved, errors and in_flight
+        """
+        return dict(self.stats, in_flight=len(self._calls))
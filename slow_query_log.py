@@ -0,0 +1,132 @@
+"""
+Slow Query Log Module
+
+This module records the questions that took longer than a threshold to
+answer, with what is needed to explain them afterwards: the question,
+the NLP frame, the generated SPARQL and its template, the cost estimate,
+the time spent in each stage, the number of result rows and the algebra
+plan that was evaluated. Entries are JSON lines in an append-only file
+that is rotated once it grows past a size limit; one rotated file is
+kept and still read.
+
+The stage timings come from traces, so while the log is configured
+every question is traced (INSTRUMENTATION.tracing), which adds tens of
+microseconds to each one; the log ships disabled for that reason. The
+entry itself (frame, plan, JSON) is only built once a question is known
+to have been slow.
+"""
+
+import time
+from typing import Any, Dict, Iterator, Optional
+from instrumentation import Trace
+from jsonl_log import JsonlLog
+from query_algebra import explain, parse_query
+from template_registry import frame_summary
+
+
+class SlowQueryLog:
+    """
+    Append-only log of slow questions (thread-safe)
+    """
+
+    def __init__(self, path: str, threshold_ms: float = 1000, max_bytes: int = 10485760):
+        """
+        Initialize log
+
+        Args:
+            path: JSONL file (its directory is created on the first write)
+            threshold_ms: Questions taking at least this long are recorded
+            max_bytes: Size at which the file is rotated to path + '.1'
+        """
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self.log = JsonlLog(path, max_bytes, 'slow query log')
+
+    def observe(self, trace: Trace, outcome: Dict[str, Any]) -> bool:
+        """
+        Record a question if it was slow
+
+        Args:
+            trace: Finished trace of the question (stage spans)
+            outcome: Result of QueryPipeline.run
+
+        Returns:
+            True if the question was recorded
+        """
+        if trace.seconds < self.threshold:
+            return False
+        self.record(self.entry(trace, outcome))
+        return True
+
+    def entry(self, trace: Trace, outcome: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Log entry of a question
+
+        Args:
+            trace: Trace of the question
+            outcome: Result of QueryPipeline.run
+
+        Returns:
+            Dictionary with time, query_id, query, duration_ms, template,
+            cost, frame, sparql, plan, rows, error, cached, coalesced and
+            stages (the spans of the trace)
+        """
+        cost = outcome.get('cost')
+        nlp_result = outcome.get('nlp_result') or {}
+        sparql_query = outcome.get('sparql_query')
+        results = outcome.get('results')
+        return {
+            'time': round(time.time(), 3),
+            'query_id': trace.query_id,
+            'query': trace.query,
+            'duration_ms': round(trace.seconds * 1000, 3),
+            'template': cost['template'] if cost else None,
+            'cost': cost,
+            'frame': frame_summary(nlp_result),
+            'sparql': None if sparql_query is None else str(sparql_query),
+            'plan': self.plan(sparql_query),
+            'rows': None if results is None else len(results),
+            'error': outcome.get('error'),
+            'cached': outcome.get('cached', False),
+            'coalesced': outcome.get('coalesced', False),
+            'stages': trace.span_entries(),
+        }
+
+    @staticmethod
+    def plan(sparql_query) -> Optional[str]:
+        """
+        Evaluated algebra of a query, as explain prints it
+
+        The text is parsed again rather than reading the prepared algebra:
+        that algebra is shared, and evaluation may be changing it in
+        another thread. The parse gives the same plan, LIMIT included.
+        """
+        if sparql_query is None:
+            return None
+        try:
+            return explain(parse_query(str(sparql_query)))
+        except Exception as error:
+            return f"(plan unavailable: {error})"
+
+    def record(self, entry: Dict[str, Any]):
+        """
+        Append an entry
+
+        Args:
+            entry: JSON-serializable dictionary
+        """
+        self.log.write(entry)
+
+    def entries(self, since: float = None) -> Iterator[Dict[str, Any]]:
+        """
+        Read the recorded entries, oldest first
+
+        Args:
+            since: Only entries recorded at or after this Unix time
+
+        Yields:
+            Entry dictionaries (the rotated file's first)
+        """
+        for entry in self.log.entries():
+            if since is None or entry.get('time', 0) >= since:
+                yield entry
@@ -2,10 +2,47 @@
 SPARQL Generator Module
 
 This module generates SPARQL queries based on NLP analysis results.
-Uses rule-based templates and dynamic query construction.
+Uses rule-based templates, selected through template_registry, and
+dynamic query construction.
+Non-aggregate queries are paginated with LIMIT/OFFSET and an opaque
+cursor token for the next page. In algebra mode the returned query also
+carries prepared rdflib algebra, so the executor does not re-parse it.
 """
 
-from typing import Dict, List, Any
+import base64
+import hashlib
+import json
+import re
+from typing import Dict, List, Any, Optional, Tuple
+from config import QUERY_CONFIG
+from instrumentation import INSTRUMENTATION
+from query_algebra import AlgebraBuilder, GeneratedQuery
+from result_shaping import strip_local_name_binds
+from template_registry import (FRAME_DEFAULTS, TEMPLATES, QueryTemplate,
+                               TemplateRegistry, normalize_frame)
+
+# Suffix appended by SPARQLGenerator.generate
+PAGINATION_PATTERN = re.compile(r"\nLIMIT (\d+)(?: OFFSET (\d+))?$")
+AGGREGATE_PATTERN = re.compile(r"\b(COUNT|SUM|AVG|MIN|MAX)\s*\(|\bGROUP BY\b", re.IGNORECASE)
+LIMIT_PATTERN = re.compile(r"\bLIMIT\s+\d+", re.IGNORECASE)
+
+# Label property and variable listed by the default template per class
+DEFAULT_LABELS = {
+    'Customer': ('fullName', '?name'),
+    'Bank': ('bankName', '?name'),
+    'FinTech': ('bankName', '?name'),
+    'Institution': ('bankName', '?name'),
+    'Currency': ('isoCode', '?code'),
+    'Country': ('countryName', '?name'),
+}
+
+
+def _asks_initiators(frame: Dict[str, Any]) -> bool:
+    """Whether a transaction question asks who initiated it"""
+    properties = frame['properties']
+    return ('initiatedBy' in properties or 'initiated' in properties
+            or 'fullName' in properties)
+
 
 class SPARQLGenerator:
     """
@@ -13,307 +50,487 @@ class SPARQLGenerator:
     Converts structured NLP results into SPARQL queries
     """
     
-    def __init__(self):
-        """Initialize SPARQL generator with prefix"""
-        self.prefix = "PREFIX cccm: <http://www.semanticweb.org/cccm#>\n"
+    def __init__(self, page_size: int = None, registry: TemplateRegistry = None,
+                 algebra: bool = None, result_shaping: bool = None,
+                 materialized: bool = False):
+        """
+        Initialize SPARQL generator with prefix
         
-    def generate(self, nlp_result: Dict[str, Any]) -> str:
+        Args:
+            page_size: Rows per page for non-aggregate queries
+                (defaults to QUERY_CONFIG['default_limit'], 0 disables)
+            registry: Query templates (defaults to template_registry.TEMPLATES)
+            algebra: Attach prepared rdflib algebra to generated queries
+                (defaults to QUERY_CONFIG['algebra_mode'])
+            result_shaping: Select raw IRIs instead of STRAFTER local-name
+                BINDs and leave the ID columns to RDFQueryExecutor
+                (defaults to QUERY_CONFIG['result_shaping'])
+            materialized: The queried graph stores RDFS subclass entailments,
+                so superclasses can be matched directly (pass
+                RDFQueryExecutor.materialized; the default query works on
+                any graph)
+        """
+        self.prefix = "PREFIX cccm: <http://www.semanticweb.org/cccm#>\n"
+        if page_size is None:
+            page_size = QUERY_CONFIG.get('default_limit', 0)
+        self.page_size = page_size or 0
+        self.registry = registry if registry is not None else TEMPLATES
+        if algebra is None:
+            algebra = QUERY_CONFIG.get('algebra_mode', False)
+        self.algebra = None
+        if algebra:
+            self.algebra = AlgebraBuilder(QUERY_CONFIG.get('algebra_cache_size', 512))
+        if result_shaping is None:
+            result_shaping = QUERY_CONFIG.get('result_shaping', False)
+        self.result_shaping = result_shaping
+        self.materialized = materialized
+        
+    @INSTRUMENTATION.timed('generate')
+    def generate(self, nlp_result: Dict[str, Any], cursor: str = None) -> str:
         """
         Generate SPARQL query from NLP analysis result
         
         Args:
             nlp_result: Dictionary containing NLP analysis results
+            cursor: Token returned by next_cursor to fetch a later page
             
         Returns:
-            SPARQL query string
+            SPARQL query string (a GeneratedQuery when it carries algebra
+                or ID columns for the executor)
         """
-        classes = nlp_result.get('classes', [])
-        properties = nlp_result.get('properties', [])
-        filters = nlp_result.get('filters', {})
-        aggregation = nlp_result.get('aggregation')
-        order_by = nlp_result.get('order_by')
-        intent = nlp_result.get('intent', 'list')
-        special_pattern = nlp_result.get('special_pattern')
-        comparison = nlp_result.get('comparison')
-        specific_institution = nlp_result.get('specific_institution')
-        
-        # Handle special patterns first
-        if special_pattern == 'HAVING_MULTIPLE':
-            return self._generate_multiple_accounts_query()
-        elif special_pattern == 'CROSS_BORDER':
-            return self._generate_cross_border_query(classes)
-        elif special_pattern == 'COMPARISON':
-            return self._generate_comparison_query(classes, properties)
-        elif special_pattern == 'FULL_CHAIN':
-            return self._generate_full_chain_query()
-        elif special_pattern == 'BOTH_TYPES':
-            return self._generate_both_types_query()
-        elif special_pattern == 'FOREIGN':
-            return self._generate_foreign_accounts_query()
-        elif special_pattern == 'LOSS_FILTER' or (comparison and comparison.get('type') == 'LOSS_PERCENTAGE'):
-            return self._generate_loss_filter_query(comparison)
-        elif special_pattern == 'TOP':
-            return self._generate_top_query(classes, properties, aggregation)
-        
-        # Handle specific institution queries
-        if specific_institution:
-            return self._generate_specific_institution_query(classes, specific_institution)
+        return self._finalize(self._build_query(nlp_result), cursor)
+    
+    @INSTRUMENTATION.timed('generate')
+    def generate_with(self, template_name: str, nlp_result: Dict[str, Any],
+                      cursor: str = None) -> str:
+        """
+        Generate SPARQL from a named template, skipping template selection
         
-        # Handle comparison filters
-        if comparison and 'value' in comparison:
-            return self._generate_comparison_filter_query(classes, comparison)
+        Args:
+            template_name: Name of a registered template
+            nlp_result: Dictionary containing NLP analysis results
+            cursor: Token returned by next_cursor to fetch a later page
+            
+        Returns:
+            SPARQL query string (a GeneratedQuery when it carries algebra
+                or ID columns for the executor)
+        """
+        template = self.registry.get(template_name)
+        if template is None:
+            raise KeyError(f"Unknown query template: {template_name}")
+        INSTRUMENTATION.annotate(template=template_name)
+        return self._finalize(template.render(self, normalize_frame(nlp_result)), cursor)
+    
+    def _finalize(self, base_query: str, cursor: str = None) -> str:
+        """Shape and paginate a rendered template, preparing it in algebra mode"""
+        local_names = {}
+        if self.result_shaping:
+            base_query, local_names = strip_local_name_binds(base_query)
+        
+        page = self._page(base_query, cursor)
+        query = base_query
+        if page is not None:
+            limit, offset = page
+            query += f"\nLIMIT {limit}"
+            if offset:
+                query += f" OFFSET {offset}"
+        
+        prepared = lock = None
+        if self.algebra is not None:
+            prepared, lock = self.algebra.prepare(base_query, page)
+        if prepared is None and not local_names:
+            return query
+        return GeneratedQuery(query, prepared, local_names, lock)
+    
+    def next_cursor(self, sparql_query: str, row_count: int) -> Optional[str]:
+        """
+        Cursor token for the page after a paginated query
         
-        # Determine query pattern based on detected entities
-        if aggregation:
-            return self._generate_aggregation_query(classes, properties, filters, 
-                                                   aggregation, order_by)
-        elif 'Transaction' in classes or 'Remittance' in classes:
-            return self._generate_transaction_query(classes, properties, filters)
-        elif 'Customer' in classes:
-            return self._generate_customer_query(classes, properties, filters)
-        elif 'Bank' in classes or 'FinTech' in classes or 'Institution' in classes:
-            return self._generate_institution_query(classes, properties, filters)
-        elif 'Account' in classes:
-            return self._generate_account_query(classes, properties, filters)
-        else:
-            # Default: list all entities of detected class
-            return self._generate_default_query(classes, properties, filters)
+        Args:
+            sparql_query: Query returned by generate
+            row_count: Number of rows the query returned
+            
+        Returns:
+            Cursor to pass to generate, or None if this was the last page
+        """
+        match = PAGINATION_PATTERN.search(sparql_query)
+        if not match:
+            return None
+        limit = int(match.group(1))
+        offset = int(match.group(2) or 0)
+        if row_count < limit:
+            return None
+        base_query = sparql_query[:match.start()]
+        return self._encode_cursor(base_query, offset + limit)
     
-    def _generate_customer_query(self, classes: List[str], 
-                                properties: List[str], 
-                                filters: Dict[str, Any]) -> str:
-        """Generate query for customer-related requests"""
+    def _page(self, query: str, cursor: str = None) -> Optional[Tuple[int, int]]:
+        """(LIMIT, OFFSET) for a non-aggregate query without a LIMIT, else None"""
+        if not self.page_size or AGGREGATE_PATTERN.search(query) \
+                or LIMIT_PATTERN.search(query):
+            return None
+        
+        offset = self._decode_cursor(query, cursor) if cursor else 0
+        return self.page_size, offset
+    
+    def _encode_cursor(self, base_query: str, offset: int) -> str:
+        """Encode the next page's offset, bound to the unpaginated query"""
+        payload = {
+            'q': hashlib.sha1(base_query.encode('utf-8')).hexdigest()[:16],
+            'o': offset,
+        }
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+    
+    def _decode_cursor(self, base_query: str, cursor: str) -> int:
+        """Return the offset stored in a cursor, checking it fits the query"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded))
+            offset = int(payload['o'])
+            query_hash = payload['q']
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Invalid page cursor")
+        if query_hash != hashlib.sha1(base_query.encode('utf-8')).hexdigest()[:16]:
+            raise ValueError("Page cursor belongs to a different query")
+        return max(offset, 0)
+    
+    def select_template(self, nlp_result: Dict[str, Any]) -> QueryTemplate:
+        """
+        Template generate would use for an NLP result
         
-        # Check if query is about international payments
-        if 'basedIn' in filters and 'Currency' in classes and 'Transaction' in classes:
-            country = filters['basedIn']
-            query = f"""{self.prefix}
-SELECT DISTINCT ?custName ?fromISO ?toISO
+        Args:
+            nlp_result: Dictionary containing NLP analysis results
+            
+        Returns:
+            Selected QueryTemplate (its name identifies the query shape)
+        """
+        return self.registry.select(normalize_frame(nlp_result))
+    
+    def _build_query(self, nlp_result: Dict[str, Any]) -> str:
+        """Select the template for an NLP result and fill it in"""
+        return self._render(normalize_frame(nlp_result))
+    
+    def _render(self, frame: Dict[str, Any]) -> str:
+        """Fill in the template selected for a normalized frame"""
+        template = self.registry.select(frame)
+        INSTRUMENTATION.annotate(template=template.name)
+        return template.render(self, frame)
+    
+    # Templates are tried from the highest priority down:
+    #   100-80  special patterns (mutually exclusive, then loss, then TOP)
+    #   70-60   specific institution, numeric comparison
+    #   59-50   aggregation
+    #   49-10   listings by class (transactions, customers, institutions, accounts)
+    #   2-0     defaults
+    
+    @TEMPLATES.template('multiple_accounts', priority=100,
+                        special_patterns=('HAVING_MULTIPLE',))
+    def _generate_multiple_accounts_query(self) -> str:
+        """Generate query for customers with multiple accounts"""
+        query = f"""{self.prefix}
+SELECT ?custName (COUNT(?acc) AS ?NumAccounts)
+WHERE {{
+  ?cust a cccm:Customer ;
+        cccm:fullName ?custName ;
+        cccm:hasAccount ?acc .
+}}
+GROUP BY ?custName
+HAVING(COUNT(?acc) > 1)
+ORDER BY DESC(?NumAccounts)"""
+        return query
+    
+    @TEMPLATES.template('cross_border', priority=100,
+                        special_patterns=('CROSS_BORDER',))
+    def _generate_cross_border_query(self) -> str:
+        """Generate query for cross-border transactions (currency conversion)"""
+        query = f"""{self.prefix}
+SELECT ?TxnID ?custName ?fromISO ?toISO
 WHERE {{
   ?txn a cccm:Transaction ;
        cccm:fromCurrency ?fc ;
        cccm:toCurrency ?tc ;
        cccm:initiatedBy ?cust .
-  ?cust cccm:basedIn cccm:{country} ;
-        cccm:fullName ?custName .
+
+  FILTER(?fc != ?tc)
+
   ?fc cccm:isoCode ?fromISO .
   ?tc cccm:isoCode ?toISO .
-  FILTER(?fromISO != ?toISO)
-}}"""
-            return query
-        
-        # Check if we need to filter by country
-        if 'basedIn' in filters:
-            country = filters['basedIn']
-            query = f"""{self.prefix}
-SELECT ?name
+  ?cust cccm:fullName ?custName .
+
+  BIND(STRAFTER(STR(?txn), "#") AS ?TxnID)
+}}
+ORDER BY ?custName"""
+        return query
+    
+    @TEMPLATES.template('institution_comparison', priority=100,
+                        special_patterns=('COMPARISON',))
+    def _generate_comparison_query(self) -> str:
+        """Generate comparison query (banks vs fintechs)"""
+        query = f"""{self.prefix}
+SELECT ?instName (COUNT(?txn) AS ?TotalTxns)
 WHERE {{
-  ?cust a cccm:Customer ;
-        cccm:fullName ?name ;
-        cccm:basedIn cccm:{country} .
-}}"""
-        else:
-            # List all customers
-            query = f"""{self.prefix}
-SELECT ?name
+  ?txn cccm:processedBy ?inst .
+  ?inst cccm:bankName ?instName .
+}}
+GROUP BY ?instName
+ORDER BY DESC(?TotalTxns)"""
+        return query
+    
+    # No rewrite: every narrower trail drops rows, so the cost guard caps it
+    @TEMPLATES.template('full_chain', priority=100,
+                        special_patterns=('FULL_CHAIN',))
+    def _generate_full_chain_query(self) -> str:
+        """Generate full money trail query"""
+        query = f"""{self.prefix}
+SELECT ?custName ?accID ?instName ?txnID ?amount
 WHERE {{
   ?cust a cccm:Customer ;
-        cccm:fullName ?name .
-}}"""
-        
+        cccm:fullName ?custName ;
+        cccm:hasAccount ?acc .
+
+  ?acc cccm:heldAt ?inst .
+  ?inst cccm:bankName ?instName .
+
+  ?txn cccm:initiatedBy ?cust ;
+       cccm:amountSent ?amount .
+
+  BIND(STRAFTER(STR(?acc), "#") AS ?accID)
+  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
+}}
+ORDER BY ?custName"""
         return query
     
-    def _generate_institution_query(self, classes: List[str], 
-                                   properties: List[str], 
-                                   filters: Dict[str, Any]) -> str:
-        """Generate query for institution-related requests"""
-        
-        # Determine institution types
-        types = []
-        if 'Bank' in classes:
-            types.append('cccm:Bank')
-        if 'FinTech' in classes:
-            types.append('cccm:FinTech')
-        if not types or 'Institution' in classes:
-            types = ['cccm:Bank', 'cccm:FinTech']
-        
-        # Build query
-        if 'basedIn' in filters:
-            country = filters['basedIn']
-            type_filter = f"FILTER(?type IN ({', '.join(types)}))" if len(types) > 1 else ""
-            
-            query = f"""{self.prefix}
-SELECT ?name
+    @TEMPLATES.template('both_institution_types', priority=100,
+                        special_patterns=('BOTH_TYPES',),
+                        rewrite='both_institution_types_exists')
+    def _generate_both_types_query(self) -> str:
+        """Generate query for customers using both banks and fintechs"""
+        query = f"""{self.prefix}
+SELECT DISTINCT ?custName
 WHERE {{
-  ?i a ?type ;
-     cccm:basedIn cccm:{country} ;
-     cccm:bankName ?name .
-  {type_filter}
+  ?cust a cccm:Customer ;
+        cccm:fullName ?custName ;
+        cccm:hasAccount ?acc1, ?acc2 .
+
+  ?acc1 cccm:heldAt ?inst1 .
+  ?acc2 cccm:heldAt ?inst2 .
+
+  ?inst1 a cccm:Bank .
+  ?inst2 a cccm:FinTech .
 }}"""
-        else:
-            if len(types) == 1:
-                type_str = types[0]
-                query = f"""{self.prefix}
-SELECT ?name
+        return query
+    
+    # Cheaper equivalent forms the cost guard switches to (never selected directly)
+    
+    @TEMPLATES.template('both_institution_types_exists', selectable=False)
+    def _generate_both_types_exists_query(self) -> str:
+        """Generate both-types query with the FinTech side as an EXISTS test"""
+        query = f"""{self.prefix}
+SELECT DISTINCT ?custName
 WHERE {{
-  ?i a {type_str} ;
-     cccm:bankName ?name .
+  ?cust a cccm:Customer ;
+        cccm:fullName ?custName ;
+        cccm:hasAccount ?acc1 .
+
+  ?acc1 cccm:heldAt ?inst1 .
+  ?inst1 a cccm:Bank .
+
+  FILTER EXISTS {{
+    ?cust cccm:hasAccount ?acc2 .
+    ?acc2 cccm:heldAt ?inst2 .
+    ?inst2 a cccm:FinTech .
+  }}
 }}"""
-            else:
-                query = f"""{self.prefix}
-SELECT ?name
+        return query
+    
+    @TEMPLATES.template('foreign_accounts', priority=100,
+                        special_patterns=('FOREIGN',))
+    def _generate_foreign_accounts_query(self) -> str:
+        """Generate query for customers with foreign accounts"""
+        query = f"""{self.prefix}
+SELECT DISTINCT ?custName ?custCountry ?bankCountry
 WHERE {{
-  ?i a ?type ;
-     cccm:bankName ?name .
-  FILTER(?type IN ({', '.join(types)}))
+  ?cust a cccm:Customer ;
+        cccm:fullName ?custName ;
+        cccm:basedIn ?cCountry ;
+        cccm:hasAccount ?acc .
+
+  ?cCountry cccm:countryName ?custCountry .
+
+  ?acc cccm:heldAt ?inst .
+  ?inst cccm:basedIn ?iCountry .
+  ?iCountry cccm:countryName ?bankCountry .
+
+  FILTER(?cCountry != ?iCountry)
 }}"""
-        
         return query
     
-    def _generate_transaction_query(self, classes: List[str], 
-                                   properties: List[str], 
-                                   filters: Dict[str, Any]) -> str:
-        """Generate query for transaction-related requests"""
+    @TEMPLATES.template('loss_filter', priority=90,
+                        special_patterns=('LOSS_FILTER',), fields=('comparison',),
+                        slots=('comparison',),
+                        when=lambda frame: frame['special_pattern'] == 'LOSS_FILTER'
+                        or (frame['comparison'] or {}).get('type') == 'LOSS_PERCENTAGE')
+    def _generate_loss_filter_query(self, comparison: Dict[str, Any]) -> str:
+        """Generate query for transactions with loss > threshold"""
+        percentage = comparison.get('percentage', 5) if comparison else 5
+        threshold = percentage / 100.0
         
-        # Check if it's remittances processed by FinTech only
-        if 'Remittance' in classes and 'FinTech' in classes and 'processedBy' in properties:
-            query = f"""{self.prefix}
-SELECT (STRAFTER(STR(?r),"#") AS ?RemitID) ?custName ?amount ?fintechName
+        query = f"""{self.prefix}
+SELECT ?TxnID ?custName ?sent ?received
 WHERE {{
-  ?r a cccm:Remittance ;
-     cccm:amountSent ?amount ;
-     cccm:initiatedBy ?cust ;
-     cccm:processedBy ?fintech .
+  ?txn a cccm:Transaction ;
+       cccm:amountSent ?sent ;
+       cccm:amountReceived ?received ;
+       cccm:initiatedBy ?cust .
 
+  FILTER((?sent - ?received) > (?sent * {threshold}))  
+  BIND(STRAFTER(STR(?txn),"#") AS ?TxnID)
   ?cust cccm:fullName ?custName .
-  ?fintech a cccm:FinTech ;
-           cccm:bankName ?fintechName .
 }}
-ORDER BY DESC(?amount)"""
-            return query
-        
-        # Check if query is about customers who initiated transactions
-        if 'initiatedBy' in properties or 'initiated' in properties or \
-           any(prop in properties for prop in ['fullName']):
-            
-            if 'Remittance' in classes:
-                # Customers who initiated remittances
-                query = f"""{self.prefix}
-SELECT DISTINCT ?custName
-WHERE {{
-  ?r a cccm:Remittance ;
-     cccm:initiatedBy ?cust .
-  ?cust cccm:fullName ?custName .
-}}"""
-            else:
-                # Customers who initiated any transaction
-                query = f"""{self.prefix}
-SELECT DISTINCT ?custName
+ORDER BY DESC(?sent)"""
+        return query
+    
+    @TEMPLATES.template('top_customer_by_amount', priority=84,
+                        special_patterns=('TOP',),
+                        when=lambda frame: 'Customer' in frame['classes']
+                        and 'Transaction' in frame['classes'])
+    def _generate_top_customer_query(self) -> str:
+        """Generate query for the customer with the highest amount sent"""
+        query = f"""{self.prefix}
+SELECT ?custName (SUM(?amount) AS ?TotalSent)
 WHERE {{
   ?txn a cccm:Transaction ;
+       cccm:amountSent ?amount ;
        cccm:initiatedBy ?cust .
   ?cust cccm:fullName ?custName .
-}}"""
-        
-        # Check if query is about transactions and processing institutions
-        elif 'processedBy' in properties or 'processed' in properties:
-            query = f"""{self.prefix}
-SELECT ?txnID ?instName
+}}
+GROUP BY ?custName
+ORDER BY DESC(?TotalSent)
+LIMIT 1"""
+        return query
+    
+    @TEMPLATES.template('top_fintech_by_remittances', priority=83,
+                        special_patterns=('TOP',),
+                        when=lambda frame: 'FinTech' in frame['classes']
+                        and 'Remittance' in frame['classes'])
+    def _generate_top_fintech_query(self) -> str:
+        """Generate query for the fintech with most remittances"""
+        query = f"""{self.prefix}
+SELECT ?fintechName (COUNT(?r) AS ?NumRemittances)
 WHERE {{
-  ?txn a cccm:Transaction ;
-       cccm:processedBy ?inst .
-  ?inst cccm:bankName ?instName .
-  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
-}}"""
-        
-        # Check for status filter
-        elif 'status' in filters:
-            status = filters['status']
-            txn_class = 'cccm:Remittance' if 'Remittance' in classes else 'cccm:Transaction'
-            query = f"""{self.prefix}
-SELECT ?txnID ?amount ?status
+  ?r a cccm:Remittance ;
+     cccm:processedBy ?fintech .
+
+  ?fintech a cccm:FinTech ;
+           cccm:bankName ?fintechName .
+}}
+GROUP BY ?fintechName
+ORDER BY DESC(?NumRemittances)"""
+        return query
+    
+    @TEMPLATES.template('top_exchange_rates', priority=82,
+                        special_patterns=('TOP',),
+                        when=lambda frame: 'Rate' in frame['classes']
+                        or 'exchange' in frame['properties'])
+    def _generate_top_rates_query(self) -> str:
+        """Generate query for the highest exchange rates"""
+        query = f"""{self.prefix}
+SELECT ?rateID ?value ?src ?tgt
 WHERE {{
-  ?txn a {txn_class} ;
-       cccm:amountSent ?amount ;
-       cccm:hasStatus ?s .
-  ?s cccm:status ?status .
-  FILTER(?status = "{status}")
-  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
-}}"""
-        
-        # Check for currency filter
-        elif 'fromCurrency' in filters or 'toCurrency' in filters:
-            from_curr = filters.get('fromCurrency', '')
-            to_curr = filters.get('toCurrency', '')
-            
-            where_clauses = ["?txn a cccm:Transaction ;",
-                           "     cccm:amountSent ?amount ."]
-            
-            if from_curr:
-                where_clauses.append(f"  ?txn cccm:fromCurrency cccm:{from_curr} .")
-            if to_curr:
-                where_clauses.append(f"  ?txn cccm:toCurrency cccm:{to_curr} .")
-            
-            where_clause = "\n".join(where_clauses)
-            
-            query = f"""{self.prefix}
-SELECT ?txnID ?amount
+  ?r a cccm:Rate ;
+     cccm:rateValue ?value ;
+     cccm:rateSource ?s ;
+     cccm:rateTarget ?t .
+  ?s cccm:isoCode ?src .
+  ?t cccm:isoCode ?tgt .
+
+  BIND(STRAFTER(STR(?r),"#") AS ?rateID)
+}}
+ORDER BY DESC(?value)
+LIMIT 10"""
+        return query
+    
+    @TEMPLATES.template('top_aggregate', priority=81,
+                        special_patterns=('TOP',),
+                        slots=('classes', 'properties', 'aggregation'))
+    def _generate_top_query(self, classes: List[str], properties: List[str], 
+                           aggregation: Dict[str, str]) -> str:
+        """Generate default top query: the aggregation query, descending"""
+        frame = dict(FRAME_DEFAULTS,
+                     classes=classes,
+                     properties=properties,
+                     aggregation=aggregation or {'type': 'COUNT', 'variable': '?item'},
+                     order_by={'variable': '?total', 'direction': 'DESC'})
+        return self._render(frame)
+    
+    @TEMPLATES.template('specific_institution', priority=70,
+                        fields=('specific_institution',),
+                        slots=('specific_institution',))
+    def _generate_specific_institution_query(self, specific_institution: str) -> str:
+        """Generate query for specific institution"""
+        query = f"""{self.prefix}
+SELECT ?TxnID ?custName ?amount
 WHERE {{
-  {where_clause}
-  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
-}}"""
+  ?txn cccm:processedBy cccm:{specific_institution} ;
+       cccm:amountSent ?amount ;
+       cccm:initiatedBy ?cust .
+
+  ?cust cccm:fullName ?custName .
+  BIND(STRAFTER(STR(?txn),"#") AS ?TxnID)
+}}
+ORDER BY DESC(?amount)"""
+        return query
+    
+    @TEMPLATES.template('remittances_by_amount', priority=61,
+                        fields=('comparison',), slots=('comparison',),
+                        when=lambda frame: 'value' in frame['comparison']
+                        and 'Remittance' in frame['classes'])
+    def _generate_remittance_comparison_query(self, comparison: Dict[str, Any]) -> str:
+        """Generate remittance query with numeric comparison filter"""
+        operator = comparison.get('operator', '>')
+        value = comparison.get('value', 0)
         
-        else:
-            # List all transactions/remittances
-            if 'Remittance' in classes:
-                query = f"""{self.prefix}
-SELECT ?txnID ?amount
-WHERE {{
-  ?txn a cccm:Remittance ;
-       cccm:amountSent ?amount .
-  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
-}}"""
-            else:
-                query = f"""{self.prefix}
-SELECT ?txnID ?amount
+        query = f"""{self.prefix}
+SELECT ?custName ?amount
 WHERE {{
-  ?txn a cccm:Transaction ;
-       cccm:amountSent ?amount .
-  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
-}}"""
-        
+  ?r a cccm:Remittance ;
+     cccm:amountSent ?amount ;
+     cccm:initiatedBy ?cust .
+  FILTER(?amount {operator} {value})
+
+  ?cust cccm:fullName ?custName .
+}}
+ORDER BY DESC(?amount)"""
         return query
     
-    def _generate_account_query(self, classes: List[str], 
-                               properties: List[str], 
-                               filters: Dict[str, Any]) -> str:
-        """Generate query for account-related requests"""
+    @TEMPLATES.template('transactions_by_amount', priority=60,
+                        fields=('comparison',), slots=('comparison',),
+                        when=lambda frame: 'value' in frame['comparison'])
+    def _generate_comparison_filter_query(self, comparison: Dict[str, Any]) -> str:
+        """Generate transaction query with numeric comparison filter"""
+        operator = comparison.get('operator', '>')
+        value = comparison.get('value', 0)
         
-        # Simple account listing
         query = f"""{self.prefix}
-SELECT ?custName ?accID
+SELECT ?TxnID ?amount
 WHERE {{
-  ?cust a cccm:Customer ;
-        cccm:fullName ?custName ;
-        cccm:hasAccount ?acc .
-  BIND(STRAFTER(STR(?acc), "#") AS ?accID)
-}}"""
-        
+  ?txn a cccm:Transaction ;
+       cccm:amountSent ?amount .
+  FILTER(?amount {operator} {value})
+  
+  BIND(STRAFTER(STR(?txn),"#") AS ?TxnID)
+}}
+ORDER BY DESC(?amount)"""
         return query
     
-    def _generate_aggregation_query(self, classes: List[str], 
-                                   properties: List[str], 
-                                   filters: Dict[str, Any],
-                                   aggregation: Dict[str, str],
-                                   order_by: Dict[str, str] = None) -> str:
-        """Generate aggregation query (e.g., count accounts per customer)"""
-        
-        agg_type = aggregation.get('type', 'COUNT')
-        agg_var = aggregation.get('variable', '?item')
-        
-        # For each bank, show total customers (complex aggregation)
-        if 'Bank' in classes and 'Customer' in classes and 'serve' in properties:
-            query = f"""{self.prefix}
+    @TEMPLATES.template('customers_per_bank', priority=56,
+                        fields=('aggregation',),
+                        when=lambda frame: 'Bank' in frame['classes']
+                        and 'Customer' in frame['classes']
+                        and 'serve' in frame['properties'])
+    def _generate_customers_per_bank_query(self) -> str:
+        """Generate query counting customers for each bank"""
+        query = f"""{self.prefix}
 SELECT ?bankName (COUNT(DISTINCT ?cust) AS ?NumCustomers)
 WHERE {{
   ?acc a cccm:Account ;
@@ -324,11 +541,20 @@ WHERE {{
 }}
 GROUP BY ?bankName
 ORDER BY DESC(?NumCustomers)"""
-            return query
+        return query
+    
+    @TEMPLATES.template('accounts_per_customer', priority=55,
+                        fields=('aggregation',),
+                        slots=('aggregation', 'order_by'),
+                        when=lambda frame: 'Account' in frame['classes']
+                        or 'hasAccount' in frame['properties'])
+    def _generate_aggregation_query(self, aggregation: Dict[str, str],
+                                   order_by: Dict[str, str] = None) -> str:
+        """Generate aggregation query (e.g., count accounts per customer)"""
+        agg_type = aggregation.get('type', 'COUNT')
+        agg_var = aggregation.get('variable', '?item')
         
-        # Count accounts per customer
-        if 'Account' in classes or 'hasAccount' in properties:
-            query = f"""{self.prefix}
+        query = f"""{self.prefix}
 SELECT ?custName ({agg_type}({agg_var}) AS ?NumAcc)
 WHERE {{
   ?cust a cccm:Customer ;
@@ -336,14 +562,20 @@ WHERE {{
         cccm:hasAccount {agg_var} .
 }}
 GROUP BY ?custName"""
-            
-            if order_by:
-                direction = order_by.get('direction', 'DESC')
-                query += f"\nORDER BY {direction}(?NumAcc)"
         
-        # Count transactions by currency
-        elif 'Currency' in classes and 'Transaction' in classes:
-            query = f"""{self.prefix}
+        if order_by:
+            direction = order_by.get('direction', 'DESC')
+            query += f"\nORDER BY {direction}(?NumAcc)"
+        
+        return query
+    
+    @TEMPLATES.template('transactions_per_currency', priority=54,
+                        fields=('aggregation',),
+                        when=lambda frame: 'Currency' in frame['classes']
+                        and 'Transaction' in frame['classes'])
+    def _generate_transactions_per_currency_query(self) -> str:
+        """Generate query counting transactions by source currency"""
+        query = f"""{self.prefix}
 SELECT ?iso (COUNT(?txn) AS ?TxnCount)
 WHERE {{
   ?txn cccm:fromCurrency ?cur .
@@ -351,313 +583,351 @@ WHERE {{
 }}
 GROUP BY ?iso
 ORDER BY DESC(?TxnCount)"""
+        return query
+    
+    @TEMPLATES.template('customer_count', priority=53,
+                        fields=('aggregation',),
+                        slots=('aggregation', 'filters'),
+                        when=lambda frame: 'Customer' in frame['classes']
+                        and 'Transaction' not in frame['classes'])
+    def _generate_customer_count_query(self, aggregation: Dict[str, str],
+                                       filters: Dict[str, Any]) -> str:
+        """Generate query counting customers, optionally by country"""
+        agg_type = aggregation.get('type', 'COUNT')
+        country_filter = ""
+        if 'basedIn' in filters:
+            country = filters['basedIn']
+            country_filter = f"\n        cccm:basedIn cccm:{country} ;"
         
-        # Count customers
-        elif 'Customer' in classes and 'Transaction' not in classes:
-            country_filter = ""
-            if 'basedIn' in filters:
-                country = filters['basedIn']
-                country_filter = f"\n        cccm:basedIn cccm:{country} ;"
-            
-            query = f"""{self.prefix}
+        query = f"""{self.prefix}
 SELECT ({agg_type}(?cust) AS ?TotalCustomers)
 WHERE {{
   ?cust a cccm:Customer ;{country_filter}
         cccm:fullName ?name .
 }}"""
-        
-        # Count transactions
-        elif 'Transaction' in classes:
-            query = f"""{self.prefix}
+        return query
+    
+    @TEMPLATES.template('transaction_count', priority=52,
+                        fields=('aggregation',), slots=('aggregation',),
+                        when=lambda frame: 'Transaction' in frame['classes'])
+    def _generate_transaction_count_query(self, aggregation: Dict[str, str]) -> str:
+        """Generate query counting transactions"""
+        agg_type = aggregation.get('type', 'COUNT')
+        query = f"""{self.prefix}
 SELECT ({agg_type}(?txn) AS ?TotalTransactions)
 WHERE {{
   ?txn a cccm:Transaction .
 }}"""
-        
-        else:
-            # Generic count
-            query = f"""{self.prefix}
+        return query
+    
+    @TEMPLATES.template('item_count', priority=50,
+                        fields=('aggregation',), slots=('aggregation',))
+    def _generate_item_count_query(self, aggregation: Dict[str, str]) -> str:
+        """Generate generic count query"""
+        agg_type = aggregation.get('type', 'COUNT')
+        query = f"""{self.prefix}
 SELECT ({agg_type}(?item) AS ?Total)
 WHERE {{
   ?item a ?type .
 }}"""
-        
         return query
     
-    def _generate_default_query(self, classes: List[str], 
-                               properties: List[str], 
-                               filters: Dict[str, Any]) -> str:
-        """Generate default query when pattern is unclear"""
-        
-        if not classes:
-            # No class detected, return all customers as default
-            return f"""{self.prefix}
-SELECT ?name
-WHERE {{
-  ?cust a cccm:Customer ;
-        cccm:fullName ?name .
-}}
-LIMIT 10"""
-        
-        # Use first detected class
-        class_name = classes[0]
-        
-        # Determine what property to select
-        if class_name == 'Customer':
-            prop = 'fullName'
-            var = '?name'
-        elif class_name in ['Bank', 'FinTech', 'Institution']:
-            prop = 'bankName'
-            var = '?name'
-        elif class_name == 'Currency':
-            prop = 'isoCode'
-            var = '?code'
-        elif class_name == 'Country':
-            prop = 'countryName'
-            var = '?name'
-        else:
-            # Generic
-            var = '?value'
-            query = f"""{self.prefix}
-SELECT ?item
-WHERE {{
-  ?item a cccm:{class_name} .
-}}
-LIMIT 20"""
-            return query
-        
+    @TEMPLATES.template('remittances_by_fintech', priority=47,
+                        classes=('Remittance',),
+                        when=lambda frame: 'FinTech' in frame['classes']
+                        and 'processedBy' in frame['properties'])
+    def _generate_fintech_remittances_query(self) -> str:
+        """Generate query for remittances processed by fintechs"""
         query = f"""{self.prefix}
-SELECT {var}
+SELECT (STRAFTER(STR(?r),"#") AS ?RemitID) ?custName ?amount ?fintechName
 WHERE {{
-  ?item a cccm:{class_name} ;
-        cccm:{prop} {var} .
-}}"""
-        
+  ?r a cccm:Remittance ;
+     cccm:amountSent ?amount ;
+     cccm:initiatedBy ?cust ;
+     cccm:processedBy ?fintech .
+
+  ?cust cccm:fullName ?custName .
+  ?fintech a cccm:FinTech ;
+           cccm:bankName ?fintechName .
+}}
+ORDER BY DESC(?amount)"""
         return query
     
-    def _generate_multiple_accounts_query(self) -> str:
-        """Generate query for customers with multiple accounts"""
+    @TEMPLATES.template('remittance_initiators', priority=46,
+                        classes=('Remittance',),
+                        when=_asks_initiators)
+    def _generate_remittance_initiators_query(self) -> str:
+        """Generate query for customers who initiated remittances"""
         query = f"""{self.prefix}
-SELECT ?custName (COUNT(?acc) AS ?NumAccounts)
+SELECT DISTINCT ?custName
 WHERE {{
-  ?cust a cccm:Customer ;
-        cccm:fullName ?custName ;
-        cccm:hasAccount ?acc .
-}}
-GROUP BY ?custName
-HAVING(COUNT(?acc) > 1)
-ORDER BY DESC(?NumAccounts)"""
+  ?r a cccm:Remittance ;
+     cccm:initiatedBy ?cust .
+  ?cust cccm:fullName ?custName .
+}}"""
         return query
     
-    def _generate_cross_border_query(self, classes: List[str]) -> str:
-        """Generate query for cross-border transactions (currency conversion)"""
+    @TEMPLATES.template('transaction_initiators', priority=45,
+                        classes=('Transaction',),
+                        when=_asks_initiators)
+    def _generate_transaction_initiators_query(self) -> str:
+        """Generate query for customers who initiated any transaction"""
         query = f"""{self.prefix}
-SELECT ?TxnID ?custName ?fromISO ?toISO
+SELECT DISTINCT ?custName
 WHERE {{
   ?txn a cccm:Transaction ;
-       cccm:fromCurrency ?fc ;
-       cccm:toCurrency ?tc ;
        cccm:initiatedBy ?cust .
-
-  FILTER(?fc != ?tc)
-
-  ?fc cccm:isoCode ?fromISO .
-  ?tc cccm:isoCode ?toISO .
   ?cust cccm:fullName ?custName .
-
-  BIND(STRAFTER(STR(?txn), "#") AS ?TxnID)
-}}
-ORDER BY ?custName"""
+}}"""
         return query
     
-    def _generate_comparison_query(self, classes: List[str], properties: List[str]) -> str:
-        """Generate comparison query (banks vs fintechs)"""
+    @TEMPLATES.template('processing_institutions', priority=44,
+                        classes=('Transaction', 'Remittance'),
+                        when=lambda frame: 'processedBy' in frame['properties']
+                        or 'processed' in frame['properties'])
+    def _generate_processing_institutions_query(self) -> str:
+        """Generate query for transactions and their processing institutions"""
         query = f"""{self.prefix}
-SELECT ?instName (COUNT(?txn) AS ?TotalTxns)
+SELECT ?txnID ?instName
 WHERE {{
-  ?txn cccm:processedBy ?inst .
+  ?txn a cccm:Transaction ;
+       cccm:processedBy ?inst .
   ?inst cccm:bankName ?instName .
-}}
-GROUP BY ?instName
-ORDER BY DESC(?TotalTxns)"""
+  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
+}}"""
         return query
     
-    def _generate_full_chain_query(self) -> str:
-        """Generate full money trail query"""
+    @TEMPLATES.template('transactions_by_status', priority=43,
+                        classes=('Transaction', 'Remittance'),
+                        slots=('classes', 'filters'),
+                        when=lambda frame: 'status' in frame['filters'])
+    def _generate_status_query(self, classes: List[str],
+                               filters: Dict[str, Any]) -> str:
+        """Generate query for transactions with a given status"""
+        status = filters['status']
+        txn_class = 'cccm:Remittance' if 'Remittance' in classes else 'cccm:Transaction'
         query = f"""{self.prefix}
-SELECT ?custName ?accID ?instName ?txnID ?amount
+SELECT ?txnID ?amount ?status
 WHERE {{
-  ?cust a cccm:Customer ;
-        cccm:fullName ?custName ;
-        cccm:hasAccount ?acc .
-
-  ?acc cccm:heldAt ?inst .
-  ?inst cccm:bankName ?instName .
-
-  ?txn cccm:initiatedBy ?cust ;
-       cccm:amountSent ?amount .
-
-  BIND(STRAFTER(STR(?acc), "#") AS ?accID)
+  ?txn a {txn_class} ;
+       cccm:amountSent ?amount ;
+       cccm:hasStatus ?s .
+  ?s cccm:status ?status .
+  FILTER(?status = "{status}")
   BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
-}}
-ORDER BY ?custName"""
+}}"""
         return query
     
-    def _generate_both_types_query(self) -> str:
-        """Generate query for customers using both banks and fintechs"""
+    @TEMPLATES.template('transactions_by_currency', priority=42,
+                        classes=('Transaction', 'Remittance'),
+                        slots=('filters',),
+                        when=lambda frame: 'fromCurrency' in frame['filters']
+                        or 'toCurrency' in frame['filters'])
+    def _generate_currency_query(self, filters: Dict[str, Any]) -> str:
+        """Generate query for transactions between currencies"""
+        from_curr = filters.get('fromCurrency', '')
+        to_curr = filters.get('toCurrency', '')
+        
+        where_clauses = ["?txn a cccm:Transaction ;",
+                       "     cccm:amountSent ?amount ."]
+        
+        if from_curr:
+            where_clauses.append(f"  ?txn cccm:fromCurrency cccm:{from_curr} .")
+        if to_curr:
+            where_clauses.append(f"  ?txn cccm:toCurrency cccm:{to_curr} .")
+        
+        where_clause = "\n".join(where_clauses)
+        
         query = f"""{self.prefix}
-SELECT DISTINCT ?custName
+SELECT ?txnID ?amount
 WHERE {{
-  ?cust a cccm:Customer ;
-        cccm:fullName ?custName ;
-        cccm:hasAccount ?acc1, ?acc2 .
-
-  ?acc1 cccm:heldAt ?inst1 .
-  ?acc2 cccm:heldAt ?inst2 .
-
-  ?inst1 a cccm:Bank .
-  ?inst2 a cccm:FinTech .
+  {where_clause}
+  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
 }}"""
         return query
     
-    def _generate_foreign_accounts_query(self) -> str:
-        """Generate query for customers with foreign accounts"""
+    @TEMPLATES.template('list_remittances', priority=41,
+                        classes=('Remittance',))
+    def _generate_remittance_query(self) -> str:
+        """Generate query listing all remittances"""
         query = f"""{self.prefix}
-SELECT DISTINCT ?custName ?custCountry ?bankCountry
+SELECT ?txnID ?amount
 WHERE {{
-  ?cust a cccm:Customer ;
-        cccm:fullName ?custName ;
-        cccm:basedIn ?cCountry ;
-        cccm:hasAccount ?acc .
-
-  ?cCountry cccm:countryName ?custCountry .
-
-  ?acc cccm:heldAt ?inst .
-  ?inst cccm:basedIn ?iCountry .
-  ?iCountry cccm:countryName ?bankCountry .
-
-  FILTER(?cCountry != ?iCountry)
+  ?txn a cccm:Remittance ;
+       cccm:amountSent ?amount .
+  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
 }}"""
         return query
     
-    def _generate_loss_filter_query(self, comparison: Dict[str, Any]) -> str:
-        """Generate query for transactions with loss > threshold"""
-        percentage = comparison.get('percentage', 5) if comparison else 5
-        threshold = percentage / 100.0
-        
+    @TEMPLATES.template('list_transactions', priority=40,
+                        classes=('Transaction',))
+    def _generate_transaction_query(self) -> str:
+        """Generate query listing all transactions"""
         query = f"""{self.prefix}
-SELECT ?TxnID ?custName ?sent ?received
+SELECT ?txnID ?amount
 WHERE {{
   ?txn a cccm:Transaction ;
-       cccm:amountSent ?sent ;
-       cccm:amountReceived ?received ;
+       cccm:amountSent ?amount .
+  BIND(STRAFTER(STR(?txn), "#") AS ?txnID)
+}}"""
+        return query
+    
+    @TEMPLATES.template('customer_currency_pairs', priority=32,
+                        classes=('Customer',), slots=('filters',),
+                        when=lambda frame: 'basedIn' in frame['filters']
+                        and 'Currency' in frame['classes']
+                        and 'Transaction' in frame['classes'])
+    def _generate_customer_currency_query(self, filters: Dict[str, Any]) -> str:
+        """Generate query for currency pairs used by customers of a country"""
+        country = filters['basedIn']
+        query = f"""{self.prefix}
+SELECT DISTINCT ?custName ?fromISO ?toISO
+WHERE {{
+  ?txn a cccm:Transaction ;
+       cccm:fromCurrency ?fc ;
+       cccm:toCurrency ?tc ;
        cccm:initiatedBy ?cust .
-
-  FILTER((?sent - ?received) > (?sent * {threshold}))  
-  BIND(STRAFTER(STR(?txn),"#") AS ?TxnID)
-  ?cust cccm:fullName ?custName .
-}}
-ORDER BY DESC(?sent)"""
+  ?cust cccm:basedIn cccm:{country} ;
+        cccm:fullName ?custName .
+  ?fc cccm:isoCode ?fromISO .
+  ?tc cccm:isoCode ?toISO .
+  FILTER(?fromISO != ?toISO)
+}}"""
         return query
     
-    def _generate_top_query(self, classes: List[str], properties: List[str], 
-                           aggregation: Dict[str, str]) -> str:
-        """Generate query for top customer/institution by some metric"""
+    @TEMPLATES.template('list_customers', priority=30,
+                        classes=('Customer',), slots=('filters',))
+    def _generate_customer_query(self, filters: Dict[str, Any]) -> str:
+        """Generate query for customer-related requests"""
         
-        if 'Customer' in classes and 'Transaction' in classes:
-            # Customer with highest transaction amount
+        # Check if we need to filter by country
+        if 'basedIn' in filters:
+            country = filters['basedIn']
             query = f"""{self.prefix}
-SELECT ?custName (SUM(?amount) AS ?TotalSent)
+SELECT ?name
 WHERE {{
-  ?txn a cccm:Transaction ;
-       cccm:amountSent ?amount ;
-       cccm:initiatedBy ?cust .
-  ?cust cccm:fullName ?custName .
-}}
-GROUP BY ?custName
-ORDER BY DESC(?TotalSent)
-LIMIT 1"""
-        elif 'FinTech' in classes and 'Remittance' in classes:
-            # FinTech with most remittances
+  ?cust a cccm:Customer ;
+        cccm:fullName ?name ;
+        cccm:basedIn cccm:{country} .
+}}"""
+        else:
+            # List all customers
             query = f"""{self.prefix}
-SELECT ?fintechName (COUNT(?r) AS ?NumRemittances)
+SELECT ?name
 WHERE {{
-  ?r a cccm:Remittance ;
-     cccm:processedBy ?fintech .
-
-  ?fintech a cccm:FinTech ;
-           cccm:bankName ?fintechName .
-}}
-GROUP BY ?fintechName
-ORDER BY DESC(?NumRemittances)"""
-        elif 'Rate' in classes or 'exchange' in properties:
-            # Highest exchange rates
+  ?cust a cccm:Customer ;
+        cccm:fullName ?name .
+}}"""
+        
+        return query
+    
+    @TEMPLATES.template('list_institutions', priority=20,
+                        classes=('Bank', 'FinTech', 'Institution'),
+                        slots=('classes', 'filters'))
+    def _generate_institution_query(self, classes: List[str], 
+                                   filters: Dict[str, Any]) -> str:
+        """Generate query for institution-related requests"""
+        
+        # Determine institution types
+        types = []
+        if 'Bank' in classes:
+            types.append('cccm:Bank')
+        if 'FinTech' in classes:
+            types.append('cccm:FinTech')
+        if not types or 'Institution' in classes:
+            if self.materialized:
+                # Bank/FinTech -> Institution is stored, so use the type index
+                types = ['cccm:Institution']
+            else:
+                types = ['cccm:Bank', 'cccm:FinTech']
+        
+        # Build query
+        if 'basedIn' in filters:
+            country = filters['basedIn']
+            if len(types) == 1:
+                type_str, type_filter = types[0], ""
+            else:
+                type_str, type_filter = "?type", f"FILTER(?type IN ({', '.join(types)}))"
+            
             query = f"""{self.prefix}
-SELECT ?rateID ?value ?src ?tgt
+SELECT ?name
 WHERE {{
-  ?r a cccm:Rate ;
-     cccm:rateValue ?value ;
-     cccm:rateSource ?s ;
-     cccm:rateTarget ?t .
-  ?s cccm:isoCode ?src .
-  ?t cccm:isoCode ?tgt .
-
-  BIND(STRAFTER(STR(?r),"#") AS ?rateID)
-}}
-ORDER BY DESC(?value)
-LIMIT 10"""
+  ?i a {type_str} ;
+     cccm:basedIn cccm:{country} ;
+     cccm:bankName ?name .
+  {type_filter}
+}}"""
         else:
-            # Default top query
-            query = self._generate_aggregation_query(classes, properties, {}, 
-                                                     aggregation or {'type': 'COUNT', 'variable': '?item'}, 
-                                                     {'variable': '?total', 'direction': 'DESC'})
+            if len(types) == 1:
+                type_str = types[0]
+                query = f"""{self.prefix}
+SELECT ?name
+WHERE {{
+  ?i a {type_str} ;
+     cccm:bankName ?name .
+}}"""
+            else:
+                query = f"""{self.prefix}
+SELECT ?name
+WHERE {{
+  ?i a ?type ;
+     cccm:bankName ?name .
+  FILTER(?type IN ({', '.join(types)}))
+}}"""
         
         return query
     
-    def _generate_specific_institution_query(self, classes: List[str], 
-                                            institution: str) -> str:
-        """Generate query for specific institution"""
+    @TEMPLATES.template('list_accounts', priority=10, classes=('Account',))
+    def _generate_account_query(self) -> str:
+        """Generate query for account-related requests"""
+        
+        # Simple account listing
         query = f"""{self.prefix}
-SELECT ?TxnID ?custName ?amount
+SELECT ?custName ?accID
 WHERE {{
-  ?txn cccm:processedBy cccm:{institution} ;
-       cccm:amountSent ?amount ;
-       cccm:initiatedBy ?cust .
-
-  ?cust cccm:fullName ?custName .
-  BIND(STRAFTER(STR(?txn),"#") AS ?TxnID)
-}}
-ORDER BY DESC(?amount)"""
+  ?cust a cccm:Customer ;
+        cccm:fullName ?custName ;
+        cccm:hasAccount ?acc .
+  BIND(STRAFTER(STR(?acc), "#") AS ?accID)
+}}"""
+        
         return query
     
-    def _generate_comparison_filter_query(self, classes: List[str], 
-                                         comparison: Dict[str, Any]) -> str:
-        """Generate query with numeric comparison filter"""
-        operator = comparison.get('operator', '>')
-        value = comparison.get('value', 0)
-        
-        if 'Remittance' in classes:
-            query = f"""{self.prefix}
-SELECT ?custName ?amount
+    @TEMPLATES.template('default_customers', priority=2,
+                        when=lambda frame: not frame['classes'])
+    def _generate_default_customers_query(self) -> str:
+        """Generate default query when no class was detected"""
+        return f"""{self.prefix}
+SELECT ?name
 WHERE {{
-  ?r a cccm:Remittance ;
-     cccm:amountSent ?amount ;
-     cccm:initiatedBy ?cust .
-  FILTER(?amount {operator} {value})
-
-  ?cust cccm:fullName ?custName .
+  ?cust a cccm:Customer ;
+        cccm:fullName ?name .
 }}
-ORDER BY DESC(?amount)"""
-        else:
-            query = f"""{self.prefix}
-SELECT ?TxnID ?amount
+LIMIT 10"""
+    
+    @TEMPLATES.template('default_labels', priority=1, slots=('classes',),
+                        when=lambda frame: frame['classes'][0] in DEFAULT_LABELS)
+    def _generate_default_query(self, classes: List[str]) -> str:
+        """Generate default query listing labels of the first detected class"""
+        class_name = classes[0]
+        prop, var = DEFAULT_LABELS[class_name]
+        query = f"""{self.prefix}
+SELECT {var}
 WHERE {{
-  ?txn a cccm:Transaction ;
-       cccm:amountSent ?amount .
-  FILTER(?amount {operator} {value})
-  
-  BIND(STRAFTER(STR(?txn),"#") AS ?TxnID)
-}}
-ORDER BY DESC(?amount)"""
+  ?item a cccm:{class_name} ;
+        cccm:{prop} {var} .
+}}"""
         
         return query
+    
+    @TEMPLATES.template('default_instances', priority=0, slots=('classes',))
+    def _generate_default_instances_query(self, classes: List[str]) -> str:
+        """Generate default query listing instances of the first detected class"""
+        class_name = classes[0]
+        query = f"""{self.prefix}
+SELECT ?item
+WHERE {{
+  ?item a cccm:{class_name} .
+}}
+LIMIT 20"""
+        return query
@@ -0,0 +1,274 @@
+"""
+Template Registry Module
+
+This module provides the table-driven dispatch used by SPARQLGenerator.
+Each query template declares the frame values that can trigger it, a
+priority, an optional match predicate and the frame fields (parameter
+slots) its builder takes. Selection looks up the candidate list for the
+frame's trigger keys in a decision index, so templates whose triggers
+never occur are never looked at.
+"""
+
+import itertools
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# NLP frame fields a template can take as parameters, with their defaults
+FRAME_DEFAULTS = {
+    'intent': 'list',
+    'classes': [],
+    'properties': [],
+    'filters': {},
+    'aggregation': None,
+    'order_by': None,
+    'special_pattern': None,
+    'comparison': None,
+    'specific_institution': None,
+}
+
+# Decision lists cached per trigger signature before the cache is reset
+MAX_DECISION_LISTS = 1024
+
+
+def normalize_frame(nlp_result) -> Dict[str, Any]:
+    """
+    Plain dict of the frame fields templates read, with defaults filled in
+
+    Args:
+        nlp_result: NLPResult or dict returned by NLPProcessor.process
+
+    Returns:
+        Dictionary keyed by the FRAME_DEFAULTS field names
+    """
+    frame = {}
+    for name, default in FRAME_DEFAULTS.items():
+        value = nlp_result.get(name)
+        frame[name] = default if value is None else value
+    return frame
+
+
+def frame_summary(nlp_result) -> Dict[str, Any]:
+    """The fields of an NLP result that shape the generated query, as reported to callers"""
+    return {field: nlp_result.get(field, default) for field, default in FRAME_DEFAULTS.items()}
+
+
+class QueryTemplate:
+    """
+    A registered query template
+    """
+
+    __slots__ = ('name', 'build', 'priority', 'when', 'slots', 'triggers',
+                 'rewrite', 'selectable', 'order')
+
+    def __init__(self, name: str, build: Callable[..., str], priority: int = 0,
+                 when: Callable[[Dict[str, Any]], bool] = None,
+                 slots: Tuple[str, ...] = (), triggers: Tuple[tuple, ...] = (),
+                 rewrite: str = None, selectable: bool = True, order: int = 0):
+        """
+        Initialize template
+
+        Args:
+            name: Unique template name
+            build: Called as build(generator, **slot_values), returns SPARQL
+            priority: Higher priorities are tried first
+            when: Predicate over the normalized frame (None always matches)
+            slots: Frame fields passed to build as keyword arguments
+            triggers: Index keys, e.g. ('class', 'Customer'); a template
+                without triggers is a candidate for every frame
+            rewrite: Name of a cheaper template returning the same rows,
+                used by the cost guard when this one is predicted too costly
+            selectable: False for templates only used by name (rewrites)
+            order: Registration sequence number, breaks priority ties
+        """
+        self.name = name
+        self.build = build
+        self.priority = priority
+        self.when = when
+        self.slots = tuple(slots)
+        self.triggers = tuple(triggers)
+        self.rewrite = rewrite
+        self.selectable = selectable
+        self.order = order
+
+    def matches(self, frame: Dict[str, Any]) -> bool:
+        """Check the template's predicate against a normalized frame"""
+        return self.when is None or bool(self.when(frame))
+
+    def render(self, generator, frame: Dict[str, Any]) -> str:
+        """Fill in the template from a normalized frame"""
+        return self.build(generator, **{slot: frame[slot] for slot in self.slots})
+
+    def __repr__(self) -> str:
+        return f"QueryTemplate({self.name!r}, priority={self.priority})"
+
+
+class TemplateRegistry:
+    """
+    Priority-ordered template registry with a decision index
+
+    Triggers are ('special_pattern', value), ('class', name) and
+    ('field', name) keys; the last fires when that frame field is set.
+    A template is a candidate when any of its triggers fires.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._templates: Dict[str, QueryTemplate] = {}
+        self._sequence = itertools.count()
+        self._reset_index()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def get(self, name: str) -> Optional[QueryTemplate]:
+        """Look up a template by name"""
+        return self._templates.get(name)
+
+    def names(self) -> List[str]:
+        """Template names, in the order they are tried (rewrites included)"""
+        return [t.name for t in sorted(self._templates.values(), key=self._rank)]
+
+    def register(self, template: QueryTemplate, replace: bool = False):
+        """
+        Add a template
+
+        Args:
+            template: Template to add
+            replace: Allow replacing a template with the same name
+        """
+        if template.name in self._templates and not replace:
+            raise ValueError(f"Template already registered: {template.name}")
+        for trigger in template.triggers:
+            if trigger[0] not in ('special_pattern', 'class', 'field'):
+                raise ValueError(f"Unknown trigger kind: {trigger[0]}")
+        template.order = next(self._sequence)
+        self._templates[template.name] = template
+        self._reset_index()
+
+    def unregister(self, name: str):
+        """Remove a template by name (no-op if unknown)"""
+        if self._templates.pop(name, None) is not None:
+            self._reset_index()
+
+    def template(self, name: str, priority: int = 0,
+                 when: Callable[[Dict[str, Any]], bool] = None,
+                 slots: Tuple[str, ...] = (),
+                 special_patterns: Tuple[str, ...] = (),
+                 classes: Tuple[str, ...] = (),
+                 fields: Tuple[str, ...] = (),
+                 rewrite: str = None,
+                 selectable: bool = True,
+                 replace: bool = False):
+        """
+        Decorator registering a builder function as a template
+
+        Example:
+            @TEMPLATES.template('customers_by_city', priority=35,
+                                classes=('Customer',), slots=('filters',),
+                                when=lambda frame: 'city' in frame['filters'])
+            def customers_by_city(generator, filters):
+                return generator.prefix + ...
+
+        Args:
+            name: Unique template name
+            priority: Higher priorities are tried first
+            when: Predicate over the normalized frame
+            slots: Frame fields passed to the builder
+            special_patterns: special_pattern values that trigger it
+            classes: Detected classes that trigger it
+            fields: Frame fields whose presence triggers it
+            rewrite: Name of a cheaper, equivalent template for the cost guard
+            selectable: False to register a template that is only used by
+                name (e.g. as a rewrite) and never selected
+
+        Returns:
+            Decorator returning the builder unchanged
+        """
+        for slot in slots:
+            if slot not in FRAME_DEFAULTS:
+                raise ValueError(f"Unknown template slot: {slot}")
+        triggers = tuple([('special_pattern', p) for p in special_patterns]
+                         + [('class', c) for c in classes]
+                         + [('field', f) for f in fields])
+
+        def decorator(build: Callable[..., str]) -> Callable[..., str]:
+            self.register(QueryTemplate(name, build, priority, when, slots,
+                                        triggers, rewrite, selectable),
+                          replace=replace)
+            return build
+        return decorator
+
+    def select(self, frame: Dict[str, Any]) -> QueryTemplate:
+        """
+        Pick the template for a normalized frame
+
+        Args:
+            frame: Frame from normalize_frame
+
+        Returns:
+            Highest priority candidate whose predicate matches
+        """
+        for template in self.candidates(frame):
+            if template.matches(frame):
+                return template
+        raise LookupError("No query template matches the NLP result")
+
+    def candidates(self, frame: Dict[str, Any]) -> List[QueryTemplate]:
+        """Templates triggered by a frame, in the order they are tried"""
+        signature = self._signature(frame)
+        decision = self._decisions.get(signature)
+        if decision is None:
+            if len(self._decisions) >= MAX_DECISION_LISTS:
+                self._decisions.clear()
+            decision = self._decision_list(signature)
+            self._decisions[signature] = decision
+        return decision
+
+    def _signature(self, frame: Dict[str, Any]) -> tuple:
+        """Trigger keys of a frame that some template is indexed under"""
+        index = self._index
+        keys = []
+        pattern = frame.get('special_pattern')
+        if pattern and ('special_pattern', pattern) in index:
+            keys.append(('special_pattern', pattern))
+        for class_name in frame.get('classes') or ():
+            key = ('class', class_name)
+            if key in index and key not in keys:
+                keys.append(key)
+        for field in self._indexed_fields:
+            if frame.get(field):
+                keys.append(('field', field))
+        return tuple(sorted(keys))
+
+    def _decision_list(self, signature: tuple) -> List[QueryTemplate]:
+        """Merge the index buckets of a signature into one ordered list"""
+        chosen = {t.name: t for t in self._fallback}
+        for key in signature:
+            for template in self._index[key]:
+                chosen[template.name] = template
+        return sorted(chosen.values(), key=self._rank)
+
+    def _reset_index(self):
+        """Rebuild the trigger index and drop cached decision lists"""
+        self._index: Dict[tuple, List[QueryTemplate]] = {}
+        self._fallback: List[QueryTemplate] = []
+        for template in self._templates.values():
+            if not template.selectable:
+                continue
+            if not template.triggers:
+                self._fallback.append(template)
+            for trigger in template.triggers:
+                self._index.setdefault(trigger, []).append(template)
+        self._indexed_fields = tuple(sorted(
+            key[1] for key in self._index if key[0] == 'field'))
+        self._decisions: Dict[tuple, List[QueryTemplate]] = {}
+
+    @staticmethod
+    def _rank(template: QueryTemplate) -> tuple:
+        return (-template.priority, template.order)
+
+
+# Registry used by SPARQLGenerator unless it is given another one
+TEMPLATES = TemplateRegistry()
@@ -0,0 +1,126 @@
+"""
+Admission control tests
+
+One slot is held by the test while callers queue behind it, so the order
+in which the waiting callers are admitted is deterministic.
+"""
+
+import threading
+import time
+import pytest
+from admission import FAST, NORMAL, AdmissionController, AdmissionRejected
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the controller"
+        time.sleep(0.001)
+
+
+class Callers:
+    """Callers queued one at a time behind a held slot"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.order = []
+        self.errors = []
+        self.threads = []
+
+    def queue(self, name, session, lane):
+        def call():
+            try:
+                with self.controller.admit(session, lane):
+                    self.order.append(name)
+            except AdmissionRejected as e:
+                self.errors.append((name, e))
+
+        waiting = self.controller.get_stats()['waiting']
+        thread = threading.Thread(target=call)
+        thread.start()
+        self.threads.append(thread)
+        # Queue the next caller only once this one is in its lane
+        wait_until(lambda: self.controller.get_stats()['waiting'] == waiting + 1)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join(5.0)
+        assert not any(thread.is_alive() for thread in self.threads)
+
+
+def test_lane_for_cost():
+    controller = AdmissionController(cheap_work=100)
+    assert controller.lane_for(None) == NORMAL
+    assert controller.lane_for({'estimated_work': 100}) == FAST
+    assert controller.lane_for({'estimated_work': 101}) == NORMAL
+
+
+def test_admits_up_to_the_limit_without_waiting():
+    controller = AdmissionController(max_concurrent=2, max_queue=0)
+    with controller.admit('a'), controller.admit('b'):
+        assert controller.get_stats()['active'] == 2
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.admit('c'):
+                pass
+        assert rejected.value.retry_after > 0
+    stats = controller.get_stats()
+    assert stats['active'] == 0
+    assert stats['admitted'] == 2 and stats['rejected_full'] == 1
+
+
+def test_fast_lane_first_but_normal_lane_not_starved():
+    controller = AdmissionController(max_concurrent=1, max_queue=8,
+                                     max_wait_ms=5000, fast_burst=2)
+    callers = Callers(controller)
+    with controller.admit('holder'):
+        callers.queue('normal', 's1', NORMAL)
+        for name in ('fast1', 'fast2', 'fast3'):
+            callers.queue(name, name, FAST)
+    callers.join()
+
+    assert not callers.errors
+    assert callers.order == ['fast1', 'fast2', 'normal', 'fast3']
+    assert controller.get_stats()['lanes'] == {FAST: 3, NORMAL: 2}
+
+
+def test_sessions_take_turns_within_a_lane():
+    controller = AdmissionController(max_concurrent=1, max_queue=8, max_wait_ms=5000)
+    callers = Callers(controller)
+    with controller.admit('holder'):
+        callers.queue('a1', 'a', NORMAL)
+        callers.queue('a2', 'a', NORMAL)
+        callers.queue('a3', 'a', NORMAL)
+        callers.queue('b1', 'b', NORMAL)
+    callers.join()
+
+    assert callers.order == ['a1', 'b1', 'a2', 'a3']
+
+
+def test_waiter_times_out():
+    controller = AdmissionController(max_concurrent=1, max_queue=8, max_wait_ms=50)
+    with controller.admit('holder'):
+        start = time.perf_counter()
+        with pytest.raises(AdmissionRejected):
+            with controller.admit('late'):
+                pass
+        assert time.perf_counter() - start >= 0.05
+        stats = controller.get_stats()
+        assert stats['rejected_timeout'] == 1 and stats['waiting'] == 0
+
+    # The timed-out waiter left no trace in the queue
+    with controller.admit('next'):
+        pass
+    assert controller.get_stats()['active'] == 0
+
+
+def test_predicted_wait_rejects_before_queueing():
+    controller = AdmissionController(max_concurrent=1, max_queue=8, max_wait_ms=50)
+    with controller.admit('slow'):
+        time.sleep(0.1)
+    with controller.admit('holder'):
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.admit('late'):
+                pass
+        assert 'predicted' in str(rejected.value)
+    stats = controller.get_stats()
+    assert stats['rejected_predicted'] == 1 and stats['queued'] == 0
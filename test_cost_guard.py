@@ -0,0 +1,74 @@
+"""
+Cost guard tests
+
+Rewrites must return the same rows as the template they replace; a
+template without an equivalent form is capped or rejected instead.
+"""
+
+import pytest
+from benchmarks import TEMPLATE_FRAMES, dataset_path
+from cost_estimator import CostEstimator, CostGuard
+from rdf_query_executor import RDFQueryExecutor
+from sparql_generator import SPARQLGenerator
+
+NLP_FRAMES = {
+    'full_chain': {'special_pattern': 'FULL_CHAIN'},
+    'both_institution_types': {'classes': ['Customer', 'Bank', 'FinTech'],
+                               'special_pattern': 'BOTH_TYPES'},
+}
+
+
+@pytest.fixture(scope='module')
+def executor():
+    return RDFQueryExecutor(dataset_path(), materialize=False)
+
+
+@pytest.fixture(scope='module')
+def graph(executor):
+    return executor.graph
+
+
+@pytest.fixture
+def generator():
+    return SPARQLGenerator(page_size=0, algebra=False)
+
+
+def rows(graph, query):
+    return sorted(tuple(row) for row in graph.query(str(query)))
+
+
+def test_rewrites_return_the_same_rows(graph, generator):
+    registry = generator.registry
+    rewritten = [registry.get(name) for name in registry.names() if registry.get(name).rewrite]
+    assert rewritten
+    for template in rewritten:
+        frame = TEMPLATE_FRAMES[template.name]
+        original = rows(graph, generator.generate_with(template.name, frame))
+        assert original, template.name
+        assert rows(graph, generator.generate_with(template.rewrite, frame)) == original, \
+            f"{template.rewrite} is not equivalent to {template.name}"
+
+
+def test_full_chain_is_capped_not_rewritten(executor, generator):
+    guard = CostGuard(generator, CostEstimator(executor), max_work=1, reject_work=10 ** 12,
+                      row_cap=5, enabled=True)
+    query, cost = guard.generate(NLP_FRAMES['full_chain'])
+    assert cost['template'] == 'full_chain'
+    assert cost['action'] == 'cap' and cost['row_cap'] == 5
+    assert str(query) == str(generator.generate(NLP_FRAMES['full_chain']))
+
+
+def test_full_chain_is_rejected_above_the_reject_threshold(executor, generator):
+    guard = CostGuard(generator, CostEstimator(executor), max_work=1, reject_work=2,
+                      enabled=True)
+    query, cost = guard.generate(NLP_FRAMES['full_chain'])
+    assert query is None
+    assert cost['action'] == 'reject' and cost['message'].startswith("Query rejected")
+
+
+def test_equivalent_rewrite_is_used(executor, generator):
+    guard = CostGuard(generator, CostEstimator(executor), max_work=1, reject_work=10 ** 12,
+                      enabled=True)
+    _, cost = guard.generate(NLP_FRAMES['both_institution_types'])
+    assert cost['template'] == 'both_institution_types_exists'
+    assert cost['action'] in ('rewrite', 'cap')
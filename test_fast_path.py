@@ -0,0 +1,33 @@
+"""
+Fast path equivalence test
+
+Every question of the golden corpus (which includes the example queries)
+must give the same semantic frame whether it is tokenized by the fast
+path or by spaCy. Needs the spaCy model of config.NLP_CONFIG, since the
+lemma table and the reference frames come from it.
+"""
+
+import pytest
+import spacy
+from config import NLP_CONFIG
+from benchmarks.golden import corpus, load_pipeline
+
+
+def test_fast_path_matches_spacy():
+    if not spacy.util.is_package(NLP_CONFIG['model']):
+        pytest.skip(f"spaCy model {NLP_CONFIG['model']} is not installed")
+
+    # The pipeline attaches the graph gazetteer, as in production
+    processor = load_pipeline().nlp_processor
+    mismatches = {}
+    for question in corpus():
+        processor.enable_fast_path = True
+        fast = processor.process(question, keep_doc=False).semantic_frame()
+        processor.enable_fast_path = False
+        full = processor.process(question, keep_doc=False).semantic_frame()
+        if fast != full:
+            mismatches[question] = {field: (fast[field], full[field])
+                                    for field in fast if fast[field] != full[field]}
+
+    assert processor.fast_path_stats['fast_path_queries'] > 0
+    assert not mismatches, f"fast path frames differ from spaCy's: {mismatches}"
@@ -0,0 +1,37 @@
+"""
+Golden-output regression test
+
+Runs the answers half of `python -m benchmarks.golden check`: every
+question of the corpus must give the frame, SPARQL and result rows
+stored in benchmarks/golden.json. Budgets are left to the benchmark,
+timings under pytest being too noisy to gate on.
+
+Fails while the golden output has not been recorded (an empty file would
+otherwise pass silently); skipped when the spaCy model it is pinned to is
+not installed.
+"""
+
+import json
+import pytest
+import spacy
+from benchmarks import golden
+
+
+def test_golden_output():
+    with open(golden.GOLDEN_PATH, encoding='utf-8') as golden_file:
+        expected = json.load(golden_file)
+    pin = expected['meta']['spacy_model']
+    assert expected['queries'], (
+        f"benchmarks/golden.json has no recorded answers; record them with "
+        f"{pin['name']} {pin['version']}: python -m benchmarks.golden update --budgets")
+
+    if not spacy.util.is_package(pin['name']):
+        pytest.skip(f"spaCy model {pin['name']} is not installed")
+
+    pipeline = golden.load_pipeline()
+    mismatch = golden.model_mismatch(expected, golden.model_identity(pipeline.nlp_processor.nlp))
+    if mismatch:
+        pytest.skip(mismatch)
+
+    report = golden.run(pipeline, golden.corpus(), measure=False)
+    assert golden.check(expected, report) == 0, "answers differ from benchmarks/golden.json"
@@ -0,0 +1,29 @@
+"""
+Rotating JSONL log tests
+"""
+
+import json
+from jsonl_log import JsonlLog
+
+
+def test_rotates_and_reads_both_files(tmp_path):
+    path = tmp_path / 'logs' / 'events.jsonl'
+    log = JsonlLog(str(path), max_bytes=30)
+    for number in range(4):
+        log.write({'n': number, 'pad': 'x' * 10})
+
+    # Every write past the limit moved the file to .1; one old file is kept
+    assert [json.loads(line)['n'] for line in (tmp_path / 'logs' / 'events.jsonl.1').open()] == [2]
+    assert [json.loads(line)['n'] for line in path.open()] == [3]
+    assert [entry['n'] for entry in log.entries()] == [2, 3]
+
+
+def test_skips_torn_lines_and_missing_files(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    log = JsonlLog(str(path), max_bytes=1024)
+    assert list(log.entries()) == []
+
+    log.append('{"n": 1}\n{"n": 2}\n')
+    with path.open('a') as log_file:
+        log_file.write('{"n": 3, "cut')
+    assert [entry['n'] for entry in log.entries()] == [1, 2]
@@ -0,0 +1,105 @@
+"""
+Pagination tests
+
+Cursors are bound to the query they page through, following next_cursor
+from page to page returns exactly the unpaginated rows, and the top-k
+evaluation of ORDER BY + LIMIT returns the rows of a full sort.
+"""
+
+import base64
+import json
+import pytest
+from rdflib import Graph, Literal, Namespace
+from rdflib.plugins.sparql import CUSTOM_EVALS
+import query_evaluation
+from benchmarks import dataset_path
+from sparql_generator import SPARQLGenerator
+
+EX = Namespace('http://example.org/')
+
+
+@pytest.fixture(scope='module')
+def graph():
+    graph = Graph()
+    graph.parse(dataset_path(), format='xml')
+    return graph
+
+
+def rows(graph, query):
+    return [tuple(row) for row in graph.query(str(query))]
+
+
+@pytest.mark.parametrize('frame', [
+    {'classes': ['Customer']},
+    {'classes': ['Transaction']},
+    {'classes': ['Bank']},
+])
+def test_pages_follow_on(graph, frame):
+    expected = rows(graph, SPARQLGenerator(page_size=0, algebra=False).generate(frame))
+    generator = SPARQLGenerator(page_size=3, algebra=False)
+
+    collected, cursor, pages = [], None, 0
+    while True:
+        query = generator.generate(frame, cursor)
+        page = rows(graph, query)
+        collected += page
+        pages += 1
+        cursor = generator.next_cursor(str(query), len(page))
+        if cursor is None:
+            break
+
+    assert len(expected) > 3
+    assert pages == len(expected) // 3 + 1
+    assert collected == expected
+
+
+def test_cursor_is_bound_to_its_query():
+    generator = SPARQLGenerator(page_size=3, algebra=False)
+    customers = generator.generate({'classes': ['Customer']})
+    cursor = generator.next_cursor(str(customers), 3)
+    assert 'OFFSET 3' in str(generator.generate({'classes': ['Customer']}, cursor))
+
+    with pytest.raises(ValueError, match="different query"):
+        generator.generate({'classes': ['Bank']}, cursor)
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', 'e30', base64.urlsafe_b64encode(
+    json.dumps({'q': 'x', 'o': 'many'}).encode()).decode()])
+def test_malformed_cursor_is_rejected(cursor):
+    generator = SPARQLGenerator(page_size=3, algebra=False)
+    with pytest.raises(ValueError):
+        generator.generate({'classes': ['Customer']}, cursor)
+
+
+def test_tampered_offset_is_rejected():
+    generator = SPARQLGenerator(page_size=3, algebra=False)
+    query = generator.generate({'classes': ['Customer']})
+    cursor = generator.next_cursor(str(query), 3)
+    payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    # Re-pointing a cursor at another query's pages needs that query's hash
+    payload['q'] = payload['q'][::-1]
+    forged = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+    with pytest.raises(ValueError):
+        generator.generate({'classes': ['Customer']}, forged)
+
+
+@pytest.mark.parametrize('order', ['?v', 'DESC(?v)', 'DESC(?v) ?s', '?g DESC(?v)'])
+def test_top_k_matches_full_sort(monkeypatch, order):
+    graph = Graph()
+    for i in range(40):
+        # Few distinct values, so ties decide most positions
+        graph.add((EX[f's{i:02d}'], EX.v, Literal(i % 7)))
+        graph.add((EX[f's{i:02d}'], EX.g, Literal(i % 3)))
+    base = f"SELECT ?s ?v WHERE {{ ?s <{EX.v}> ?v ; <{EX.g}> ?g }} ORDER BY {order}"
+
+    calls = []
+    monkeypatch.setitem(CUSTOM_EVALS, 'cccm_top_k',
+                        lambda ctx, part: calls.append(part.name) or
+                        query_evaluation.evaluate_top_k(ctx, part))
+    pages = [rows(graph, f"{base} LIMIT 6 OFFSET {offset}") for offset in range(0, 42, 6)]
+    assert 'Slice' in calls
+
+    monkeypatch.delitem(CUSTOM_EVALS, 'cccm_top_k')
+    full = rows(graph, base)
+    assert [row for page in pages for row in page] == full
+    assert pages[0] == rows(graph, f"{base} LIMIT 6")
@@ -9,6 +9,39 @@ from nlp_processor import NLPProcessor
 from sparql_generator import SPARQLGenerator
 import json
 
+# Test queries (also timed by benchmarks.suite)
+TEST_QUERIES = [
+    # Customer queries
+    "List all customers",
+    "Show customers in India",
+    "List customers living in UK",
+    "Show customers based in USA",
+    
+    # Institution queries
+    "List all banks",
+    "Show institutions in India",
+    "List all fintechs",
+    
+    # Transaction queries
+    "List all transactions",
+    "Show all remittances",
+    "List customers who initiated transactions",
+    "Show customers who initiated remittances",
+    "List transactions and their processing institutions",
+    
+    # Status queries
+    "Show completed transactions",
+    "List failed transactions",
+    
+    # Aggregation queries
+    "Count customers",
+    "Show customers with total number of accounts",
+    "List customers with their accounts",
+    
+    # Complex queries
+    "List institutions based in India",
+]
+
 def test_query(query: str, processor: NLPProcessor, generator: SPARQLGenerator):
     """Test a single query"""
     print(f"\n{'='*80}")
@@ -48,38 +81,7 @@ def main():
     print("Initializing SPARQL Generator...")
     generator = SPARQLGenerator()
     
-    # Test queries
-    test_queries = [
-        # Customer queries
-        "List all customers",
-        "Show customers in India",
-        "List customers living in UK",
-        "Show customers based in USA",
-        
-        # Institution queries
-        "List all banks",
-        "Show institutions in India",
-        "List all fintechs",
-        
-        # Transaction queries
-        "List all transactions",
-        "Show all remittances",
-        "List customers who initiated transactions",
-        "Show customers who initiated remittances",
-        "List transactions and their processing institutions",
-        
-        # Status queries
-        "Show completed transactions",
-        "List failed transactions",
-        
-        # Aggregation queries
-        "Count customers",
-        "Show customers with total number of accounts",
-        "List customers with their accounts",
-        
-        # Complex queries
-        "List institutions based in India",
-    ]
+    test_queries = TEST_QUERIES
     
     print(f"\nTesting {len(test_queries)} queries...\n")
     
@@ -0,0 +1,60 @@
+"""
+Result cache tests
+
+Entries are keyed by semantic fingerprint and dropped when the dataset's
+data version changes, when they outlive the TTL or when the cache is
+full.
+"""
+
+from rdflib import Literal, URIRef
+import query_cache
+from query_cache import PipelineCache, semantic_fingerprint
+from rdf_query_executor import RDFQueryExecutor
+
+CCCM = 'http://www.semanticweb.org/cccm#'
+
+
+def test_fingerprint_ignores_property_order_and_view_fields():
+    first = {'classes': ['Customer'], 'properties': ['fullName', 'basedIn'],
+             'tokens': ['show', 'customers']}
+    second = {'classes': ['Customer'], 'properties': ['basedIn', 'fullName'],
+              'tokens': ['list', 'customers']}
+    assert semantic_fingerprint(first) == semantic_fingerprint(second)
+    assert semantic_fingerprint(first) != semantic_fingerprint(dict(first, classes=['Bank']))
+
+
+def test_data_version_change_invalidates(tmp_path):
+    path = tmp_path / 'data.ttl'
+    path.write_text(f'<{CCCM}c1> <{CCCM}fullName> "Asha" .\n')
+    executor = RDFQueryExecutor(str(path))
+    cache = PipelineCache(max_entries=8, ttl=60, enabled=True)
+
+    cache.put('key', 'rows', executor.data_version)
+    assert cache.get('key', executor.data_version) == 'rows'
+
+    executor.update(added=[(URIRef(CCCM + 'c2'), URIRef(CCCM + 'fullName'), Literal('Ravi'))])
+    assert executor.data_version == 1
+    assert cache.get('key', executor.data_version) is None
+    assert cache.get_stats()['invalidations'] == 1
+
+    # Entries computed against the new version are served again
+    cache.put('key', 'new rows', executor.data_version)
+    assert cache.get('key', executor.data_version) == 'new rows'
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_cache.time, 'monotonic', lambda: now[0])
+    cache = PipelineCache(max_entries=2, ttl=10, enabled=True)
+
+    cache.put('a', 1, 0)
+    cache.put('b', 2, 0)
+    assert cache.get('a', 0) == 1
+    cache.put('c', 3, 0)
+    # 'b' was least recently used
+    assert cache.get('b', 0) is None
+    assert cache.get_stats()['evictions'] == 1
+
+    now[0] += 11
+    assert cache.get('a', 0) is None
+    assert cache.get('c', 0) is None
@@ -0,0 +1,129 @@
+"""
+Single-flight tests
+
+Concurrent calls with the same key share one evaluation and its result
+or exception; nothing is remembered once the call finishes.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from single_flight import AsyncSingleFlight, SingleFlight
+
+WORKERS = 8
+
+
+def run_concurrently(flights, key, func):
+    """Start WORKERS threads calling flights.do(key, func) at once"""
+    outcomes = [None] * WORKERS
+    barrier = threading.Barrier(WORKERS)
+
+    def worker(index):
+        barrier.wait()
+        try:
+            outcomes[index] = flights.do(key, func)
+        except Exception as error:
+            outcomes[index] = error
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(WORKERS)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def wait_for_callers(flights, timeout=5.0):
+    """Wait until every worker is evaluating or waiting for the call"""
+    deadline = time.monotonic() + timeout
+    while flights.get_stats()['calls'] < WORKERS:
+        assert time.monotonic() < deadline, "workers did not reach the call"
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_evaluation():
+    flights = SingleFlight()
+    release = threading.Event()
+    evaluations = []
+
+    def evaluate():
+        evaluations.append(1)
+        release.wait(5)
+        return 'rows'
+
+    threads, outcomes = run_concurrently(flights, 'q', evaluate)
+    wait_for_callers(flights)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(evaluations) == 1
+    assert sorted(shared for _, shared in outcomes) == [False] + [True] * (WORKERS - 1)
+    assert all(result == 'rows' for result, _ in outcomes)
+    stats = flights.get_stats()
+    assert stats['evaluations'] == 1 and stats['saved'] == WORKERS - 1
+    assert stats['in_flight'] == 0
+
+
+def test_exception_reaches_every_caller_and_is_not_kept():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError("evaluation failed")
+
+    threads, outcomes = run_concurrently(flights, 'q', fail)
+    wait_for_callers(flights)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert flights.get_stats()['errors'] == 1
+    # The failure is not remembered: the next call evaluates again
+    assert flights.do('q', lambda: 'retry') == ('retry', False)
+
+
+def test_different_keys_do_not_share():
+    flights = SingleFlight()
+    assert flights.do('a', lambda: 1) == (1, False)
+    assert flights.do('b', lambda: 2) == (2, False)
+    assert flights.get_stats()['saved'] == 0
+
+
+def test_async_calls_share_one_task():
+    async def main():
+        flights = AsyncSingleFlight()
+        evaluations = []
+
+        async def evaluate():
+            evaluations.append(1)
+            await asyncio.sleep(0.01)
+            return 'rows'
+
+        results = await asyncio.gather(*(flights.do('q', evaluate) for _ in range(WORKERS)))
+        return evaluations, results, flights.get_stats()
+
+    evaluations, results, stats = asyncio.run(main())
+    assert len(evaluations) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert stats['in_flight'] == 0
+
+
+def test_async_cancelled_caller_does_not_cancel_the_others():
+    async def main():
+        flights = AsyncSingleFlight()
+
+        async def evaluate():
+            await asyncio.sleep(0.02)
+            return 'rows'
+
+        first = asyncio.ensure_future(flights.do('q', evaluate))
+        second = asyncio.ensure_future(flights.do('q', evaluate))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == ('rows', True)
@@ -0,0 +1,161 @@
+"""
+Template registry dispatch tests
+
+The registry must pick the template the if/elif dispatch of
+SPARQLGenerator picked before templates were registered. The reference
+below restates that dispatch with template names.
+"""
+
+import itertools
+import random
+import pytest
+from sparql_generator import DEFAULT_LABELS, SPARQLGenerator
+from template_registry import TemplateRegistry, normalize_frame
+
+SPECIAL_PATTERNS = [None, 'HAVING_MULTIPLE', 'CROSS_BORDER', 'COMPARISON', 'FULL_CHAIN',
+                    'BOTH_TYPES', 'FOREIGN', 'LOSS_FILTER', 'TOP', 'UNKNOWN']
+CLASSES = ['Customer', 'Transaction', 'Remittance', 'Bank', 'FinTech', 'Institution',
+           'Account', 'Currency', 'Rate', 'Country', 'Loan']
+PROPERTIES = [[], ['processedBy'], ['processed'], ['initiatedBy'], ['initiated'],
+              ['fullName'], ['serve'], ['hasAccount'], ['exchange'], ['basedIn']]
+FILTERS = [{}, {'basedIn': 'India'}, {'status': 'Completed'}, {'fromCurrency': 'USD'},
+           {'toCurrency': 'INR'}, {'basedIn': 'India', 'status': 'Pending'}]
+AGGREGATIONS = [None, {'type': 'COUNT', 'variable': '?item'}]
+COMPARISONS = [None, {'operator': '>', 'value': 100.0}, {'percentage': 5},
+               {'type': 'LOSS_PERCENTAGE', 'percentage': 5}]
+INSTITUTIONS = [None, 'HDFC']
+
+
+def baseline_template(frame):
+    """Template name the pre-registry if/elif dispatch chose"""
+    pattern = frame['special_pattern']
+    classes, properties = frame['classes'], frame['properties']
+    filters, comparison = frame['filters'], frame['comparison']
+
+    special = {'HAVING_MULTIPLE': 'multiple_accounts', 'CROSS_BORDER': 'cross_border',
+               'COMPARISON': 'institution_comparison', 'FULL_CHAIN': 'full_chain',
+               'BOTH_TYPES': 'both_institution_types', 'FOREIGN': 'foreign_accounts'}
+    if pattern in special:
+        return special[pattern]
+    if pattern == 'LOSS_FILTER' or (comparison and comparison.get('type') == 'LOSS_PERCENTAGE'):
+        return 'loss_filter'
+    if pattern == 'TOP':
+        if 'Customer' in classes and 'Transaction' in classes:
+            return 'top_customer_by_amount'
+        if 'FinTech' in classes and 'Remittance' in classes:
+            return 'top_fintech_by_remittances'
+        if 'Rate' in classes or 'exchange' in properties:
+            return 'top_exchange_rates'
+        return 'top_aggregate'
+
+    if frame['specific_institution']:
+        return 'specific_institution'
+    if comparison and 'value' in comparison:
+        return 'remittances_by_amount' if 'Remittance' in classes else 'transactions_by_amount'
+
+    if frame['aggregation']:
+        if 'Bank' in classes and 'Customer' in classes and 'serve' in properties:
+            return 'customers_per_bank'
+        if 'Account' in classes or 'hasAccount' in properties:
+            return 'accounts_per_customer'
+        if 'Currency' in classes and 'Transaction' in classes:
+            return 'transactions_per_currency'
+        if 'Customer' in classes and 'Transaction' not in classes:
+            return 'customer_count'
+        if 'Transaction' in classes:
+            return 'transaction_count'
+        return 'item_count'
+
+    if 'Transaction' in classes or 'Remittance' in classes:
+        if 'Remittance' in classes and 'FinTech' in classes and 'processedBy' in properties:
+            return 'remittances_by_fintech'
+        if 'initiatedBy' in properties or 'initiated' in properties or 'fullName' in properties:
+            return 'remittance_initiators' if 'Remittance' in classes else 'transaction_initiators'
+        if 'processedBy' in properties or 'processed' in properties:
+            return 'processing_institutions'
+        if 'status' in filters:
+            return 'transactions_by_status'
+        if 'fromCurrency' in filters or 'toCurrency' in filters:
+            return 'transactions_by_currency'
+        return 'list_remittances' if 'Remittance' in classes else 'list_transactions'
+    if 'Customer' in classes:
+        if 'basedIn' in filters and 'Currency' in classes and 'Transaction' in classes:
+            return 'customer_currency_pairs'
+        return 'list_customers'
+    if 'Bank' in classes or 'FinTech' in classes or 'Institution' in classes:
+        return 'list_institutions'
+    if 'Account' in classes:
+        return 'list_accounts'
+    if not classes:
+        return 'default_customers'
+    return 'default_labels' if classes[0] in DEFAULT_LABELS else 'default_instances'
+
+
+def class_lists():
+    lists = [[]]
+    for size in (1, 2, 3):
+        for combination in itertools.combinations(CLASSES, size):
+            lists.append(list(combination))
+            lists.append(list(reversed(combination)))
+    return lists
+
+
+def sample_frames(count=20000, seed=0):
+    rng = random.Random(seed)
+    classes = class_lists()
+    for _ in range(count):
+        yield normalize_frame({
+            'special_pattern': rng.choice(SPECIAL_PATTERNS),
+            'classes': rng.choice(classes),
+            'properties': rng.choice(PROPERTIES),
+            'filters': rng.choice(FILTERS),
+            'aggregation': rng.choice(AGGREGATIONS),
+            'comparison': rng.choice(COMPARISONS),
+            'specific_institution': rng.choice(INSTITUTIONS),
+        })
+
+
+def test_dispatch_matches_baseline():
+    generator = SPARQLGenerator(page_size=0, algebra=False)
+    mismatches = []
+    for frame in sample_frames():
+        expected = baseline_template(frame)
+        selected = generator.registry.select(frame).name
+        if selected != expected:
+            mismatches.append((frame, expected, selected))
+    assert not mismatches, f"{len(mismatches)} frames dispatched differently, e.g. {mismatches[:3]}"
+
+
+def test_every_listing_class_frame_renders():
+    generator = SPARQLGenerator(page_size=0, algebra=False)
+    for classes in class_lists():
+        assert 'SELECT' in str(generator.generate({'classes': classes}))
+
+
+def test_priority_and_registration_order():
+    registry = TemplateRegistry()
+
+    @registry.template('general', priority=1, classes=('Customer',))
+    def general(generator):
+        return 'general'
+
+    @registry.template('first', priority=5, classes=('Customer',))
+    def first(generator):
+        return 'first'
+
+    @registry.template('second', priority=5, classes=('Customer',))
+    def second(generator):
+        return 'second'
+
+    @registry.template('fallback', priority=0)
+    def fallback(generator):
+        return 'fallback'
+
+    frame = normalize_frame({'classes': ['Customer']})
+    assert [t.name for t in registry.candidates(frame)] == ['first', 'second', 'general', 'fallback']
+    assert registry.select(normalize_frame({'classes': ['Bank']})).name == 'fallback'
+
+    registry.unregister('first')
+    assert registry.select(frame).name == 'second'
+    with pytest.raises(ValueError):
+        registry.template('second', classes=('Customer',))(second)
@@ -0,0 +1,67 @@
+"""
+Vocabulary hot reload tests
+
+Reloads read config.py into a private namespace: valid custom mappings
+are installed as a new vocabulary version, invalid ones are rejected and
+the current vocabulary is kept.
+"""
+
+import importlib.util
+import sys
+import pytest
+import spacy
+from vocabulary import VocabularyStore
+
+CONFIG = '''
+NLP_CONFIG = {'fuzzy_max_edit_distance': 1, 'fuzzy_min_word_length': 5}
+RDF_DATASET = {'namespace': 'http://www.semanticweb.org/cccm#'}
+CUSTOM_CLASS_MAPPINGS = %s
+CUSTOM_PROPERTY_MAPPINGS = {}
+'''
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / 'test_config.py'
+    path.write_text(CONFIG % "{'client': 'Customer'}")
+    spec = importlib.util.spec_from_file_location('test_config', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return path, module
+
+
+@pytest.fixture
+def store(config_file):
+    return VocabularyStore(spacy.blank('en'), config_file[1], reload_interval=0)
+
+
+def test_reload_installs_new_mappings(config_file, store):
+    path, module = config_file
+    config_module = sys.modules.get('config')
+    path.write_text(CONFIG % "{'client': 'Customer', 'lender': 'Bank'}")
+
+    assert store.reload()
+    assert store.current.version == 2
+    assert store.current.tables['class']['lender'] == 'Bank'
+    assert store.reload_error is None
+    # The module and sys.modules are left alone
+    assert not hasattr(module, 'lender') and module.CUSTOM_CLASS_MAPPINGS == {'client': 'Customer'}
+    assert sys.modules.get('config') is config_module
+
+
+@pytest.mark.parametrize('mapping', [
+    "['client']",
+    "{'client': 42}",
+    "{'': 'Customer'}",
+    "{'client': 'Customer',",
+])
+def test_reload_rejects_invalid_mappings(config_file, store, mapping):
+    path, _ = config_file
+    current = store.current
+    path.write_text(CONFIG % mapping)
+
+    assert not store.reload()
+    assert store.current is current
+    assert store.current.tables['class']['client'] == 'Customer'
+    assert store.reload_error
+    assert store.get_stats()['failed_reloads'] == 1
@@ -0,0 +1,571 @@
+"""
+Vocabulary Module
+
+This module holds the built-in NLP vocabularies, merges them with the
+custom mappings from config.py and compiles the result into immutable
+lookup structures (keyword matcher, lemma table, fuzzy index).
+
+A VocabularyStore keeps the current compiled Vocabulary and swaps in a
+new one when config.py changes, without reloading spaCy or the graph.
+"""
+
+import os
+import runpy
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Any, Optional, Set, Tuple
+from rdflib import RDF, RDFS, OWL, URIRef
+from keyword_matcher import KeywordMatcher
+from fuzzy_index import FuzzyIndex
+import config
+
+# RDF Class mappings (keywords -> RDF classes)
+CLASS_MAPPINGS = {
+    'customer': 'Customer',
+    'customers': 'Customer',
+    'people': 'Customer',
+    'person': 'Customer',
+    'user': 'Customer',
+    'users': 'Customer',
+
+    'transaction': 'Transaction',
+    'transactions': 'Transaction',
+    'txn': 'Transaction',
+    'txns': 'Transaction',
+    'transfer': 'Transaction',
+    'transfers': 'Transaction',
+
+    'remittance': 'Remittance',
+    'remittances': 'Remittance',
+    'remit': 'Remittance',
+
+    'account': 'Account',
+    'accounts': 'Account',
+    'acc': 'Account',
+
+    'bank': 'Bank',
+    'banks': 'Bank',
+
+    'fintech': 'FinTech',
+    'fintechs': 'FinTech',
+
+    'institution': 'Institution',
+    'institutions': 'Institution',
+
+    'currency': 'Currency',
+    'currencies': 'Currency',
+
+    'country': 'Country',
+    'countries': 'Country',
+
+    'rate': 'Rate',
+    'rates': 'Rate',
+    'exchange': 'Rate',
+
+    'status': 'Status',
+}
+
+# RDF Property mappings (keywords -> RDF properties)
+PROPERTY_MAPPINGS = {
+    'name': 'fullName',
+    'names': 'fullName',
+    'fullname': 'fullName',
+    'full': 'fullName',
+
+    'country': 'basedIn',
+    'location': 'basedIn',
+    'based': 'basedIn',
+    'living': 'basedIn',
+    'live': 'basedIn',
+    'from': 'basedIn',
+
+    'amount': 'amountSent',
+    'sent': 'amountSent',
+    'send': 'amountSent',
+
+    'received': 'amountReceived',
+    'receive': 'amountReceived',
+
+    'initiated': 'initiatedBy',
+    'initiate': 'initiatedBy',
+    'sender': 'initiatedBy',
+
+    'processed': 'processedBy',
+    'process': 'processedBy',
+    'processor': 'processedBy',
+
+    'account': 'hasAccount',
+    'accounts': 'hasAccount',
+
+    'balance': 'balance',
+
+    'status': 'hasStatus',
+    'state': 'hasStatus',
+
+    'bankname': 'bankName',
+
+    'currency': 'fromCurrency',
+    'fromcurrency': 'fromCurrency',
+    'tocurrency': 'toCurrency',
+
+    'rate': 'appliedRate',
+}
+
+# Country mappings
+COUNTRIES = {
+    'india': 'India',
+    'indian': 'India',
+    'uk': 'UK',
+    'britain': 'UK',
+    'england': 'UK',
+    'usa': 'USA',
+    'america': 'USA',
+    'us': 'USA',
+    'united states': 'USA',
+}
+
+# Currency mappings (ISO codes)
+CURRENCIES = {
+    'usd': 'USD',
+    'inr': 'INR',
+    'gbp': 'GBP',
+    'eur': 'EUR',
+    'jpy': 'JPY',
+    'aud': 'AUD',
+}
+
+# Institution mappings (keywords -> institution resources)
+INSTITUTIONS = {
+    'icici': 'ICICI_Bank',
+    'hdfc': 'HDFC',
+    'axis': 'Axis_Bank',
+    'kotak': 'Kotak_Bank',
+    'wise': 'Wise',
+    'paytm': 'Paytm',
+    'phonepe': 'PhonePe',
+    'razorpay': 'Razorpay',
+    'barclays': 'Barclays',
+    'chase': 'Chase',
+}
+
+# Status mappings
+STATUSES = {
+    'completed': 'Completed',
+    'complete': 'Completed',
+    'success': 'Completed',
+    'successful': 'Completed',
+    'pending': 'Pending',
+    'failed': 'Failed',
+    'failure': 'Failed',
+    'fail': 'Failed',
+}
+
+# Intent keywords
+INTENT_KEYWORDS = {
+    'list': 'list',
+    'show': 'list',
+    'display': 'list',
+    'get': 'list',
+    'retrieve': 'list',
+    'find': 'list',
+    'fetch': 'list',
+
+    'count': 'count',
+    'number': 'count',
+    'total': 'count',
+    'how many': 'count',
+
+    'filter': 'filter',
+    'where': 'filter',
+    'with': 'filter',
+}
+
+# Aggregation keywords
+AGGREGATION_KEYWORDS = {
+    'count': 'COUNT',
+    'total': 'COUNT',
+    'number': 'COUNT',
+    'sum': 'SUM',
+    'average': 'AVG',
+    'avg': 'AVG',
+    'minimum': 'MIN',
+    'min': 'MIN',
+    'maximum': 'MAX',
+    'max': 'MAX',
+    'highest': 'MAX',
+    'lowest': 'MIN',
+}
+
+# Comparison keywords
+COMPARISON_KEYWORDS = {
+    'greater': '>',
+    'more': '>',
+    'over': '>',
+    'above': '>',
+    'less': '<',
+    'under': '<',
+    'below': '<',
+    'equal': '=',
+    'equals': '=',
+}
+
+# Special query patterns
+SPECIAL_PATTERNS = {
+    'multiple': 'HAVING_MULTIPLE',
+    'both': 'BOTH_TYPES',
+    'cross-border': 'CROSS_BORDER',
+    'international': 'CROSS_BORDER',
+    'foreign': 'FOREIGN',
+    'highest': 'TOP',
+    'top': 'TOP',
+    'most': 'TOP',
+    'trail': 'FULL_CHAIN',
+    'chain': 'FULL_CHAIN',
+    'compare': 'COMPARISON',
+    'versus': 'COMPARISON',
+    'vs': 'COMPARISON',
+}
+
+# Phrase-level pattern cues, consulted only when no special
+# pattern keyword matched
+PATTERN_PHRASES = {
+    'cross border': 'CROSS_BORDER',
+    'currency conversion': 'CROSS_BORDER',
+    'comparison': 'COMPARISON',
+    'linked': 'FULL_CHAIN',
+    'different country': 'FOREIGN',
+    'lost': 'LOSS_FILTER',
+    'loss': 'LOSS_FILTER',
+}
+
+# Ordering keywords
+ORDER_KEYWORDS = {
+    'order': 'ORDER',
+    'sort': 'ORDER',
+    'arrange': 'ORDER',
+}
+DIRECTION_KEYWORDS = {
+    'ascending': 'ASC',
+    'asc': 'ASC',
+    'descending': 'DESC',
+    'desc': 'DESC',
+}
+
+
+# Matcher kind -> built-in table
+BUILTIN_VOCABULARIES = {
+    'intent': INTENT_KEYWORDS,
+    'class': CLASS_MAPPINGS,
+    'property': PROPERTY_MAPPINGS,
+    'country': COUNTRIES,
+    'currency': CURRENCIES,
+    'institution': INSTITUTIONS,
+    'status': STATUSES,
+    'aggregation': AGGREGATION_KEYWORDS,
+    'comparison': COMPARISON_KEYWORDS,
+    'pattern': SPECIAL_PATTERNS,
+    'pattern_phrase': PATTERN_PHRASES,
+    'order': ORDER_KEYWORDS,
+    'direction': DIRECTION_KEYWORDS,
+}
+
+# Matcher kind -> config.py attribute holding user additions
+CUSTOM_VOCABULARIES = {
+    'class': 'CUSTOM_CLASS_MAPPINGS',
+    'property': 'CUSTOM_PROPERTY_MAPPINGS',
+    'country': 'CUSTOM_COUNTRY_MAPPINGS',
+}
+
+
+class GraphSchema:
+    """
+    Classes, properties and countries that exist in the RDF graph,
+    used to check mapping targets
+    """
+
+    def __init__(self, classes: Set[str], properties: Set[str],
+                 countries: Set[str]):
+        self.classes = frozenset(classes)
+        self.properties = frozenset(properties)
+        self.countries = frozenset(countries)
+
+    @classmethod
+    def from_graph(cls, graph, namespace: str) -> 'GraphSchema':
+        """
+        Collect the schema from a graph
+
+        Args:
+            graph: rdflib Graph
+            namespace: Namespace of the dataset's terms
+
+        Returns:
+            GraphSchema with local names of declared or used terms
+        """
+        def local(term) -> Optional[str]:
+            term = str(term)
+            return term[len(namespace):] if term.startswith(namespace) else None
+
+        classes = set()
+        for cls_term in graph.objects(None, RDF.type):
+            classes.add(local(cls_term))
+        for class_type in (OWL.Class, RDFS.Class):
+            for cls_term in graph.subjects(RDF.type, class_type):
+                classes.add(local(cls_term))
+        for sub, sup in graph.subject_objects(RDFS.subClassOf):
+            classes.update((local(sub), local(sup)))
+
+        properties = {local(p) for p in graph.predicates()}
+        for property_type in (OWL.ObjectProperty, OWL.DatatypeProperty, RDF.Property):
+            for prop in graph.subjects(RDF.type, property_type):
+                properties.add(local(prop))
+
+        countries = {local(c) for c in graph.subjects(RDF.type, URIRef(namespace + 'Country'))}
+
+        return cls(classes - {None}, properties - {None}, countries - {None})
+
+    def check(self, kind: str, value: str) -> bool:
+        """Check that a mapping target of the given kind exists"""
+        if kind == 'class':
+            return value in self.classes
+        if kind == 'property':
+            return value in self.properties
+        if kind == 'country':
+            return value in self.countries
+        return True
+
+
+class Vocabulary:
+    """
+    Immutable, compiled vocabulary
+
+    Tables are read-only views; the matcher, lemma table and fuzzy index
+    are built once here and never modified afterwards.
+    """
+
+    def __init__(self, tables: Dict[str, Dict[str, Any]], nlp,
+                 fuzzy_max_distance: int = 1, fuzzy_min_length: int = 5,
+                 version: int = 1, previous: 'Vocabulary' = None):
+        """
+        Compile vocabulary tables
+
+        Args:
+            tables: Matcher kind -> {keyword: value}
+            nlp: Loaded spaCy pipeline, used to build the lemma table
+            fuzzy_max_distance: Edit distance for typo correction
+            fuzzy_min_length: Shortest word typo correction applies to
+            version: Monotonic version number of this vocabulary
+            previous: Earlier vocabulary whose lemma entries can be reused
+        """
+        self.version = version
+        self.tables = MappingProxyType({
+            kind: MappingProxyType(dict(table)) for kind, table in tables.items()
+        })
+
+        matcher = KeywordMatcher()
+        for kind, table in self.tables.items():
+            matcher.add_mapping(kind, table)
+        self.matcher = matcher
+
+        self.lemma_table = MappingProxyType(self._compile_lemma_table(nlp, previous))
+
+        self.fuzzy_index = FuzzyIndex(fuzzy_max_distance, fuzzy_min_length)
+        self.fuzzy_index.add_all(word for word in matcher.words() if word.isalpha())
+
+    def _compile_lemma_table(self, nlp,
+                             previous: 'Vocabulary') -> Dict[str, Tuple[str, str]]:
+        """
+        Precompute lemma and POS for every word the fast path accepts
+
+        Covers all vocabulary words plus spaCy's stopwords. Tags are
+        taken from each word in isolation, so they are context-free.
+        """
+        words = set(self.matcher.words()) | set(nlp.Defaults.stop_words)
+        words = sorted(word for word in words if word.isalpha() and word.islower())
+
+        table = {}
+        if previous is not None:
+            table.update((word, previous.lemma_table[word]) for word in words
+                         if word in previous.lemma_table)
+        missing = [word for word in words if word not in table]
+        for doc in nlp.pipe(missing):
+            if len(doc) == 1:
+                table[doc[0].text] = (doc[0].lemma_, doc[0].pos_)
+        return table
+
+
+class VocabularyStore:
+    """
+    Holder of the current Vocabulary with hot reload from config.py
+
+    Readers take ``store.current`` once per query; a reload builds a
+    complete new Vocabulary and replaces the reference in one assignment,
+    so a query never sees a half-updated vocabulary.
+    """
+
+    def __init__(self, nlp, config_module=config, reload_interval: float = None):
+        """
+        Build the initial vocabulary
+
+        Args:
+            nlp: Loaded spaCy pipeline (reused across reloads)
+            config_module: Module providing the CUSTOM_* mappings
+            reload_interval: Seconds between config.py change checks
+                (defaults to NLP_CONFIG['vocabulary_reload_interval'],
+                0 disables automatic reloads)
+        """
+        self.nlp = nlp
+        self._config = config_module
+        # Custom mappings as last read; reloads replace them, never the module
+        self._mappings = self._custom_mappings(vars(config_module))
+        self.reload_error: Optional[str] = None
+        self._reloads = {'ok': 0, 'failed': 0}
+        if reload_interval is None:
+            reload_interval = config_module.NLP_CONFIG.get('vocabulary_reload_interval', 0)
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self.schema = None
+        self.warnings: List[str] = []
+        self._config_mtime = self._config_stat()
+        self._last_check = time.monotonic()
+        self.current = self._build(self._mappings)
+
+    def maybe_reload(self) -> bool:
+        """
+        Reload the vocabulary if config.py changed since the last check
+
+        Cheap enough to call on every query: the file is only stat'ed
+        once per reload interval.
+
+        Returns:
+            True if a new vocabulary was installed
+        """
+        if self.reload_interval <= 0:
+            return False
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return False
+        self._last_check = now
+        if self._config_stat() == self._config_mtime:
+            return False
+        return self.reload()
+
+    def reload(self) -> bool:
+        """
+        Re-read the custom mappings from config.py and install a freshly
+        compiled vocabulary
+
+        The file is executed in a private namespace: the imported config
+        module, and every other setting in it, stay as they were.
+
+        Returns:
+            True on success; on error the current vocabulary is kept and
+            the message is left in reload_error
+        """
+        with self._lock:
+            try:
+                path = getattr(self._config, '__file__', None)
+                if not path:
+                    raise ValueError("config module has no file to re-read")
+                mappings = self._custom_mappings(runpy.run_path(path))
+                vocabulary = self._build(mappings, self.current)
+            except Exception as e:
+                self.reload_error = str(e)
+                self._reloads['failed'] += 1
+                # Retried only once config.py changes again
+                self._config_mtime = self._config_stat()
+                return False
+            self._config_mtime = self._config_stat()
+            self._mappings = mappings
+            self.current = vocabulary
+            self.reload_error = None
+            self._reloads['ok'] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get reload statistics
+
+        Returns:
+            Dictionary with version, reloads, failed_reloads and
+            reload_error (message of the last reload if it failed)
+        """
+        with self._lock:
+            return {'version': self.current.version, 'reloads': self._reloads['ok'],
+                    'failed_reloads': self._reloads['failed'],
+                    'reload_error': self.reload_error}
+
+    def validate(self, graph, namespace: str = None) -> List[str]:
+        """
+        Check mapping targets against a graph and recompile
+
+        Custom mappings whose target does not exist in the graph are
+        dropped; unknown built-in targets are only reported.
+
+        Args:
+            graph: rdflib Graph the queries run against
+            namespace: Namespace of the dataset's terms
+
+        Returns:
+            List of warning messages
+        """
+        namespace = namespace or self._config.RDF_DATASET['namespace']
+        with self._lock:
+            self.schema = GraphSchema.from_graph(graph, namespace)
+            self.current = self._build(self._mappings, self.current)
+        for warning in self.warnings:
+            print(f"Vocabulary warning: {warning}")
+        return self.warnings
+
+    def _build(self, mappings: Dict[str, Dict[str, str]],
+               previous: Vocabulary = None) -> Vocabulary:
+        """Merge built-in and custom tables and compile them"""
+        tables = {kind: dict(table) for kind, table in BUILTIN_VOCABULARIES.items()}
+        warnings = []
+
+        if self.schema is not None:
+            for kind, table in tables.items():
+                for key, value in table.items():
+                    if not self.schema.check(kind, value):
+                        warnings.append(f"built-in {kind} mapping '{key}' -> "
+                                        f"'{value}' not found in graph")
+
+        for kind, attribute in CUSTOM_VOCABULARIES.items():
+            for key, value in mappings[attribute].items():
+                if self.schema is not None and not self.schema.check(kind, value):
+                    warnings.append(f"{attribute} entry '{key}' -> '{value}' "
+                                    f"not found in graph (ignored)")
+                    continue
+                tables[kind][key.lower()] = value
+
+        self.warnings = warnings
+        nlp_config = self._config.NLP_CONFIG
+        version = previous.version + 1 if previous is not None else 1
+        return Vocabulary(tables, self.nlp,
+                          nlp_config.get('fuzzy_max_edit_distance', 1),
+                          nlp_config.get('fuzzy_min_word_length', 5),
+                          version, previous)
+
+    @staticmethod
+    def _custom_mappings(namespace: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+        """CUSTOM_* mappings of a config namespace (missing ones empty)"""
+        mappings = {}
+        for attribute in CUSTOM_VOCABULARIES.values():
+            mapping = namespace.get(attribute) or {}
+            if not isinstance(mapping, dict):
+                raise ValueError(f"{attribute} must be a dictionary")
+            for key, value in mapping.items():
+                if not (isinstance(key, str) and key.strip() and isinstance(value, str) and value):
+                    raise ValueError(f"{attribute} entry {key!r} -> {value!r} must map "
+                                     f"a keyword to a name")
+            mappings[attribute] = dict(mapping)
+        return mappings
+
+    def _config_stat(self) -> Optional[float]:
+        """Modification time of config.py, or None if it has no file"""
+        path = getattr(self._config, '__file__', None)
+        try:
+            return os.stat(path).st_mtime if path else None
+        except OSError:
+            return None
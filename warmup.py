@@ -0,0 +1,156 @@
+"""
+Warm-up Module
+
+This module runs the example queries and the most asked questions from
+the query log through the pipeline in a background thread at startup,
+so the first users after a deploy do not pay for cold spaCy lookups,
+query parsing and evaluation: spaCy's vocabulary, the prepared-algebra
+cache and the result cache are filled before they ask. The app and the
+API keep serving while it runs; status() reports progress, readiness and
+how long the warm-up took.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from config import EXAMPLE_QUERIES, QUICK_EXAMPLES, SIDEBAR_EXAMPLES, WARMUP_CONFIG
+from query_log import QueryLog, normalize_query
+
+# Session of warm-up runs in admission control
+WARMUP_SESSION = 'warmup'
+
+
+def warmup_queries(query_log: QueryLog = None, top_n: int = None,
+                   window_days: float = None) -> List[str]:
+    """
+    Questions to warm up, without duplicates
+
+    Args:
+        query_log: Log to take the most asked questions from (none if omitted)
+        top_n: Questions taken from the log (WARMUP_CONFIG['top_queries'] if omitted)
+        window_days: Log window (WARMUP_CONFIG['log_window_days'] if omitted)
+
+    Returns:
+        Example queries (config.EXAMPLE_QUERIES, sidebar and quick
+        examples) followed by the most asked logged questions
+    """
+    queries = list(EXAMPLE_QUERIES)
+    for examples in SIDEBAR_EXAMPLES.values():
+        queries.extend(examples)
+    queries.extend(query for _, query in QUICK_EXAMPLES)
+    if query_log is not None:
+        if top_n is None:
+            top_n = WARMUP_CONFIG.get('top_queries', 20)
+        if window_days is None:
+            window_days = WARMUP_CONFIG.get('log_window_days', 7)
+        queries.extend(query_log.top(top_n, window_days))
+
+    unique, seen = [], set()
+    for query in queries:
+        key = normalize_query(query).lower()
+        if key not in seen:
+            seen.add(key)
+            unique.append(query)
+    return unique
+
+
+class CacheWarmer:
+    """
+    Runs warm-up queries through a pipeline in the background
+    """
+
+    def __init__(self, pipeline, queries: List[str]):
+        """
+        Initialize warmer
+
+        Args:
+            pipeline: QueryPipeline to warm
+            queries: Questions to run
+        """
+        self.pipeline = pipeline
+        self.queries = list(queries)
+        self.state = 'pending'
+        self.done = 0
+        self.failed: List[str] = []
+        self.slowest: Optional[tuple] = None
+        self._started: Optional[float] = None
+        self._seconds: Optional[float] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'CacheWarmer':
+        """Start warming in a daemon thread (once)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+            self._thread.start()
+        return self
+
+    def run(self):
+        """Run the warm-up queries one after another"""
+        self.state = 'running'
+        self._started = time.perf_counter()
+        for query in self.queries:
+            start = time.perf_counter()
+            try:
+                # Only the caches are filled; the Doc would be dropped right away
+                outcome = self.pipeline.run(query, session=WARMUP_SESSION, record=False,
+                                            keep_doc=False)
+                if outcome['error']:
+                    self.failed.append(query)
+            except Exception as error:
+                print(f"Error warming up '{query}': {error}")
+                self.failed.append(query)
+            elapsed = time.perf_counter() - start
+            if self.slowest is None or elapsed > self.slowest[1]:
+                self.slowest = (query, elapsed)
+            self.done += 1
+        self._seconds = time.perf_counter() - self._started
+        print(f"Warm-up finished: {self.done} queries in {self._seconds:.2f} s"
+              + (f" ({len(self.failed)} failed)" if self.failed else ""))
+        self.state = 'ready'
+        self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the warm-up has finished"""
+        return self._ready.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Block until the warm-up has finished
+
+        Args:
+            timeout: Seconds to wait at most (no limit if omitted)
+
+        Returns:
+            Whether it finished
+        """
+        return self._ready.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Get warm-up progress
+
+        Returns:
+            Dictionary with state (pending, running or ready), ready,
+            done, total, failed (questions that errored), seconds
+            (elapsed so far, or the total once ready) and slowest
+            (question and seconds of the slowest run)
+        """
+        if self._seconds is not None:
+            seconds = self._seconds
+        elif self._started is not None:
+            seconds = time.perf_counter() - self._started
+        else:
+            seconds = 0.0
+        slowest = self.slowest
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'done': self.done,
+            'total': len(self.queries),
+            'failed': list(self.failed),
+            'seconds': round(seconds, 3),
+            'slowest': None if slowest is None else {'query': slowest[0],
+                                                      'seconds': round(slowest[1], 3)},
+        }